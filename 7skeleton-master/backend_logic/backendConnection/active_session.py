@@ -0,0 +1,49 @@
+# backend_logic/backendConnection/active_session.py
+
+import time
+from typing import Dict, Optional
+from db.mongodb_handler import get_db_in
+from configs.config import settings
+
+# Telemetry arrays grow with every packet; the realtime stages only need the roster
+ROSTER_PROJECTION = {
+    "participated_soldiers.location": 0,
+    "participated_soldiers.orientation": 0,
+    "team_stats_history": 0,
+    "events": 0,
+}
+
+
+class ActiveSessionCache:
+    """
+    Latest session (by start_time) without its telemetry arrays, refreshed at
+    most every ACTIVE_SESSION_REFRESH_SECONDS instead of being re-read for
+    every packet.
+    """
+
+    def __init__(self, refresh_seconds: float = settings.ACTIVE_SESSION_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.session: Optional[dict] = None
+        self._roster: Dict[str, dict] = {}
+        self._loaded_at = None
+
+    async def get(self) -> Optional[dict]:
+        now = time.monotonic()
+        if self._loaded_at is None or now - self._loaded_at >= self.refresh_seconds:
+            db = await get_db_in()
+            self.session = await db["sessions"].find_one(
+                {}, ROSTER_PROJECTION, sort=[("start_time", -1)]
+            )
+            self._roster = {
+                str(s["soldier_id"]): s
+                for s in (self.session or {}).get("participated_soldiers", [])
+            }
+            self._loaded_at = now
+        return self.session
+
+    def soldier(self, soldier_id) -> Optional[dict]:
+        """Roster entry of a soldier in the cached session, if allocated."""
+        return self._roster.get(str(soldier_id).strip())
+
+    def invalidate(self):
+        self._loaded_at = None
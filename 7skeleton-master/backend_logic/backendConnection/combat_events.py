@@ -0,0 +1,114 @@
+# backend_logic/backendConnection/combat_events.py
+
+import time
+from typing import Dict, List, Optional
+from configs.config import settings
+
+
+class SoldierCombatState:
+    """Per-soldier state the detector needs to tell a new hit from a repeated frame."""
+    __slots__ = ("hit_status", "hits", "killed", "last_hit_at", "cleared_since")
+
+    def __init__(self, hits: int = 0, killed: bool = False):
+        self.hit_status = 0         # hit_status seen on the previous packet
+        self.hits = hits            # hit_status == 1 hits taken (1 = 50% damage)
+        self.killed = killed
+        self.last_hit_at = None     # monotonic time of the last accepted hit
+        self.cleared_since = None   # monotonic time hit_status went back to 0 after a kill
+
+
+class CombatEventDetector:
+    """
+    Edge-triggered hit/kill/respawn detection over the raw vest stream.
+
+    Vests keep reporting hit_status 1 or 2 for several frames after a hit,
+    so a hit is only accepted on a rising edge (0 -> 1/2, or 1 -> 2) and only
+    if no other hit was accepted for that soldier within the debounce window.
+    Damage rules match the original pipeline: hit_status 1 is 50% on the
+    first hit and a kill on the second, hit_status 2 is a direct kill.
+    """
+
+    def __init__(
+        self,
+        hit_debounce_seconds: float = settings.COMBAT_HIT_DEBOUNCE_SECONDS,
+        respawn_after_seconds: float = settings.COMBAT_RESPAWN_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.hit_debounce_seconds = hit_debounce_seconds
+        self.respawn_after_seconds = respawn_after_seconds  # 0 disables respawn
+        self.clock = clock
+        self.session_key = None
+        self._states: Dict[str, SoldierCombatState] = {}
+
+    def reset(self, session_key=None):
+        """Forget every soldier's combat state."""
+        self.session_key = session_key
+        self._states = {}
+
+    def bind_session(self, session: dict):
+        """Reset for a session and seed state from damage/died already stored on it."""
+        self.reset(session.get("_id"))
+        for soldier in session.get("participated_soldiers", []):
+            damage = soldier.get("damage") or {}
+            killed = bool(soldier.get("died")) or "100" in damage
+            self._states[str(soldier["soldier_id"])] = SoldierCombatState(
+                hits=1 if "50" in damage else 0,
+                killed=killed,
+            )
+
+    def observe(self, soldier_id: str, hit_status: int, attacker_id: str, timestamp: str) -> List[dict]:
+        """
+        Feed one packet's hit_status for a soldier and return the discrete
+        combat events it produced (usually none).
+        """
+        soldier_id = str(soldier_id).strip()
+        state = self._states.get(soldier_id)
+        if state is None:
+            state = self._states[soldier_id] = SoldierCombatState()
+
+        now = self.clock()
+        previous = state.hit_status
+        state.hit_status = hit_status
+
+        if state.killed:
+            return self._observe_dead(state, soldier_id, hit_status, now, timestamp)
+
+        # Only a rising edge is a new hit; repeated 1/2 frames are the same hit
+        if hit_status not in (1, 2) or hit_status <= previous:
+            return []
+        if state.last_hit_at is not None and now - state.last_hit_at < self.hit_debounce_seconds:
+            return []
+        state.last_hit_at = now
+
+        event = {
+            "soldier_id": soldier_id,
+            "attacker_id": str(attacker_id).strip(),
+            "hit_status": hit_status,
+            "timestamp": timestamp,
+        }
+        if hit_status == 1 and state.hits == 0:
+            state.hits = 1
+            return [dict(event, type="hit", damage=50)]
+
+        state.hits = 2
+        state.killed = True
+        state.cleared_since = None
+        return [dict(event, type="kill", damage=100)]
+
+    def _observe_dead(self, state: SoldierCombatState, soldier_id: str, hit_status: int,
+                      now: float, timestamp: str) -> List[dict]:
+        """A killed soldier respawns once its vest reports no hit for respawn_after_seconds."""
+        if not self.respawn_after_seconds or hit_status != 0:
+            state.cleared_since = None
+            return []
+        if state.cleared_since is None:
+            state.cleared_since = now
+            return []
+        if now - state.cleared_since < self.respawn_after_seconds:
+            return []
+
+        self._states[soldier_id] = SoldierCombatState()
+        return [{"type": "respawn", "soldier_id": soldier_id, "timestamp": timestamp}]
+
+    def state_of(self, soldier_id: str) -> Optional[SoldierCombatState]:
+        return self._states.get(str(soldier_id).strip())
@@ -0,0 +1,149 @@
+# backend_logic/backendConnection/embedded_pipeline.py
+#
+# In-process alternative to the Faust worker: runs the same realtime stages in
+# the caller's event loop (next to FastAPI and the serial reader) over a local
+# transport (in-memory queues or mmap ring files, see transport.py), so a
+# single-node deployment needs no Kafka hop and no worker subprocess.
+# Selected with REALTIME_PIPELINE=embedded.
+
+import asyncio
+import weakref
+from typing import Dict, List, Optional
+from backend_logic.backendConnection import realtime_stages
+from backend_logic.backendConnection.realtime_websockets import (
+    RawDataWebSocketService, KillFeedWebSocketService, TeamStatsWebSocketService
+)
+from backend_logic.backendConnection.tracing import trace_of, tracer
+from backend_logic.backendConnection.transport import (
+    OVERFLOW_BLOCK, OVERFLOW_DROP, STREAM_MESSAGES, KafkaTransport, Subscription, Transport, create_transport
+)
+from configs.config import settings
+from configs import metrics
+from configs.logging_config import faust_logger as logger
+from db import mongo_client
+
+# stream -> stages consuming it. Like one Faust agent per topic, every stage
+# is its own consumer group and gets every message of its stream, in order.
+STAGE_ROUTES = {
+    "soldiers": [realtime_stages.normalize_telemetry],
+    "positions": [realtime_stages.broadcast_position, realtime_stages.persist_position],
+    "killfeed": [realtime_stages.deliver_kill_feed],
+    "combat": [realtime_stages.persist_combat_event, realtime_stages.update_team_stats],
+}
+
+# Stages that drop positions once EMBEDDED_QUEUE_SIZE behind instead of holding
+# up normalize_telemetry (and with it the serial reader and every other
+# stage). The live map and the MongoDB writer are the two consumers of the
+# busiest stream. A stale position is of no use to the live map. The writer
+# loses positions only while MongoDB is too slow to keep up.
+# Every other stage blocks, so kills, combat events and raw telemetry are
+# never dropped.
+STAGE_OVERFLOW = {
+    realtime_stages.broadcast_position: OVERFLOW_DROP,
+    realtime_stages.persist_position: OVERFLOW_DROP,
+}
+
+_pipelines = weakref.WeakSet()  # For the backlog gauge
+
+
+@metrics.collector
+def _collect_backlog():
+    lag = metrics.Family("mechphy_stream_consumer_lag", "gauge", "Messages a stage has not processed yet")
+    for pipeline in list(_pipelines):
+        for key, backlog in pipeline.stats().items():
+            stream, stage = key.split("->", 1)
+            lag.add({"stream": stream, "consumer": stage}, backlog)
+    return [lag]
+
+
+class EmbeddedPipeline:
+    """Stage context (see realtime_stages) backed by a local transport instead of Kafka topics."""
+
+    def __init__(self, transport: Optional[Transport] = None):
+        self.transport = transport or create_transport()
+        if isinstance(self.transport, KafkaTransport):
+            raise ValueError("The embedded pipeline needs a local transport; use REALTIME_PIPELINE=kafka for Kafka")
+        self.ws_service_raw = RawDataWebSocketService(self, bind=settings.WS_HOST, port=settings.WS_PORT)
+        self.ws_service_kill_feed = KillFeedWebSocketService(self, bind=settings.WS_HOST, port=settings.KILL_FEED_WS_PORT)
+        self.ws_service_team_stats = TeamStatsWebSocketService(self, bind=settings.WS_HOST, port=settings.TEAM_STATS_WS_PORT)
+        realtime_stages.init_stage_state(self)
+        self._subscriptions: Dict[str, List[Subscription]] = {}
+        self._tasks: List[asyncio.Task] = []
+        self.running = False
+        _pipelines.add(self)
+
+    async def start(self):
+        if self.running:
+            return
+        await mongo_client.connect()
+        for service in (self.ws_service_raw, self.ws_service_kill_feed, self.ws_service_team_stats):
+            await service.start()
+
+        for stream, stages in STAGE_ROUTES.items():
+            self._subscriptions[stream] = []
+            for stage in stages:
+                subscription = self.transport.subscribe(
+                    stream, group=stage.__name__, overflow=STAGE_OVERFLOW.get(stage, OVERFLOW_BLOCK)
+                )
+                self._subscriptions[stream].append(subscription)
+                self._tasks.append(asyncio.create_task(self._consume(stage, subscription), name=f"stage:{stage.__name__}"))
+        self._tasks.append(asyncio.create_task(self._flush_summaries(), name="stage:flush_session_summaries"))
+        self.running = True
+        logger.info("Embedded realtime pipeline started")
+
+    async def send(self, soldier_data: dict):
+        """Entry point for raw telemetry (what the Kafka producer sends to soldier_topic)."""
+        tracer.mark(trace_of(soldier_data), "produced")
+        await self.emit("soldiers", soldier_data)
+
+    async def emit(self, stream: str, value: dict):
+        """Publish a stage output to every stage consuming `stream`."""
+        STREAM_MESSAGES.labels(stream).inc()
+        await self.transport.send(stream, value)
+
+    async def _consume(self, stage, subscription: Subscription):
+        while True:
+            value = await subscription.get()
+            try:
+                await stage(self, value)  # Stages log their own errors
+            finally:
+                subscription.ack()
+
+    async def _flush_summaries(self):
+        # Flush pending session summary updates even when telemetry stops arriving
+        while True:
+            await asyncio.sleep(settings.SESSION_SUMMARY_FLUSH_SECONDS)
+            try:
+                await self.telemetry_summaries.flush()
+            except Exception as e:
+                logger.error(f"Error flushing session summaries: {e}", exc_info=True)
+
+    async def stop(self, drain_timeout: float = 5.0):
+        """Let queued messages finish (up to drain_timeout), then stop every stage."""
+        if not self.running:
+            return
+        self.running = False
+        for stream in STAGE_ROUTES:  # Upstream streams first, they feed the others
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(*(subscription.join() for subscription in self._subscriptions[stream])),
+                    timeout=drain_timeout
+                )
+            except asyncio.TimeoutError:
+                logger.warning(f"Dropping undelivered messages on '{stream}' after {drain_timeout}s")
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._subscriptions.clear()
+        self.transport.close()
+
+        await self.telemetry_summaries.flush()
+        for service in (self.ws_service_raw, self.ws_service_kill_feed, self.ws_service_team_stats):
+            await service.stop()
+        logger.info("Embedded realtime pipeline stopped")
+
+    def stats(self) -> dict:
+        """Unacked messages of every stage, keyed "stream->stage"."""
+        return self.transport.stats()
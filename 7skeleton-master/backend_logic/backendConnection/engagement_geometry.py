@@ -0,0 +1,181 @@
+# backend_logic/backendConnection/engagement_geometry.py
+
+import time
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from configs.config import settings
+
+EARTH_RADIUS_M = 6371000.0
+
+
+class EngagementSnapshot:
+    """
+    Pairwise engagement geometry for every known soldier at one tick.
+
+    Row i / column j of each matrix describe soldier ids[i] looking at ids[j].
+    Yaw is treated as a compass heading in degrees (0 = north, clockwise).
+    """
+
+    def __init__(self, ids: List[str], distance: np.ndarray, facing: np.ndarray, can_engage: np.ndarray):
+        self.ids = ids
+        self.index = {soldier_id: i for i, soldier_id in enumerate(ids)}
+        self.distance = distance        # metres between soldiers
+        self.facing = facing            # i has j inside its facing cone
+        self.can_engage = can_engage    # i faces j and j is within i's weapon range
+
+    def distance_between(self, soldier_a: str, soldier_b: str) -> Optional[float]:
+        i, j = self.index.get(soldier_a), self.index.get(soldier_b)
+        if i is None or j is None:
+            return None
+        return float(self.distance[i, j])
+
+    def mutual_exposure_pairs(self) -> List[Tuple[str, str]]:
+        """Return soldier pairs that can engage each other right now."""
+        mutual = np.triu(self.can_engage & self.can_engage.T, k=1)
+        rows, cols = np.nonzero(mutual)
+        return [(self.ids[i], self.ids[j]) for i, j in zip(rows, cols)]
+
+    def facing_targets(self, soldier_id: str) -> List[str]:
+        """Return soldiers inside the facing cone of soldier_id."""
+        i = self.index.get(soldier_id)
+        if i is None:
+            return []
+        return [self.ids[j] for j in np.nonzero(self.facing[i])[0]]
+
+    def is_hit_plausible(self, attacker_id: str, victim_id: str) -> Optional[bool]:
+        """
+        True if the attacker was roughly facing the victim and within weapon range.
+        None if either soldier has not reported a position yet.
+        """
+        i, j = self.index.get(attacker_id), self.index.get(victim_id)
+        if i is None or j is None:
+            return None
+        return bool(self.can_engage[i, j])
+
+
+class EngagementGeometry:
+    """
+    Tracks the latest position and yaw of every soldier in the running session.
+
+    Updates are O(1) writes into preallocated arrays; the O(n^2) pairwise
+    computation only runs when a snapshot is requested and the cached one
+    belongs to an older tick, so the cost per packet stays bounded no matter
+    how many soldiers are on the field.
+    """
+
+    def __init__(
+        self,
+        cone_half_angle_deg: float = settings.ENGAGEMENT_CONE_HALF_ANGLE_DEG,
+        tick_seconds: float = settings.ENGAGEMENT_TICK_SECONDS,
+        default_range_m: float = settings.ENGAGEMENT_DEFAULT_RANGE_M,
+        capacity: int = 64,
+    ):
+        self.cone_half_angle_deg = cone_half_angle_deg
+        self.tick_seconds = tick_seconds
+        self.default_range_m = default_range_m
+        self.session_key = None
+        self._weapon_ranges: Dict[str, float] = {}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int):
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._lat = np.zeros(capacity)
+        self._lon = np.zeros(capacity)
+        self._yaw = np.zeros(capacity)
+        self._range = np.full(capacity, self.default_range_m)
+        self._snapshot: Optional[EngagementSnapshot] = None
+        self._snapshot_tick = None
+
+    def reset(self, session_key=None, weapon_ranges: Optional[Dict[str, float]] = None):
+        """Forget all positions, e.g. when a new session starts."""
+        self.session_key = session_key
+        self._weapon_ranges = dict(weapon_ranges or {})
+        self._allocate(len(self._lat))
+
+    async def bind_session(self, session: dict, db_out):
+        """
+        Reset for a session and load every participant's weapon range
+        with a single $in query on the weapons collection.
+        """
+        participants = session.get("participated_soldiers", [])
+        weapon_ids = {s.get("weapon_id") for s in participants if s.get("weapon_id")}
+        ranges_by_weapon = {}
+        if weapon_ids:
+            cursor = db_out[settings.WEAPONS_COLLECTION].find(
+                {"weapon_id": {"$in": list(weapon_ids)}},
+                {"_id": 0, "weapon_id": 1, "range": 1}
+            )
+            async for weapon in cursor:
+                if weapon.get("range"):
+                    ranges_by_weapon[weapon["weapon_id"]] = float(weapon["range"])
+
+        self.reset(
+            session_key=session.get("_id"),
+            weapon_ranges={
+                s["soldier_id"]: ranges_by_weapon[s["weapon_id"]]
+                for s in participants
+                if s.get("weapon_id") in ranges_by_weapon
+            }
+        )
+
+    def update(self, soldier_id: str, latitude: float, longitude: float, yaw: float):
+        """Record the latest position and heading for a soldier."""
+        soldier_id = str(soldier_id)
+        row = self._rows.get(soldier_id)
+        if row is None:
+            row = len(self._ids)
+            if row == len(self._lat):
+                self._grow()
+            self._rows[soldier_id] = row
+            self._ids.append(soldier_id)
+            self._range[row] = self._weapon_ranges.get(soldier_id, self.default_range_m)
+        self._lat[row] = latitude
+        self._lon[row] = longitude
+        self._yaw[row] = yaw
+
+    def _grow(self):
+        capacity = len(self._lat) * 2
+        for name, fill in (("_lat", 0.0), ("_lon", 0.0), ("_yaw", 0.0), ("_range", self.default_range_m)):
+            grown = np.full(capacity, fill)
+            old = getattr(self, name)
+            grown[:len(old)] = old
+            setattr(self, name, grown)
+
+    def snapshot(self) -> EngagementSnapshot:
+        """Return the pairwise geometry for the current tick, computing it at most once per tick."""
+        tick = int(time.monotonic() / self.tick_seconds)
+        if self._snapshot is None or self._snapshot_tick != tick:
+            self._snapshot = self._compute()
+            self._snapshot_tick = tick
+        return self._snapshot
+
+    def invalidate(self):
+        """Drop the cached snapshot so the next call sees the very latest positions."""
+        self._snapshot = None
+
+    def _compute(self) -> EngagementSnapshot:
+        n = len(self._ids)
+        lat = np.radians(self._lat[:n])
+        lon = np.radians(self._lon[:n])
+        yaw = self._yaw[:n]
+        weapon_range = self._range[:n]
+
+        # Local equirectangular projection; exercise areas are a few km wide,
+        # so the error against a geodesic is well below GPS noise
+        ref_lat = lat.mean() if n else 0.0
+        east = lon * np.cos(ref_lat) * EARTH_RADIUS_M
+        north = lat * EARTH_RADIUS_M
+
+        d_east = east[np.newaxis, :] - east[:, np.newaxis]
+        d_north = north[np.newaxis, :] - north[:, np.newaxis]
+        distance = np.hypot(d_east, d_north)
+
+        # Bearing from i to j, clockwise from north, compared against i's yaw
+        bearing = np.degrees(np.arctan2(d_east, d_north))
+        off_axis = np.abs((bearing - yaw[:, np.newaxis] + 180.0) % 360.0 - 180.0)
+        facing = off_axis <= self.cone_half_angle_deg
+        np.fill_diagonal(facing, False)
+
+        can_engage = facing & (distance <= weapon_range[:, np.newaxis])
+        return EngagementSnapshot(list(self._ids), distance, facing, can_engage)
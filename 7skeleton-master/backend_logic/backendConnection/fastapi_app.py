@@ -1,18 +1,31 @@
 # Main FastAPI application file that sets up the web server, routes, and WebSocket services
 
 # Import FastAPI framework components
-from fastapi import FastAPI, WebSocket  # FastAPI for web framework, WebSocket for real-time communication
+from fastapi import FastAPI, HTTPException, Response, WebSocket  # FastAPI for web framework, WebSocket for real-time communication
 from fastapi.middleware.cors import CORSMiddleware  # Handle Cross-Origin Resource Sharing
 from configs.config import settings  # Import application configuration
 from configs.logging_config import fastapi_logger, faust_logger  # Import configured loggers
 import json  # For JSON serialization/deserialization
 import asyncio  # For asynchronous operations
+from typing import Optional
 
 # Import route handlers (endpoints) for different resources
 from backend_logic.routes_out.soldiers import router as soldier_dbOut_router  # Soldier data retrieval routes
 from backend_logic.routes_out.weapons import router as weapon_dbOut_router   # Weapon data retrieval routes
 from backend_logic.routes_out.vests import router as vest_dbOut_router      # Vest data retrieval routes
 from backend_logic.routes_in.session import router as session_dbIn_router   # Session management routes
+from backend_logic.routes_in.jobs import router as jobs_router  # Worker pool job status
+from backend_logic.routes_in.analytics import router as analytics_router  # After-action session analytics
+from db.indexes import ensure_indexes  # Index bootstrapper for all collections
+from db.counters import seed_counters  # ID sequences for sessions, weapons and vests
+from db.catalog_cache import catalog_cache  # Read-through cache for soldiers, weapons and vests
+from db.mongodb_handler import get_db_out
+from db import mongo_client  # Shared MongoDB client
+from backend_logic.backendConnection import tracing  # Realtime stage latency histograms
+from backend_logic.backendConnection.profiling import profiler  # Opt-in sampling profiler
+from backend_logic.backendConnection.loop_watchdog import watchdog  # Event loop lag / stall watchdog
+from backend_logic.jobs.worker_pool import job_manager  # Process pool for CPU-heavy jobs
+from configs import metrics  # Prometheus-style registry
 
 # Import replay functionality
 from backend_logic.backendConnection.replay_app import create_replay_app, app as replay_app_instance  # Replay feature
@@ -44,6 +57,8 @@ def create_app():
         app.include_router(weapon_dbOut_router)   # Routes for weapon data retrieval
         app.include_router(vest_dbOut_router)     # Routes for vest data retrieval
         app.include_router(session_dbIn_router)   # Routes for session management
+        app.include_router(jobs_router)           # Routes for worker pool jobs
+        app.include_router(analytics_router)      # Routes for after-action session analytics
         fastapi_logger.debug("Base routers included")
         
         # Mount the replay functionality under /api/replay
@@ -53,11 +68,101 @@ def create_app():
             tags=["replay"]       # OpenAPI documentation tag
         )
         fastapi_logger.debug("Replay router included")
+
+        # Shared MongoDB connection pool counters
+        @app.get("/api/diagnostics/mongo-pool", tags=["diagnostics"])
+        async def mongo_pool_stats():
+            return mongo_client.pool_stats()
+
+        # Prometheus scrape endpoint
+        @app.get("/metrics", include_in_schema=False)
+        async def prometheus_metrics():
+            if not metrics.ENABLED:
+                raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED)")
+            return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+        # Realtime stage latencies: this process (embedded pipeline, serial
+        # ingestion) plus whatever Faust workers published recently
+        @app.get("/api/diagnostics/pipeline-latency", tags=["diagnostics"])
+        async def pipeline_latency(reset: bool = False):
+            result = {
+                "local": tracing.tracer.snapshot(),
+                "workers": await tracing.published_snapshots(mongo_client.get_database(settings.DB_real)),
+            }
+            if reset:
+                tracing.tracer.reset()
+            return result
+
+        # Event loop lag, recent stalls with the blocking stack, ingest delay
+        @app.get("/api/diagnostics/event-loop", tags=["diagnostics"])
+        async def event_loop_health(reset: bool = False):
+            result = watchdog.snapshot()
+            if reset:
+                watchdog.reset()
+            return result
+
+        # Opt-in profiling of this process: stack samples of the event loop
+        # thread, per-coroutine timings and loop lag
+        @app.get("/api/diagnostics/profiling", tags=["diagnostics"])
+        async def profiling_report(top: int = 20):
+            return profiler.snapshot(top=top)
+
+        @app.post("/api/diagnostics/profiling/start", tags=["diagnostics"])
+        async def start_profiling(interval_ms: Optional[float] = None, reset: bool = True):
+            if reset:
+                profiler.reset()
+            profiler.start(interval_ms=interval_ms)
+            return profiler.snapshot(top=0)
+
+        @app.post("/api/diagnostics/profiling/stop", tags=["diagnostics"])
+        async def stop_profiling():
+            profiler.stop()
+            return profiler.snapshot()
+
+        # Collapsed stacks for flamegraph.pl / inferno / speedscope
+        @app.get("/api/diagnostics/profiling/flamegraph", tags=["diagnostics"])
+        async def profiling_flamegraph():
+            if not profiler.samples:
+                raise HTTPException(status_code=404, detail="No samples; start profiling first")
+            return Response(profiler.collapsed(), media_type="text/plain")
+
+        # Catalog cache hit/miss counters
+        @app.get("/api/catalog/cache/stats", tags=["diagnostics"])
+        async def catalog_cache_stats():
+            return catalog_cache.stats()
         
         # Register startup event handler
         @app.on_event("startup")
         async def startup_event():
-            """Initialize WebSocket services when the application starts"""
+            """Ensure MongoDB indexes and initialize WebSocket services when the application starts"""
+            # Open the shared MongoDB client on this event loop
+            try:
+                await mongo_client.connect()
+                fastapi_logger.info("MongoDB client connected")
+            except Exception as e:
+                fastapi_logger.error(f"MongoDB is not reachable yet: {str(e)}")
+
+            # Index problems are logged, never fatal: the API still serves (slowly) without them
+            try:
+                index_report = await ensure_indexes()
+                for failure in index_report["failed"]:
+                    fastapi_logger.error(f"Failed to create index {failure}")
+                fastapi_logger.info(f"Ensured {len(index_report['created'])} MongoDB indexes")
+                fastapi_logger.info(f"ID counters seeded at {await seed_counters()}")
+            except Exception as e:
+                fastapi_logger.error(f"Failed to ensure MongoDB indexes or counters: {str(e)}")
+
+            if settings.LOOP_WATCHDOG_ENABLED:
+                watchdog.start()
+            if settings.PROFILING_ENABLED:
+                profiler.start()
+
+            # Optional cross-worker catalog invalidation (needs a replica set)
+            if settings.CATALOG_CACHE_WATCH_CHANGES:
+                app.state.catalog_watch = asyncio.create_task(
+                    catalog_cache.watch_changes(await get_db_out(), fastapi_logger)
+                )
+
             try:
                 # Start all WebSocket services
                 await replay_app_instance.ws_raw.start()      # Raw data WebSocket
@@ -72,6 +177,12 @@ def create_app():
         @app.on_event("shutdown")
         async def shutdown_event():
             """Cleanup WebSocket services when the application shuts down"""
+            catalog_watch = getattr(app.state, "catalog_watch", None)
+            if catalog_watch:
+                catalog_watch.cancel()
+            profiler.stop()
+            watchdog.stop()
+            job_manager.shutdown()
             try:
                 # Stop all WebSocket services gracefully
                 await replay_app_instance.ws_raw.stop()
@@ -80,6 +191,7 @@ def create_app():
                 fastapi_logger.info("WebSocket services stopped successfully")
             except Exception as e:
                 fastapi_logger.error(f"Failed to stop WebSocket services: {str(e)}")
+            mongo_client.close()
     
     except Exception as e:
         # Log any errors during application initialization
@@ -1,129 +1,29 @@
 # backend_logic/backendConnection/faust_app_v1.py
 
 import faust
-import json
-import asyncio
-from mode import Service
-from websockets.server import WebSocketServerProtocol
-from websockets.exceptions import ConnectionClosed
-from db.schemas.incoming_soldier import Soldier
-from db.data_transformer import transform_soldier_data
-from db.mongodb_handler import (
-    store_to_mongo,
-    get_soldier_data_from_db,
-    get_soldier_data_from_latest_session,
-    update_soldier_damage,
-    get_db_in,
+from backend_logic.backendConnection.realtime_websockets import (
+    RawDataWebSocketService, KillFeedWebSocketService, TeamStatsWebSocketService
 )
+from db.schemas.incoming_soldier import Soldier
+from backend_logic.backendConnection import realtime_stages, tracing
+from backend_logic.backendConnection.transport import STREAM_MESSAGES, kafka_consumer_lag
+from backend_logic.backendConnection.profiling import profiler
+from backend_logic.backendConnection.loop_watchdog import watchdog
 from configs.config import settings
+from configs import metrics
 from configs.logging_config import faust_logger as logger
-from datetime import datetime
-from fastapi import FastAPI
-from motor.motor_asyncio import AsyncIOMotorClient
-import utils
-
-# FastAPI app and MongoDB client initialization
-fastapi_app = FastAPI()
-client = AsyncIOMotorClient(settings.MONGODB_URI)
-db_in = client[settings.DB_in]
-
-# WebSocket service for raw soldier data (port 8001)
-class RawDataWebSocketService(Service):
-    def __init__(self, app, bind: str = settings.WS_HOST, port: int = settings.WS_PORT, **kwargs):
-        # Store app, bind address, port, and active connections
-        self.app = app
-        self.bind = bind
-        self.port = port
-        self.connections = []
-        super().__init__(**kwargs)
-
-    async def on_messages(self, websocket, path):
-        # Add new websocket connection and listen for messages
-        self.connections.append(websocket)
-        try:
-            async for message in websocket:
-                await self.on_message(websocket, message)
-        except ConnectionClosed:
-            self.connections.remove(websocket)
-
-    async def on_message(self, websocket, message):
-        # Echo received message back to client
-        await websocket.send(f"Received: {message}")
-
-    @Service.task
-    async def _background_server(self):
-        # Start the WebSocket server
-        import websockets
-        await websockets.serve(self.on_messages, self.bind, self.port)
-
-# WebSocket service for kill feed data (port 8002)
-class KillFeedWebSocketService(Service):
-    def __init__(self, app, bind: str = settings.WS_HOST, port: int = settings.KILL_FEED_WS_PORT, **kwargs):
-        # Store app, bind address, port, and active connections
-        self.app = app
-        self.bind = bind
-        self.port = port
-        self.connections = []
-        super().__init__(**kwargs)
-
-    async def on_messages(self, websocket, path):
-        # Add new websocket connection and listen for messages
-        self.connections.append(websocket)
-        try:
-            async for message in websocket:
-                await self.on_message(websocket, message)
-        except ConnectionClosed:
-            self.connections.remove(websocket)
-
-    async def on_message(self, websocket, message):
-        # Echo received message back to client
-        await websocket.send(f"Received: {message}")
-
-    @Service.task
-    async def _background_server(self):
-        # Start the WebSocket server
-        import websockets
-        await websockets.serve(self.on_messages, self.bind, self.port)
-
-# WebSocket service for team stats data (port 8003)
-class TeamStatsWebSocketService(Service):
-    def __init__(self, app, bind: str = settings.WS_HOST, port: int = 8003, **kwargs):
-        # Store app, bind address, port, and active connections
-        self.app = app
-        self.bind = bind
-        self.port = port
-        self.connections = []
-        super().__init__(**kwargs)
-
-    async def on_messages(self, websocket, path):
-        # Add new websocket connection and listen for messages
-        self.connections.append(websocket)
-        try:
-            async for message in websocket:
-                await self.on_message(websocket, message)
-        except ConnectionClosed:
-            self.connections.remove(websocket)
-
-    async def on_message(self, websocket, message):
-        # Echo received message back to client
-        await websocket.send(f"Received: {message}")
-
-    @Service.task
-    async def _background_server(self):
-        # Start the WebSocket server
-        import websockets
-        await websockets.serve(self.on_messages, self.bind, self.port)
-
+from db import mongo_client
 
 # Custom Faust App with WebSocket services and bullet counts
 class App(faust.App):
     # Its overrides the default FastApi app to include WebSocket services
     def on_init(self):
-        # Initialize WebSocket services and bullet counts
-        self.ws_service_raw = RawDataWebSocketService(self, bind=settings.WS_HOST, port=8001)
-        self.ws_service_kill_feed = KillFeedWebSocketService(self, bind=settings.WS_HOST, port=8002)
-        self.ws_service_team_stats = TeamStatsWebSocketService(self, bind=settings.WS_HOST, port=8003)
-        self.bullet_counts = {"team_red": 0, "team_blue": 0}  # Persistent bullet counts
+        # Initialize WebSocket services and the state shared by the realtime stages
+        self.ws_service_raw = RawDataWebSocketService(self, bind=settings.WS_HOST, port=settings.WS_PORT)
+        self.ws_service_kill_feed = KillFeedWebSocketService(self, bind=settings.WS_HOST, port=settings.KILL_FEED_WS_PORT)
+        self.ws_service_team_stats = TeamStatsWebSocketService(self, bind=settings.WS_HOST, port=settings.TEAM_STATS_WS_PORT)
+        realtime_stages.init_stage_state(self)
+        self.stage_topics = {}
         self.should_stop_realtime = False
 
     # It overrides the default on_start method to add WebSocket services as runtime dependencies
@@ -132,10 +32,28 @@ class App(faust.App):
         await self.add_runtime_dependency(self.ws_service_raw)
         await self.add_runtime_dependency(self.ws_service_kill_feed)
         await self.add_runtime_dependency(self.ws_service_team_stats)
-
-
-
-# Define the Faust app (overrides FastAPI app above)
+        # Open the shared MongoDB client on the worker's event loop
+        await mongo_client.connect()
+        # Only the worker has a consumer to report lag for
+        metrics.collector(kafka_consumer_lag(self))
+        if settings.LOOP_WATCHDOG_ENABLED:
+            watchdog.start()
+        if settings.PROFILING_ENABLED:
+            profiler.start()
+
+    async def on_stop(self):
+        profiler.stop()
+        watchdog.stop()
+        mongo_client.close()
+        await super().on_stop()
+
+    async def emit(self, stream: str, value: dict):
+        """Publish a stage output to its Kafka topic."""
+        STREAM_MESSAGES.labels(stream).inc()
+        await self.stage_topics[stream].send(value=value)
+
+
+# Define the Faust app
 app = App(
     'soldiers-data',
     broker=settings.KAFKA_BROKER,
@@ -146,258 +64,96 @@ app = App(
 # Kafka topic to process incoming soldier data
 soldier_topic = app.topic(settings.KAFKA_TOPIC, value_type=Soldier, partitions=1)
 
-# Calculate and broadcast team statistics to WebSocket clients and store in DB
-async def calculate_and_broadcast_team_stats(session_id):
-    logger.info(f"calculate_and_broadcast_team_stats called for session {session_id}")
-    try:
-        # Fetch the latest session by session_id
-        latest_session = await db_in["sessions"].find_one({"_id": session_id})
-        if not latest_session:
-            logger.error("No session found for team stats calculation")
-            return
-
-        # Initialize team stats with current bullet counts
-        team_stats = {
-            "team_red": {"total_killed": 0, "bullets_fired": app.bullet_counts["team_red"]},
-            "team_blue": {"total_killed": 0, "bullets_fired": app.bullet_counts["team_blue"]}
-        }
-
-        # Calculate kills for each team from soldier stats
-        for soldier in latest_session["participated_soldiers"]:
-            team = soldier.get("team", "").lower()
-            if team not in ["red", "blue"]:
-                continue
-
-            soldier_stats = soldier.get("stats", [])
-            if soldier_stats:
-                latest_stat = soldier_stats[-1]
-                team_stats[f"team_{team}"]["total_killed"] += latest_stat.get("kill_count", 0)
-
-        current_time = datetime.utcnow()
-
-        # Create team stats event object for DB
-        team_stats_event = {
-            "team_red": {
-                "total_killed": team_stats["team_red"]["total_killed"],
-                "bullets_fired": team_stats["team_red"]["bullets_fired"],
-                "timestamp": current_time
-            },
-            "team_blue": {
-                "total_killed": team_stats["team_blue"]["total_killed"],
-                "bullets_fired": team_stats["team_blue"]["bullets_fired"],
-                "timestamp": current_time
-            }
-        }
-
-        # Store team stats in session history in DB
-        update_result = await db_in["sessions"].update_one(
-            {"_id": session_id},
-            {
-                "$push": {
-                    "team_stats_history": team_stats_event
-                }
-            }
-        )
-
-        if update_result.modified_count != 1:
-            logger.error("Failed to store team stats in session history")
-
-        # Prepare WebSocket message (convert timestamp to ISO string)
-        websocket_message = {
-            "team_red": {
-                "total_killed": team_stats["team_red"]["total_killed"],
-                "bullets_fired": team_stats["team_red"]["bullets_fired"],
-                "timestamp": current_time.isoformat()
-            },
-            "team_blue": {
-                "total_killed": team_stats["team_blue"]["total_killed"],
-                "bullets_fired": team_stats["team_blue"]["bullets_fired"],
-                "timestamp": current_time.isoformat()
-            }
-        }
-
-        # Broadcast team stats through WebSocket to all connected clients
-        team_stats_message = json.dumps(websocket_message)
-        for websocket in app.ws_service_team_stats.connections:
-            await websocket.send(team_stats_message)
-
-        logger.info(f"Team stats updated and broadcasted for session {session_id}")
+# Stage one output: normalized positions and discrete combat events
+position_topic = app.topic(settings.KAFKA_POSITION_TOPIC, partitions=1)
+combat_topic = app.topic(settings.KAFKA_COMBAT_TOPIC, partitions=1)
 
-    except Exception as e:
-        logger.error(f"Error calculating team stats: {e}", exc_info=True)
+# Kill-feed messages, ready to broadcast
+killfeed_topic = app.topic(settings.KAFKA_KILLFEED_TOPIC, partitions=1)
 
+app.stage_topics = {
+    "positions": position_topic,
+    "combat": combat_topic,
+    "killfeed": killfeed_topic,
+}
 
 
-# Faust agent to process incoming soldier data from Kafka
+# Stage one: raw telemetry -> position and combat events
 @app.agent(soldier_topic)
 async def process_soldiers(soldier_data_stream):
-    # Start periodic stats update in the background
-    # asyncio.create_task(periodic_stats_update())  (Removed)
-    
     async for soldier_data in soldier_data_stream:
-        try:
-            # Log received soldier data
-            logger.info(f"Received soldier data in Faust: {soldier_data}")
-            
-            # Transform and timestamp the incoming soldier data
-            transformed_data = transform_soldier_data(soldier_data)
-            transformed_data['timestamp'] = datetime.utcnow().isoformat()
-            
-            # Get the latest session from DB
-            latest_session = await db_in["sessions"].find_one(
-                sort=[("start_time", -1)]
-            )
-            
-            if not latest_session:
-                logger.error("No active session found")
-                continue  # Use continue if inside async for loop, return if inside a function
+        await realtime_stages.normalize_telemetry(app, soldier_data)
 
-            
-            soldier_info = next(
-                (s for s in latest_session["participated_soldiers"] 
-                 if s["soldier_id"] == str(transformed_data['soldier_id'])),
-                None
-            )
-            
-            
-            # Update bullet counts for the soldier's team
-            if soldier_info:
-                team = soldier_info.get("team", "").lower()
-                if team in ["red", "blue"]:
-                    new_bullets = transformed_data.get("bullet_count", 0)
-                    if new_bullets > 0:  # Only update if there are new bullets
-                        app.bullet_counts[f"team_{team}"] += new_bullets
-            
-            # Store the transformed soldier data in MongoDB
-            await store_to_mongo(transformed_data)
-            
-            # Prepare new location object for the soldier
-            new_location = {
-                "latitude": transformed_data['gps']['latitude'],
-                "longitude": transformed_data['gps']['longitude'],
-                "timestamp": transformed_data['timestamp']
-            }
-
-            # Prepare new orientation object for the soldier
-            new_orientation = {
-                "roll": soldier_data.imu_data.roll,
-                "pitch": soldier_data.imu_data.pitch,
-                "yaw": soldier_data.imu_data.yaw,
-                "timestamp": transformed_data['timestamp']
-            }
-            
-            # Store location and orientation in the session document
-            await db_in["sessions"].update_one(
-                {"_id": latest_session["_id"], "participated_soldiers.soldier_id": transformed_data['soldier_id']},
-                {
-                    "$push": {
-                        "participated_soldiers.$.location": new_location,
-                        "participated_soldiers.$.orientation": new_orientation
-                    }
-                }
-            )
-
-            # Broadcast raw soldier data to all connected WebSocket clients
-            raw_message = json.dumps(transformed_data)
-            for websocket in app.ws_service_raw.connections:
-                await websocket.send(raw_message)
-
-            # Process damage and kill feed logic if hit_status is 1 or 2
-            if transformed_data['hit_status'] in [1, 2]:
-                attacker_id = transformed_data['ammo']['attacker_id']
-                attacker_id_clean = str(attacker_id).strip()
-                victim_id = transformed_data['soldier_id']
-                victim_id_clean = str(victim_id).strip()
-
-                if not latest_session:
-                    logger.error("No active session found")
-                    continue
-
-                # Fetch attacker and victim data from the latest session
-                attacker_data = await get_soldier_data_from_latest_session(attacker_id_clean)
-                victim_data = await get_soldier_data_from_latest_session(victim_id_clean)
-
-                if not attacker_data or not victim_data:
-                    logger.error(f"Soldier data not found for attacker: {attacker_id}, victim: {victim_id}")
-                    continue
-
-                is_soldier_killed = False
-                
-                # Handle hit_status == 1 (first hit: 50%, second hit: killed)
-                if transformed_data['hit_status'] == 1:
-                    victim_damage = victim_data.get('damage', {})
-                    if '50' not in victim_damage:
-                        await update_soldier_damage(victim_id, 50)
-                        logger.info(f"Updated health for soldier {victim_id} to 50%")
-                    else:
-                        await update_soldier_damage(victim_id, 100)
-                        logger.info(f"Soldier {victim_id} marked as killed (health set to 100%)")
-                        is_soldier_killed = True
-
-                # Handle hit_status == 2 (direct death)
-                elif transformed_data['hit_status'] == 2:
-                    await update_soldier_damage(victim_id, 100)
-                    logger.info(f"Soldier {victim_id} marked as killed (hit_status 2)")
-                    is_soldier_killed = True
-
-                # If soldier is killed, process kill feed and update stats
-                if is_soldier_killed:
-                    calculated_distance = await utils.calculate_distance_between_soldiers(attacker_id, victim_id)
-                    
-                    # Create kill feed event object
-                    kill_event = {
-                        "attacker_id": str(attacker_data['soldier_id']),
-                        "attacker_call_sign": attacker_data['call_sign'],
-                        "victim_id": str(victim_data['soldier_id']),
-                        "victim_call_sign": victim_data['call_sign'],
-                        "distance_to_victim (in meters)": calculated_distance,
-                        "timestamp": transformed_data['timestamp'],
-                    }
-
-                    # Store kill event in session document
-                    update_result = await db_in["sessions"].update_one(
-                    {"_id": latest_session["_id"]},
-                    {"$push": {"events": kill_event}}
-                )
-                if update_result.modified_count != 1:
-                    logger.error("Failed to store kill event in session")
-
-                # Broadcast kill feed event
-                kill_feed_message_json = json.dumps(kill_event)
-                for websocket in app.ws_service_kill_feed.connections:
-                    await websocket.send(kill_feed_message_json)
-
-                # Update attacker's stats in the session document
-                attacker_index = next(
-                    (index for (index, soldier) in enumerate(latest_session["participated_soldiers"])
-                    if soldier["soldier_id"] == str(attacker_id_clean)),
-                    None
-                )
-                if attacker_index is not None:
-                    current_stats = latest_session["participated_soldiers"][attacker_index].get("stats", [])
-                    current_kills = current_stats[-1].get("kill_count", 0) if current_stats else 0
-
-                    new_stat = {
-                        "kill_count": current_kills + 1,
-                        "bullets_fired": transformed_data.get("bullet_count", 0),
-                        "timestamp": datetime.utcnow().isoformat()
-                    }
-                    update_result = await db_in["sessions"].update_one(
-                        {"_id": latest_session["_id"]},
-                        {"$push": {f"participated_soldiers.{attacker_index}.stats": new_stat}}
-                    )
-                    if update_result.modified_count != 1:
-                        logger.error(f"Failed to update stats for attacker {attacker_id}")
-                else:
-                    logger.error(f"Attacker index not found for attacker_id {attacker_id}")
-
-                # <--- THIS IS CRUCIAL: Always call this after a kill event!
-                await calculate_and_broadcast_team_stats(latest_session["_id"])
-
-            logger.info(f"Processed soldier data: {transformed_data}")
-
-        except Exception as e:
-            logger.error(f"Error processing soldier data: {e}", exc_info=True)
+
+# The MongoDB writers of positions and combat events (team totals included)
+# consume these topics in their own consumer group (faust_persist_app.py), so
+# the agents below never wait on MongoDB.
+
+# Map clients get positions without waiting on MongoDB
+@app.agent(position_topic)
+async def broadcast_positions(position_stream):
+    async for event in position_stream:
+        await realtime_stages.broadcast_position(app, event)
+
+
+@app.agent(killfeed_topic)
+async def deliver_kill_feed(kill_feed_stream):
+    async for kill_event in kill_feed_stream:
+        await realtime_stages.deliver_kill_feed(app, kill_event)
+
+
+@app.agent(combat_topic)
+async def update_team_stats(combat_stream):
+    async for event in combat_stream:
+        await realtime_stages.update_team_stats(app, event)
+
+
+
+
+# The worker's own /metrics on the Faust web server (port 6066 by default)
+if metrics.ENABLED:
+    @app.page("/metrics/")
+    async def metrics_page(web, request):
+        return web.text(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+# Event loop health of the worker (?reset=1 clears the counters)
+@app.page("/event-loop/")
+async def event_loop_page(web, request):
+    result = watchdog.snapshot()
+    if request.query.get("reset"):
+        watchdog.reset()
+    return web.json(result)
+
+
+# Profiling of the worker: GET for the report, ?action=start|stop|reset to
+# control it (?interval_ms= with start), /profiling/flamegraph/ for stacks
+@app.page("/profiling/")
+async def profiling_page(web, request):
+    action = request.query.get("action")
+    if action == "start":
+        interval_ms = request.query.get("interval_ms")
+        profiler.reset()
+        profiler.start(interval_ms=float(interval_ms) if interval_ms else None)
+    elif action == "stop":
+        profiler.stop()
+    elif action == "reset":
+        profiler.reset()
+    return web.json(profiler.snapshot())
+
+
+@app.page("/profiling/flamegraph/")
+async def profiling_flamegraph(web, request):
+    return web.text(profiler.collapsed())
+
+
+# Stage latency histograms live in this worker; the API serves them from MongoDB
+@app.timer(interval=settings.PIPELINE_TRACE_PUBLISH_SECONDS)
+async def publish_stage_latency():
+    try:
+        await tracing.publish_snapshot(mongo_client.get_database(settings.DB_real))
+    except Exception as e:
+        logger.error(f"Error publishing stage latency: {e}")
 
 
 
@@ -0,0 +1,93 @@
+# backend_logic/backendConnection/faust_persist_app.py
+#
+# MongoDB writers of the realtime pipeline (persist_position, and
+# persist_combat_event, which also stores team totals) as a Faust app of their own. A Faust app id is its
+# Kafka consumer group, so these agents get their own consumer, fetch loop and
+# offsets on the positions and combat topics. Agents of one app share a single
+# consumer, so a full persist buffer there would also pause the broadcasts.
+# When MongoDB slows down, only this worker falls behind, and faust_app_v1
+# keeps the map, kill feed and team stats in real time.
+#
+#   faust -A backend_logic.backendConnection.faust_persist_app worker
+#
+# main.py starts it next to the faust_app_v1 worker.
+
+import faust
+from backend_logic.backendConnection import realtime_stages, tracing
+from backend_logic.backendConnection.transport import kafka_consumer_lag
+from backend_logic.backendConnection.loop_watchdog import watchdog
+from configs.config import settings
+from configs import metrics
+from configs.logging_config import faust_logger as logger
+from db import mongo_client
+
+
+class PersistApp(faust.App):
+    def on_init(self):
+        # The writers only use telemetry_summaries, but every stage expects the full state
+        realtime_stages.init_stage_state(self)
+
+    async def on_start(self):
+        await mongo_client.connect()
+        metrics.collector(kafka_consumer_lag(self))
+        if settings.LOOP_WATCHDOG_ENABLED:
+            watchdog.start()
+
+    async def on_stop(self):
+        watchdog.stop()
+        await self.telemetry_summaries.flush()
+        mongo_client.close()
+        await super().on_stop()
+
+
+app = PersistApp(
+    'soldiers-data-persist',
+    broker=settings.KAFKA_BROKER,
+    store='memory://',
+    value_serializer='json',
+    web_port=settings.FAUST_PERSIST_WEB_PORT,  # faust_app_v1 keeps the default 6066
+)
+
+position_topic = app.topic(settings.KAFKA_POSITION_TOPIC, partitions=1)
+combat_topic = app.topic(settings.KAFKA_COMBAT_TOPIC, partitions=1)
+
+
+@app.agent(position_topic)
+async def persist_positions(position_stream):
+    async for event in position_stream:
+        await realtime_stages.persist_position(app, event)
+
+
+@app.agent(combat_topic)
+async def persist_combat_events(combat_stream):
+    async for event in combat_stream:
+        await realtime_stages.persist_combat_event(app, event)
+
+
+# Flush pending session summary updates even when telemetry stops arriving
+@app.timer(interval=settings.SESSION_SUMMARY_FLUSH_SECONDS)
+async def flush_session_summaries():
+    await app.telemetry_summaries.flush()
+
+
+# The db_write stage latencies are recorded in this worker
+@app.timer(interval=settings.PIPELINE_TRACE_PUBLISH_SECONDS)
+async def publish_stage_latency():
+    try:
+        await tracing.publish_snapshot(mongo_client.get_database(settings.DB_real))
+    except Exception as e:
+        logger.error(f"Error publishing stage latency: {e}")
+
+
+if metrics.ENABLED:
+    @app.page("/metrics/")
+    async def metrics_page(web, request):
+        return web.text(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.page("/event-loop/")
+async def event_loop_page(web, request):
+    result = watchdog.snapshot()
+    if request.query.get("reset"):
+        watchdog.reset()
+    return web.json(result)
@@ -0,0 +1,194 @@
+# backend_logic/backendConnection/loop_watchdog.py
+#
+# Always-on event loop health checks for the API process and Faust workers:
+#
+#   - loop lag: a heartbeat task sleeps LOOP_WATCHDOG_INTERVAL_MS and records
+#     how late it wakes up
+#   - stalls: a monitor thread notices when the heartbeat is overdue by
+#     LOOP_STALL_THRESHOLD_MS and grabs the loop thread's stack and current
+#     task while the blocking code is still running, so the culprit (a
+#     blocking call, a big json.dumps, a CPU-heavy scan) is on record
+#   - ingest delay: traced records (tracing.py) report how long after their
+#     serial read they reached stage one; above INGEST_LAG_WARN_SECONDS the
+#     pipeline is falling behind real time
+#
+# Served at /api/diagnostics/event-loop and /event-loop/ on a Faust worker.
+
+import asyncio
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Optional
+from configs.config import settings
+from configs.logging_config import faust_logger as logger
+from configs import metrics
+from backend_logic.backendConnection.tracing import LatencyHistogram
+
+STACK_DEPTH = 30  # Innermost frames kept per stall
+
+
+def _task_name(task) -> Optional[str]:
+    if task is None:
+        return None
+    coro = task.get_coro()
+    return f"{task.get_name()} ({getattr(coro, '__qualname__', coro)})"
+
+
+class LoopWatchdog:
+    def __init__(self, interval_ms: float = settings.LOOP_WATCHDOG_INTERVAL_MS,
+                 stall_threshold_ms: float = settings.LOOP_STALL_THRESHOLD_MS,
+                 history: int = settings.LOOP_STALL_HISTORY):
+        self.interval_s = interval_ms / 1000
+        self.stall_threshold_s = stall_threshold_ms / 1000
+        self.lag = LatencyHistogram()
+        self.stalls = deque(maxlen=history)
+        self.stall_count = 0
+        self.ingest_delay = LatencyHistogram()
+        self.latest_ingest_delay_s: Optional[float] = None
+        self.falling_behind_since: Optional[datetime] = None
+        self.started_at: Optional[datetime] = None
+        self._loop = None
+        self._loop_thread_id = None
+        self._beat: Optional[float] = None  # time.monotonic() the heartbeat last went to sleep
+        self._captured: Optional[dict] = None  # Stall seen by the monitor, finished by the heartbeat
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._monitor_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._heartbeat_task is not None
+
+    def start(self):
+        """Watch the event loop this is called on."""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._beat = None
+        self._heartbeat_task = self._loop.create_task(self._heartbeat())
+        self._monitor_thread = threading.Thread(target=self._monitor, name="loop-watchdog", daemon=True)
+        self._monitor_thread.start()
+        self.started_at = datetime.utcnow()
+
+    def stop(self):
+        if not self.running:
+            return
+        self._stop.set()
+        self._heartbeat_task.cancel()
+        self._heartbeat_task = None
+        self._monitor_thread.join(timeout=1)
+
+    def reset(self):
+        self.lag = LatencyHistogram()
+        self.ingest_delay = LatencyHistogram()
+        self.stalls.clear()
+        self.stall_count = 0
+        self.started_at = datetime.utcnow() if self.running else None
+
+    # ───────────────────────────── LOOP SIDE ────────────────────────────────
+    async def _heartbeat(self):
+        while True:
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval_s)
+            late = max(time.monotonic() - self._beat - self.interval_s, 0.0)
+            self.lag.observe(late * 1000)
+            captured, self._captured = self._captured, None
+            if captured is not None:
+                self._record_stall(captured, late)
+
+    def _record_stall(self, stall: dict, late: float):
+        stall["blocked_ms"] = round(late * 1000, 1)
+        self.stalls.append(stall)
+        self.stall_count += 1
+        logger.warning(
+            "Event loop blocked for %.0f ms in %s (task %s)",
+            late * 1000, stall["stack"][-1] if stall["stack"] else "?", stall["task"]
+        )
+
+    def observe_ingest(self, trace: Optional[dict]):
+        """Delay from the serial read of a traced record to stage one picking it up."""
+        if not trace or "serial_read" not in trace:
+            return
+        delay = time.monotonic() - trace["serial_read"]
+        self.latest_ingest_delay_s = delay
+        self.ingest_delay.observe(delay * 1000)
+        if delay > settings.INGEST_LAG_WARN_SECONDS and self.falling_behind_since is None:
+            self.falling_behind_since = datetime.utcnow()
+            logger.warning("Ingest is %.1f s behind real time (warning above %.1f s)",
+                           delay, settings.INGEST_LAG_WARN_SECONDS)
+        elif delay < settings.INGEST_LAG_WARN_SECONDS / 2 and self.falling_behind_since is not None:
+            logger.info("Ingest caught up (%.2f s behind) after falling behind at %s",
+                        delay, self.falling_behind_since.isoformat())
+            self.falling_behind_since = None
+
+    # ───────────────────────────── MONITOR THREAD ───────────────────────────
+    def _monitor(self):
+        while not self._stop.wait(self.interval_s / 2):
+            beat = self._beat
+            if beat is None or self._captured is not None:
+                continue
+            overdue = time.monotonic() - beat - self.interval_s
+            if overdue >= self.stall_threshold_s:
+                self._captured = self._capture(overdue)
+
+    def _capture(self, overdue: float) -> dict:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = []
+        while frame is not None and len(stack) < STACK_DEPTH:
+            code = frame.f_code
+            stack.append(f"{frame.f_globals.get('__name__', code.co_filename)}:"
+                         f"{getattr(code, 'co_qualname', code.co_name)}:{frame.f_lineno}")
+            frame = frame.f_back
+        stack.reverse()
+        try:
+            task = _task_name(asyncio.current_task(self._loop))
+        except Exception:  # Read from another thread; best effort
+            task = None
+        return {
+            "at": datetime.utcnow().isoformat(),
+            "captured_after_ms": round(overdue * 1000, 1),
+            "task": task,
+            "stack": stack,  # Outermost first, the blocking frame last
+        }
+
+    # ───────────────────────────── REPORT ───────────────────────────────────
+    def snapshot(self) -> dict:
+        return {
+            "running": self.running,
+            "since": self.started_at.isoformat() if self.started_at else None,
+            "interval_ms": self.interval_s * 1000,
+            "stall_threshold_ms": self.stall_threshold_s * 1000,
+            "lag": self.lag.snapshot(),
+            "stalls_total": self.stall_count,
+            "recent_stalls": list(reversed(self.stalls)),
+            "ingest": {
+                "latest_delay_ms": round(self.latest_ingest_delay_s * 1000, 1)
+                if self.latest_ingest_delay_s is not None else None,
+                "falling_behind": self.falling_behind_since is not None,
+                "falling_behind_since": self.falling_behind_since.isoformat()
+                if self.falling_behind_since else None,
+                "delay": self.ingest_delay.snapshot(),
+            },
+        }
+
+
+watchdog = LoopWatchdog()
+
+
+@metrics.collector
+def _collect_loop_health():
+    lag = metrics.Family("mechphy_event_loop_lag_seconds", "histogram", "How late the watchdog heartbeat woke up")
+    stalls = metrics.Family("mechphy_event_loop_stalls_total", "counter",
+                            f"Times the event loop was blocked for over {settings.LOOP_STALL_THRESHOLD_MS:g} ms")
+    delay = metrics.Family("mechphy_ingest_delay_seconds", "gauge",
+                           "Serial read to stage one of the latest traced record")
+    if watchdog.running:
+        lag.add_histogram({}, watchdog.lag.cumulative_seconds(), watchdog.lag.total_ms / 1000, watchdog.lag.count)
+        stalls.add({}, watchdog.stall_count)
+    if watchdog.latest_ingest_delay_s is not None:
+        delay.add({}, watchdog.latest_ingest_delay_s)
+    return [lag, stalls, delay]
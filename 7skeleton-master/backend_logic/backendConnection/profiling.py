@@ -0,0 +1,219 @@
+# backend_logic/backendConnection/profiling.py
+#
+# Opt-in profiling of a running process, switched on and off without a
+# restart (PROFILING_ENABLED at startup, /api/diagnostics/profiling/* on the
+# API, /profiling/ on a Faust worker's web server):
+#
+#   - a sampling profiler: a background thread snapshots the event loop
+#     thread's Python stack every PROFILING_SAMPLE_INTERVAL_MS and counts
+#     collapsed stacks ("outer;inner;leaf count", the input of flamegraph.pl,
+#     inferno and speedscope)
+#   - per-coroutine timing of functions decorated with @profiled: calls, wall
+#     time from call to return, and the wall and CPU time they actually ran
+#     on the loop between awaits
+#   - event loop lag: how late a periodic probe wakes up
+#
+# While profiling is off, @profiled costs one flag check per call.
+
+import asyncio
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Optional
+from configs.config import settings
+from configs.logging_config import faust_logger as logger
+from backend_logic.backendConnection.tracing import LatencyHistogram
+
+
+class CoroutineStats:
+    def __init__(self):
+        self.calls = 0
+        self.running = 0
+        self.wall_s = 0.0  # Call to return, awaits included
+        self.max_wall_s = 0.0
+        self.on_loop_s = 0.0  # Time the coroutine itself held the loop
+        self.cpu_s = 0.0
+
+    def snapshot(self) -> dict:
+        finished = self.calls - self.running
+        return {
+            "calls": self.calls,
+            "running": self.running,
+            "wall_s": round(self.wall_s, 6),
+            "mean_wall_ms": round(self.wall_s / finished * 1000, 3) if finished else None,
+            "max_wall_ms": round(self.max_wall_s * 1000, 3),
+            "on_loop_s": round(self.on_loop_s, 6),
+            "cpu_s": round(self.cpu_s, 6),
+        }
+
+
+class _TimedCoroutine:
+    """Drives a coroutine step by step, charging each step's time to `stats`."""
+
+    def __init__(self, coro, stats: CoroutineStats):
+        self.coro = coro
+        self.stats = stats
+
+    def __await__(self):
+        coro, stats = self.coro, self.stats
+        stats.calls += 1
+        stats.running += 1
+        started = time.perf_counter()
+        value, error = None, None
+        try:
+            while True:
+                step_started, cpu_started = time.perf_counter(), time.thread_time()
+                try:
+                    if error is not None:
+                        future = coro.throw(error)
+                    else:
+                        future = coro.send(value)
+                except StopIteration as done:
+                    return done.value
+                finally:
+                    stats.on_loop_s += time.perf_counter() - step_started
+                    stats.cpu_s += time.thread_time() - cpu_started
+                try:
+                    value, error = (yield future), None
+                except GeneratorExit:
+                    coro.close()
+                    raise
+                except BaseException as e:  # Cancellation and errors set on the awaited future
+                    value, error = None, e
+        finally:
+            wall = time.perf_counter() - started
+            stats.running -= 1
+            stats.wall_s += wall
+            stats.max_wall_s = max(stats.max_wall_s, wall)
+
+
+_OWN_GLOBALS = globals()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__") or os.path.basename(code.co_filename)
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class Profiler:
+    def __init__(self):
+        self.active = False
+        self.started_at: Optional[datetime] = None
+        self.stopped_at: Optional[datetime] = None
+        self.interval_s = settings.PROFILING_SAMPLE_INTERVAL_MS / 1000
+        self.stacks = Counter()
+        self.samples = 0
+        self.coroutines: Dict[str, CoroutineStats] = {}
+        self.loop_lag = LatencyHistogram()
+        self._loop_thread_id = None
+        self._sampler: Optional[threading.Thread] = None
+        self._stop_sampling = threading.Event()
+        self._lag_probe: Optional[asyncio.Task] = None
+
+    def coroutine_stats(self, name: str) -> CoroutineStats:
+        stats = self.coroutines.get(name)
+        if stats is None:
+            stats = self.coroutines[name] = CoroutineStats()
+        return stats
+
+    def start(self, interval_ms: float = None):
+        """Start profiling the event loop this is called on."""
+        if self.active:
+            return
+        if interval_ms:
+            self.interval_s = interval_ms / 1000
+        self._loop_thread_id = threading.get_ident()
+        self._stop_sampling.clear()
+        self._sampler = threading.Thread(target=self._sample, name="stack-sampler", daemon=True)
+        self._sampler.start()
+        self._lag_probe = asyncio.get_running_loop().create_task(self._probe_loop_lag())
+        self.active = True
+        self.started_at, self.stopped_at = datetime.utcnow(), None
+        logger.info("Profiling started (sampling every %.1f ms)", self.interval_s * 1000)
+
+    def stop(self):
+        if not self.active:
+            return
+        self.active = False
+        self._stop_sampling.set()
+        self._sampler.join(timeout=1)
+        self._lag_probe.cancel()
+        self.stopped_at = datetime.utcnow()
+        logger.info("Profiling stopped after %d samples", self.samples)
+
+    def reset(self):
+        self.stacks.clear()
+        self.samples = 0
+        self.coroutines.clear()
+        self.loop_lag = LatencyHistogram()
+        self.started_at = datetime.utcnow() if self.active else None
+
+    # ───────────────────────────── SAMPLING ─────────────────────────────────
+    def _sample(self):
+        while not self._stop_sampling.wait(self.interval_s):
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                if frame.f_globals is not _OWN_GLOBALS:  # Leave out the @profiled wrappers
+                    labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.reverse()
+            self.stacks[";".join(labels)] += 1
+            self.samples += 1
+
+    async def _probe_loop_lag(self):
+        loop = asyncio.get_running_loop()
+        interval = settings.PROFILING_LAG_PROBE_MS / 1000
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            self.loop_lag.observe(max(loop.time() - expected, 0.0) * 1000)
+
+    # ───────────────────────────── REPORTS ──────────────────────────────────
+    def collapsed(self) -> str:
+        """Collapsed stacks, one "frame;frame;frame count" line each (flamegraph.pl input)."""
+        stacks = Counter(dict(self.stacks))  # The sampler thread keeps adding to self.stacks
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    def snapshot(self, top: int = 20) -> dict:
+        # Leaf frames by sample count: where the loop thread spends its time
+        leaves = Counter()
+        for stack, count in dict(self.stacks).items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return {
+            "active": self.active,
+            "since": self.started_at.isoformat() if self.started_at else None,
+            "stopped_at": self.stopped_at.isoformat() if self.stopped_at else None,
+            "sample_interval_ms": self.interval_s * 1000,
+            "samples": self.samples,
+            "top_frames": [
+                {"frame": frame, "samples": count, "share": round(count / self.samples, 4)}
+                for frame, count in leaves.most_common(top)
+            ],
+            "coroutines": {name: stats.snapshot() for name, stats in sorted(self.coroutines.items())},
+            "loop_lag": self.loop_lag.snapshot(),
+        }
+
+
+profiler = Profiler()
+
+
+def profiled(fn=None, *, name: str = None):
+    """Time every call of an async function while the profiler is running."""
+    def decorate(fn):
+        label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if not profiler.active:
+                return await fn(*args, **kwargs)
+            return await _TimedCoroutine(fn(*args, **kwargs), profiler.coroutine_stats(label))
+        return wrapper
+    return decorate(fn) if fn is not None else decorate
@@ -0,0 +1,331 @@
+# backend_logic/backendConnection/realtime_stages.py
+#
+# Realtime pipeline split into stages. Stage one (normalize_telemetry) is the
+# only stateful stage: it turns raw vest packets into position events and
+# combat events. Every other stage consumes one of those streams on its own,
+# so a slow MongoDB write never holds up kill-feed or map delivery.
+#
+# Each stage takes a context object (the Faust app, or EmbeddedPipeline when
+# running in-process) exposing:
+#   geometry, combat_detector, active_session   - stage one state
+#   bullet_counts, kill_counts, team_kills       - per-session counters
+#   telemetry_summaries                          - session_summaries accumulator
+#   ws_service_raw, ws_service_kill_feed, ws_service_team_stats
+#   async emit(stream, value)                    - publish to "positions", "combat" or "killfeed"
+
+import functools
+import json
+import time
+from datetime import datetime
+from db.data_transformer import transform_soldier_data
+from backend_logic.backendConnection.engagement_geometry import EngagementGeometry
+from backend_logic.backendConnection.combat_events import CombatEventDetector
+from backend_logic.backendConnection.active_session import ActiveSessionCache
+from backend_logic.backendConnection.tracing import trace_of, tracer
+from backend_logic.backendConnection.profiling import profiled
+from backend_logic.backendConnection.loop_watchdog import watchdog
+from db.mongodb_handler import store_to_mongo, update_soldier_damage, get_db_in, get_db_out
+from db import session_summaries
+from db.session_summaries import TelemetrySummaryAccumulator
+from configs.logging_config import faust_logger as logger, packet_logger
+from configs import metrics
+import utils
+
+TEAMS = ["red", "blue"]
+
+STAGE_SECONDS = metrics.histogram("mechphy_stage_seconds", "Time a realtime stage spends per message", ["stage"])
+
+
+def _instrumented(stage):
+    """Time every message a stage handles; the stage is returned as is when metrics are off."""
+    if not metrics.ENABLED:
+        return stage
+    histogram = STAGE_SECONDS.labels(stage.__name__)
+
+    @functools.wraps(stage)
+    async def timed(ctx, value):
+        started = time.perf_counter()
+        try:
+            return await stage(ctx, value)
+        finally:
+            histogram.observe(time.perf_counter() - started)
+    return timed
+
+
+def init_stage_state(ctx):
+    """Attach the state every stage expects to a fresh context object."""
+    ctx.bullet_counts = {f"team_{team}": 0 for team in TEAMS}  # Persistent bullet counts
+    ctx.kill_counts = {}  # soldier_id -> kills in the running session
+    ctx.team_kills = {f"team_{team}": 0 for team in TEAMS}
+    ctx.geometry = EngagementGeometry()  # Latest position/yaw of every soldier for LOS checks
+    ctx.combat_detector = CombatEventDetector()  # Edge-triggered hit/kill/respawn detection
+    ctx.active_session = ActiveSessionCache()  # Roster of the latest session, refreshed periodically
+    ctx.telemetry_summaries = TelemetrySummaryAccumulator()  # Batched session_summaries updates
+
+
+async def _bind_session(ctx, session):
+    """Reset stage one state when a new session becomes the latest one."""
+    await ctx.geometry.bind_session(session, await get_db_out())
+    ctx.combat_detector.bind_session(session)
+    ctx.bullet_counts = {f"team_{team}": 0 for team in TEAMS}
+    ctx.kill_counts = {}
+    ctx.team_kills = {f"team_{team}": 0 for team in TEAMS}
+
+    # Seed kill counters from stats already stored (e.g. after a worker restart)
+    for soldier in session.get("participated_soldiers", []):
+        stats = soldier.get("stats") or []
+        kills = stats[-1].get("kill_count", 0) if stats else 0
+        ctx.kill_counts[str(soldier["soldier_id"])] = kills
+        team = soldier.get("team", "").lower()
+        if team in TEAMS:
+            ctx.team_kills[f"team_{team}"] += kills
+
+
+# ───────────────────────────── STAGE ONE ────────────────────────────────────
+@_instrumented
+@profiled
+async def normalize_telemetry(ctx, soldier_data):
+    """Raw telemetry -> position event (+ combat events on hit edges)."""
+    try:
+        trace = trace_of(soldier_data)
+        tracer.mark(trace, "consumed")
+        watchdog.observe_ingest(trace)
+
+        # Transform and timestamp the incoming soldier data
+        transformed_data = transform_soldier_data(soldier_data)
+        transformed_data['timestamp'] = datetime.utcnow().isoformat()
+
+        session = await ctx.active_session.get()
+        if not session:
+            logger.error("No active session found")
+            return
+        if ctx.combat_detector.session_key != session["_id"]:
+            await _bind_session(ctx, session)
+
+        soldier_id = str(transformed_data['soldier_id'])
+        ctx.geometry.update(
+            soldier_id,
+            transformed_data['gps']['latitude'],
+            transformed_data['gps']['longitude'],
+            transformed_data['imu']['yaw']
+        )
+
+        # Update bullet counts for the soldier's team
+        soldier_info = ctx.active_session.soldier(soldier_id)
+        if soldier_info:
+            team = soldier_info.get("team", "").lower()
+            new_bullets = transformed_data.get("bullet_count", 0)
+            if team in TEAMS and new_bullets > 0:
+                ctx.bullet_counts[f"team_{team}"] += new_bullets
+
+        position_event = {
+            "session_id": session["session_id"],
+            "telemetry": transformed_data,
+        }
+        if trace is not None:
+            position_event["trace"] = trace  # Kept out of the telemetry clients and MongoDB see
+        await ctx.emit("positions", position_event)
+
+        # Turn the raw hit_status into discrete, de-duplicated combat events
+        combat_events = ctx.combat_detector.observe(
+            soldier_id,
+            transformed_data['hit_status'],
+            transformed_data['ammo']['attacker_id'],
+            transformed_data['timestamp']
+        )
+        for combat_event in combat_events:
+            combat_event["session_id"] = session["session_id"]
+            combat_event["bullet_count"] = transformed_data.get("bullet_count", 0)
+            if combat_event["type"] != "respawn" and not _enrich_combat_event(ctx, combat_event):
+                continue
+            await ctx.emit("combat", combat_event)
+            if combat_event["type"] == "kill":
+                await ctx.emit("killfeed", combat_event["kill_feed"])
+
+        packet_logger.info(
+            "Processed telemetry of soldier %s (hit_status %s, %d combat events)",
+            soldier_id, transformed_data['hit_status'], len(combat_events)
+        )
+
+    except Exception as e:
+        logger.error(f"Error processing soldier data: {e}", exc_info=True)
+
+
+def _enrich_combat_event(ctx, event) -> bool:
+    """Attach roster, geometry and counter snapshots so downstream stages stay stateless."""
+    attacker_id, victim_id = event["attacker_id"], event["soldier_id"]
+    attacker = ctx.active_session.soldier(attacker_id)
+    victim = ctx.active_session.soldier(victim_id)
+    if not attacker or not victim:
+        logger.error(f"Soldier data not found for attacker: {attacker_id}, victim: {victim_id}")
+        return False
+
+    # Validate the hit against the engagement geometry of the current tick
+    geometry = ctx.geometry.snapshot()
+    hit_plausible = geometry.is_hit_plausible(attacker_id, victim_id)
+    if hit_plausible is False:
+        logger.warning(
+            f"Implausible hit on {victim_id} by {attacker_id}: "
+            f"attacker not facing victim or victim out of weapon range"
+        )
+    event["hit_plausible"] = hit_plausible
+    if event["type"] != "kill":
+        return True
+
+    attacker_team = attacker.get("team", "").lower()
+    ctx.kill_counts[attacker_id] = ctx.kill_counts.get(attacker_id, 0) + 1
+    if attacker_team in TEAMS:
+        ctx.team_kills[f"team_{attacker_team}"] += 1
+
+    event["attacker_team"] = attacker_team
+    event["attacker_kill_count"] = ctx.kill_counts[attacker_id]
+    event["team_totals"] = {
+        key: {"total_killed": ctx.team_kills[key], "bullets_fired": ctx.bullet_counts[key]}
+        for key in ctx.team_kills
+    }
+    event["kill_feed"] = {
+        "attacker_id": str(attacker['soldier_id']),
+        "attacker_call_sign": attacker['call_sign'],
+        "victim_id": str(victim['soldier_id']),
+        "victim_call_sign": victim['call_sign'],
+        "distance_to_victim (in meters)": geometry.distance_between(attacker_id, victim_id),
+        "hit_plausible": hit_plausible,
+        "timestamp": event['timestamp'],
+    }
+    return True
+
+
+# ─────────────────────────── POSITION CONSUMERS ─────────────────────────────
+@_instrumented
+@profiled
+async def broadcast_position(ctx, event):
+    """Send the normalized packet to every map client."""
+    try:
+        raw_message = json.dumps(event["telemetry"])
+        for websocket in list(ctx.ws_service_raw.connections):
+            await websocket.send(raw_message)
+        tracer.mark(event.get("trace"), "broadcast")
+    except Exception as e:
+        logger.error(f"Error broadcasting soldier data: {e}", exc_info=True)
+
+
+@_instrumented
+@profiled
+async def persist_position(ctx, event):
+    """Store the packet and append location/orientation to the session document."""
+    try:
+        transformed_data = event["telemetry"]
+        await store_to_mongo(dict(transformed_data))
+
+        new_location = {
+            "latitude": transformed_data['gps']['latitude'],
+            "longitude": transformed_data['gps']['longitude'],
+            "timestamp": transformed_data['timestamp']
+        }
+        new_orientation = {
+            "roll": transformed_data['imu']['roll'],
+            "pitch": transformed_data['imu']['pitch'],
+            "yaw": transformed_data['imu']['yaw'],
+            "timestamp": transformed_data['timestamp']
+        }
+
+        db_in = await get_db_in()
+        await db_in["sessions"].update_one(
+            {"session_id": event["session_id"], "participated_soldiers.soldier_id": transformed_data['soldier_id']},
+            {
+                "$push": {
+                    "participated_soldiers.$.location": new_location,
+                    "participated_soldiers.$.orientation": new_orientation
+                }
+            }
+        )
+        tracer.mark(event.get("trace"), "db_write")
+        await ctx.telemetry_summaries.note(event["session_id"], transformed_data['timestamp'])
+    except Exception as e:
+        logger.error(f"Error persisting soldier data: {e}", exc_info=True)
+
+
+# ──────────────────────────── COMBAT CONSUMERS ──────────────────────────────
+@_instrumented
+@profiled
+async def deliver_kill_feed(ctx, kill_event):
+    """Broadcast a kill to kill-feed clients as soon as stage one emits it."""
+    try:
+        kill_feed_message_json = json.dumps(kill_event)
+        for websocket in list(ctx.ws_service_kill_feed.connections):
+            await websocket.send(kill_feed_message_json)
+    except Exception as e:
+        logger.error(f"Error broadcasting kill feed: {e}", exc_info=True)
+
+
+@_instrumented
+@profiled
+async def persist_combat_event(ctx, event):
+    """Write damage, kill events, team totals and attacker stats to the session document."""
+    try:
+        if event["type"] == "respawn":
+            logger.info(f"Soldier {event['soldier_id']} respawned")
+            return
+
+        victim_id = event["soldier_id"]
+        await update_soldier_damage(victim_id, event["damage"])
+        if event["type"] != "kill":
+            logger.info(f"Updated health for soldier {victim_id} to 50%")
+            return
+        logger.info(f"Soldier {victim_id} marked as killed (hit_status {event['hit_status']})")
+
+        kill_event = dict(event["kill_feed"])
+        if kill_event["distance_to_victim (in meters)"] is None:
+            kill_event["distance_to_victim (in meters)"] = await utils.calculate_distance_between_soldiers(
+                event["attacker_id"], victim_id
+            )
+
+        # Team totals after this kill, for GET .../latest_team_stats (update_team_stats broadcasts them)
+        stored_at = datetime.utcnow()
+        team_stats_event = {key: dict(totals, timestamp=stored_at) for key, totals in event["team_totals"].items()}
+
+        db_in = await get_db_in()
+        update_result = await db_in["sessions"].update_one(
+            {"session_id": event["session_id"]},
+            {"$push": {"events": kill_event, "team_stats_history": team_stats_event}}
+        )
+        if update_result.modified_count != 1:
+            logger.error("Failed to store kill event and team stats in session")
+        await session_summaries.record_kill(db_in, event["session_id"], event.get("attacker_team") or None)
+
+        new_stat = {
+            "kill_count": event["attacker_kill_count"],
+            "bullets_fired": event.get("bullet_count", 0),
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        update_result = await db_in["sessions"].update_one(
+            {"session_id": event["session_id"], "participated_soldiers.soldier_id": event["attacker_id"]},
+            {"$push": {"participated_soldiers.$.stats": new_stat}}
+        )
+        if update_result.modified_count != 1:
+            logger.error(f"Failed to update stats for attacker {event['attacker_id']}")
+
+    except Exception as e:
+        logger.error(f"Error persisting combat event: {e}", exc_info=True)
+
+
+@_instrumented
+@profiled
+async def update_team_stats(ctx, event):
+    """Broadcast team totals after every kill (persist_combat_event stores them)."""
+    if event["type"] != "kill":
+        return
+    try:
+        current_time = datetime.utcnow()
+        websocket_message = {
+            key: dict(totals, timestamp=current_time.isoformat())
+            for key, totals in event["team_totals"].items()
+        }
+        team_stats_message = json.dumps(websocket_message)
+        for websocket in list(ctx.ws_service_team_stats.connections):
+            await websocket.send(team_stats_message)
+
+        logger.info(f"Team stats broadcast for session {event['session_id']}")
+
+    except Exception as e:
+        logger.error(f"Error calculating team stats: {e}", exc_info=True)
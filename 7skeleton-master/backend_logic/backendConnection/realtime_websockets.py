@@ -0,0 +1,149 @@
+# backend_logic/backendConnection/realtime_websockets.py
+#
+# WebSocket servers the realtime pipeline broadcasts to. Shared by the Faust
+# worker (faust_app_v1) and the in-process pipeline (embedded_pipeline), so
+# neither has to import the other.
+
+import weakref
+from mode import Service
+from websockets.exceptions import ConnectionClosed
+from configs.config import settings
+from configs import metrics
+
+_services = weakref.WeakValueDictionary()  # metrics name -> WebSocket service, for the client gauges
+
+
+def track(service, name: str):
+    """Report a WebSocket service's clients and send buffers in /metrics under `name`."""
+    _services[name] = service
+
+
+def _buffered_bytes(websocket) -> int:
+    transport = getattr(websocket, "transport", None)
+    return transport.get_write_buffer_size() if transport is not None else 0
+
+
+@metrics.collector
+def _collect_websockets():
+    clients = metrics.Family("mechphy_websocket_clients", "gauge", "Connected WebSocket clients per service")
+    queued = metrics.Family("mechphy_websocket_send_buffer_bytes", "gauge",
+                            "Bytes waiting to be sent to WebSocket clients per service")
+    for name, service in list(_services.items()):
+        connections = list(service.connections)
+        clients.add({"service": name}, len(connections))
+        queued.add({"service": name}, sum(_buffered_bytes(websocket) for websocket in connections))
+    return [clients, queued]
+
+# WebSocket service for raw soldier data (port 8001)
+class RawDataWebSocketService(Service):
+    def __init__(self, app, bind: str = settings.WS_HOST, port: int = settings.WS_PORT, **kwargs):
+        # Store app, bind address, port, and active connections
+        self.app = app
+        self.bind = bind
+        self.port = port
+        self.connections = []
+        self.server = None
+        super().__init__(**kwargs)
+        track(self, "raw")
+
+    async def on_messages(self, websocket, path):
+        # Add new websocket connection and listen for messages
+        self.connections.append(websocket)
+        try:
+            async for message in websocket:
+                await self.on_message(websocket, message)
+        except ConnectionClosed:
+            self.connections.remove(websocket)
+
+    async def on_message(self, websocket, message):
+        # Echo received message back to client
+        await websocket.send(f"Received: {message}")
+
+    @Service.task
+    async def _background_server(self):
+        # Start the WebSocket server
+        import websockets
+        self.server = await websockets.serve(self.on_messages, self.bind, self.port)
+
+    async def on_stop(self):
+        # Release the port, so a new pipeline (next session) can bind it
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+# WebSocket service for kill feed data (port 8002)
+class KillFeedWebSocketService(Service):
+    def __init__(self, app, bind: str = settings.WS_HOST, port: int = settings.KILL_FEED_WS_PORT, **kwargs):
+        # Store app, bind address, port, and active connections
+        self.app = app
+        self.bind = bind
+        self.port = port
+        self.connections = []
+        self.server = None
+        super().__init__(**kwargs)
+        track(self, "kill_feed")
+
+    async def on_messages(self, websocket, path):
+        # Add new websocket connection and listen for messages
+        self.connections.append(websocket)
+        try:
+            async for message in websocket:
+                await self.on_message(websocket, message)
+        except ConnectionClosed:
+            self.connections.remove(websocket)
+
+    async def on_message(self, websocket, message):
+        # Echo received message back to client
+        await websocket.send(f"Received: {message}")
+
+    @Service.task
+    async def _background_server(self):
+        # Start the WebSocket server
+        import websockets
+        self.server = await websockets.serve(self.on_messages, self.bind, self.port)
+
+    async def on_stop(self):
+        # Release the port, so a new pipeline (next session) can bind it
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+# WebSocket service for team stats data (port 8003)
+class TeamStatsWebSocketService(Service):
+    def __init__(self, app, bind: str = settings.WS_HOST, port: int = settings.TEAM_STATS_WS_PORT, **kwargs):
+        # Store app, bind address, port, and active connections
+        self.app = app
+        self.bind = bind
+        self.port = port
+        self.connections = []
+        self.server = None
+        super().__init__(**kwargs)
+        track(self, "team_stats")
+
+    async def on_messages(self, websocket, path):
+        # Add new websocket connection and listen for messages
+        self.connections.append(websocket)
+        try:
+            async for message in websocket:
+                await self.on_message(websocket, message)
+        except ConnectionClosed:
+            self.connections.remove(websocket)
+
+    async def on_message(self, websocket, message):
+        # Echo received message back to client
+        await websocket.send(f"Received: {message}")
+
+    @Service.task
+    async def _background_server(self):
+        # Start the WebSocket server
+        import websockets
+        self.server = await websockets.serve(self.on_messages, self.bind, self.port)
+
+    async def on_stop(self):
+        # Release the port, so a new pipeline (next session) can bind it
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
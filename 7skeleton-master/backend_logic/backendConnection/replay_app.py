@@ -1,16 +1,23 @@
 #backend_logic/backendConnection/replay_app.py
-import faust
 from datetime import datetime, timedelta
-from motor.motor_asyncio import AsyncIOMotorClient
 from mode import Service
 from configs.config import settings
 from fastapi import APIRouter, HTTPException
 from typing import List, Dict, Optional
 from configs.logging_config import faust_logger
 from backend_logic.pydantic_responses_in import replay_pydantic
+from backend_logic.backendConnection import realtime_websockets
+from backend_logic.backendConnection.profiling import profiled
+from backend_logic.jobs.replay_index import get_replay_index
+from configs import metrics
 import websockets
 import asyncio
 import json
+import time
+
+REPLAY_SCHEDULE_LAG = metrics.histogram(
+    "mechphy_replay_schedule_lag_seconds", "How much later than scheduled replay events are broadcast"
+)
 
 
 # The function safely converts a timestamp (which could be a string, a datetime object, or something else) into a Python datetime object. If parsing fails, it returns the current UTC time.
@@ -50,6 +57,7 @@ class WebSocketService(Service):
         self.connections = set()
         self.server = None
         super().__init__()
+        realtime_websockets.track(self, f"replay_{name}")
         faust_logger.info(f"Initialized {name} WebSocket service on port {port}")
 
     async def on_started(self) -> None:
@@ -115,6 +123,7 @@ class WebSocketService(Service):
         except Exception as e:
             faust_logger.error(f"Error in {self.name} WebSocket connection handler: {str(e)}")
 
+    @profiled
     async def broadcast(self, message: dict):
         """
         Broadcast message to all connected clients with enhanced error handling
@@ -123,7 +132,7 @@ class WebSocketService(Service):
             message (dict): Message to broadcast
         """
         if not self.connections:
-            faust_logger.debug(f"No active connections for {self.name} WebSocket")
+            faust_logger.debug("No active connections for %s WebSocket", self.name)
             return
             
         disconnected = set()
@@ -150,7 +159,7 @@ class WebSocketService(Service):
             # Remove disconnected clients
             self.connections.difference_update(disconnected)
             
-            faust_logger.debug(f"Broadcasted message to {len(self.connections)} {self.name} WebSocket connections")
+            faust_logger.debug("Broadcasted message to %d %s WebSocket connections", len(self.connections), self.name)
         
         except Exception as e:
             faust_logger.error(f"Unexpected error in {self.name} WebSocket broadcast: {str(e)}")
@@ -187,8 +196,8 @@ class ReplayController:
             "ws_stats": None
         }
         
-        # Database connection
-        self.db = AsyncIOMotorClient(settings.MONGODB_URI)[settings.DB_in]
+        # Columnar event index of the session (backend_logic/jobs/replay_index.py)
+        self.index = None
         
         # Replay task management
         self._replay_task = None
@@ -196,17 +205,13 @@ class ReplayController:
     async def initialize(self) -> bool:
         """Initialize replay session with comprehensive validation."""
         try:
-            # Fetch session data
-            self.session = await self.db["sessions"].find_one({"session_id": self.session_id})
-            if not self.session:
-                raise ValueError(f"Session {self.session_id} not found")
-            
-            # Validate session data structure
-            self._validate_session_data()
+            # Time-sorted index of the session's events, built by a job worker
+            # (raises ValueError for a missing session or one without soldiers)
+            self.index = await get_replay_index(self.session_id)
 
-            # Compute earliest & latest timestamps
-            self.start_timestamp = await self._get_first_timestamp()
-            self.end_timestamp = await self._get_last_timestamp()
+            # Earliest & latest timestamps
+            self.start_timestamp = self.index.start_timestamp
+            self.end_timestamp = self.index.end_timestamp
             self.current_timestamp = self.start_timestamp
 
             # Initialize broadcast timestamps
@@ -229,26 +234,19 @@ class ReplayController:
             faust_logger.error(f"Initialization failed: {str(e)}")
             raise
 
+    @profiled
     async def _load_window(self, start_time: datetime):
         """Load events for a time window starting at start_time."""
         end_time = min(start_time + self.window_size, self.end_timestamp)
         
-        # Get events for the window
-        soldier_events, session_events = await self._get_events(start_time, end_time)
-        
+        # Events of the window, already in time order; the last window keeps
+        # events at end_time, the others leave them to the next window
+        events = self.index.window(start_time, end_time, include_end=end_time >= self.end_timestamp)
+
         # Update buffer with new window
         self.buffer['start_ts'] = start_time
         self.buffer['end_ts'] = end_time
-        self.buffer['events'] = []
-        
-        # Flatten and sort events
-        for soldier in soldier_events:
-            self.buffer['events'].extend(soldier['movement_data'])
-        self.buffer['events'].extend(session_events['kill_feed'])
-        self.buffer['events'].extend(session_events['stats'])
-        
-        # Sort events by timestamp
-        self.buffer['events'].sort(key=lambda x: parse_timestamp(x['timestamp']))
+        self.buffer['events'] = events
         
         faust_logger.info(
             f"Loaded window from {start_time} to {end_time} "
@@ -299,6 +297,7 @@ class ReplayController:
                 
         return min(left, len(self.buffer['events']) - 1)
 
+    @profiled
     async def _replay_loop(self):
         """Core replay loop with window management."""
         try:
@@ -350,7 +349,10 @@ class ReplayController:
                     next_ts = parse_timestamp(next_event['timestamp'])
                     delay = (next_ts - event_timestamp).total_seconds()
                     delay = max(delay, 0) / self.speed
+                    slept_from = time.perf_counter() if metrics.ENABLED else None
                     await asyncio.sleep(delay)
+                    if slept_from is not None:
+                        REPLAY_SCHEDULE_LAG.observe(max(time.perf_counter() - slept_from - delay, 0.0))
 
         except asyncio.CancelledError:
             faust_logger.info(f"Replay loop cancelled for session {self.session_id}")
@@ -385,7 +387,7 @@ class ReplayController:
             if soldier_id in latest_stats:
                 await self._broadcast_stats(latest_stats[soldier_id], target_timestamp)
         
-        faust_logger.debug(f"Broadcasted state at timestamp {target_timestamp}")
+        faust_logger.debug("Broadcasted state at timestamp %s", target_timestamp)
 
     async def skip_n_seconds(self, n_seconds: int):
         """Skip forward n seconds and broadcast state at new position."""
@@ -445,166 +447,6 @@ class ReplayController:
             f"new index: {self.current_index}/{len(self.buffer['events'])}"
         )
 
-    def _validate_session_data(self):
-        """Validate session data integrity."""
-        required_keys = ['participated_soldiers', 'events']
-        for key in required_keys:
-            if key not in self.session:
-                raise ValueError(f"Missing required session key: {key}")
-        
-        if not self.session['participated_soldiers']:
-            raise ValueError("No soldiers participated in the session")
-        
-        # Validate timestamp formats in soldier locations
-        for soldier in self.session.get('participated_soldiers', []):
-            for loc in soldier.get('location', []):
-                try:
-                    parse_timestamp(loc.get('timestamp'))
-                except Exception as e:
-                    raise ValueError(f"Invalid timestamp in soldier location: {e}")
-
-    async def _get_first_timestamp(self) -> datetime:
-        """Get earliest timestamp from session data."""
-        timestamps = []
-        
-        for soldier in self.session.get('participated_soldiers', []):
-            timestamps.extend(
-                parse_timestamp(loc['timestamp']) 
-                for loc in soldier.get('location', [])
-            )
-            timestamps.extend(
-                parse_timestamp(stat['timestamp']) 
-                for stat in soldier.get('stats', [])
-            )
-        
-        timestamps.extend(
-            parse_timestamp(event['timestamp']) 
-            for event in self.session.get('events', [])
-        )
-        
-        return min(timestamps) if timestamps else datetime.utcnow()
-
-    async def _get_last_timestamp(self) -> datetime:
-        """Get the latest timestamp from session data."""
-        timestamps = []
-        
-        for soldier in self.session.get('participated_soldiers', []):
-            timestamps.extend(
-                parse_timestamp(loc['timestamp']) 
-                for loc in soldier.get('location', [])
-            )
-            timestamps.extend(
-                parse_timestamp(stat['timestamp']) 
-                for stat in soldier.get('stats', [])
-            )
-        
-        timestamps.extend(
-            parse_timestamp(event['timestamp']) 
-            for event in self.session.get('events', [])
-        )
-        
-        return max(timestamps) if timestamps else datetime.utcnow()
-
-    async def _get_events(self, start_time: datetime, end_time: datetime):
-        """
-        Retrieve and process events for a specific time window.
-        Return (soldier_events, session_events).
-        """
-        soldier_events = []
-        kill_feed = []
-        stats = []
-
-        try:
-            participated_soldiers = self.session.get("participated_soldiers", [])
-            session_data_events = self.session.get("events", [])
-
-            # Process soldier movement events
-            for soldier in participated_soldiers:
-                soldier_movement_data = []
-                locations = soldier.get('location', [])
-                orientations = soldier.get('orientation', [])
-
-                for loc, orient in zip(locations, orientations):
-                    loc_ts = parse_timestamp(loc["timestamp"])
-                    if not (start_time <= loc_ts <= end_time):
-                        continue
-
-                    movement_event = {
-                        "type": "soldier_movement",
-                        "soldier_id": soldier.get("soldier_id", ""),
-                        "team": soldier.get("team", ""),
-                        "call_sign": soldier.get("call_sign", ""),
-                        "timestamp": loc_ts.isoformat(),
-                        "position": {
-                            "latitude": loc.get("latitude"),
-                            "longitude": loc.get("longitude")
-                        },
-                        "orientation": {
-                            "roll": orient.get("roll"),
-                            "pitch": orient.get("pitch"),
-                            "yaw": orient.get("yaw")
-                        }
-                    }
-                    soldier_movement_data.append(movement_event)
-
-                if soldier_movement_data:
-                    soldier_events.append({
-                        "soldier_id": soldier.get("soldier_id", ""),
-                        "team": soldier.get("team", ""),
-                        "call_sign": soldier.get("call_sign", ""),
-                        "movement_data": sorted(soldier_movement_data, key=lambda x: x["timestamp"])
-                    })
-
-            # Process kill feed events
-            for ev in session_data_events:
-                ev_ts = parse_timestamp(ev.get("timestamp"))
-                if not (start_time <= ev_ts <= end_time):
-                    continue
-
-                kill_event = {
-                    "type": "kill_event",
-                    "timestamp": ev_ts.isoformat(),
-                    "attacker_id": ev.get("attacker_id"),
-                    "attacker_call_sign": ev.get("attacker_call_sign"),
-                    "victim_id": ev.get("victim_id"),
-                    "victim_call_sign": ev.get("victim_call_sign"),
-                    "distance_to_victim": ev.get("distance_to_victim"),
-                }
-                kill_feed.append(kill_event)
-
-            # Process soldier stats events
-            for soldier in participated_soldiers:
-                for st in soldier.get("stats", []):
-                    st_ts = parse_timestamp(st.get("timestamp"))
-                    if not (start_time <= st_ts <= end_time):
-                        continue
-
-                    soldier_stat_event = {
-                        "type": "soldier_stats",
-                        "soldier_id": soldier.get("soldier_id", ""),
-                        "team": soldier.get("team", ""),
-                        "call_sign": soldier.get("call_sign", ""),
-                        "timestamp": st_ts.isoformat(),
-                        "health": st.get("health"),
-                        "kills": st.get("kill_count"),
-                        "bullets_fired": st.get("bullets_fired")
-                    }
-                    stats.append(soldier_stat_event)
-
-            # Sort all events
-            kill_feed.sort(key=lambda x: x["timestamp"])
-            stats.sort(key=lambda x: x["timestamp"])
-            soldier_events.sort(key=lambda x: x["movement_data"][0]["timestamp"] if x["movement_data"] else "")
-
-            return soldier_events, {
-                "kill_feed": kill_feed,
-                "stats": stats
-            }
-
-        except Exception as e:
-            faust_logger.error(f"Error in _get_events: {str(e)}", exc_info=True)
-            return [], {"kill_feed": [], "stats": []}
-
     async def _broadcast_movement(self, event, event_timestamp):
         """Handle soldier_movement broadcast logic."""
         broadcast_msg = {
@@ -618,8 +460,8 @@ class ReplayController:
         }
 
         faust_logger.debug(
-            f"[REPLAY] Broadcasting soldier_movement for soldier {event['soldier_id']} "
-            f"(DB timestamp: {event['timestamp']}, replay-time parsed: {event_timestamp.isoformat()})"
+            "[REPLAY] Broadcasting soldier_movement for soldier %s (DB timestamp: %s, replay-time parsed: %s)",
+            event['soldier_id'], event['timestamp'], event_timestamp
         )
 
         await self.app.ws_raw.broadcast(broadcast_msg)
@@ -638,8 +480,8 @@ class ReplayController:
         }
 
         faust_logger.debug(
-            f"[REPLAY] Broadcasting kill_feed event (DB timestamp: {event['timestamp']}, "
-            f"replay-time parsed: {event_timestamp.isoformat()})"
+            "[REPLAY] Broadcasting kill_feed event (DB timestamp: %s, replay-time parsed: %s)",
+            event['timestamp'], event_timestamp
         )
 
         await self.app.ws_killfeed.broadcast(kill_feed_msg)
@@ -659,8 +501,8 @@ class ReplayController:
         }
 
         faust_logger.debug(
-            f"[REPLAY] Broadcasting soldier_stats for soldier {event['soldier_id']} "
-            f"(DB timestamp: {event['timestamp']}, replay-time parsed: {event_timestamp.isoformat()})"
+            "[REPLAY] Broadcasting soldier_stats for soldier %s (DB timestamp: %s, replay-time parsed: %s)",
+            event['soldier_id'], event['timestamp'], event_timestamp
         )
 
         await self.app.ws_stats.broadcast(stats_msg)
@@ -685,9 +527,13 @@ class ReplayController:
             self._replay_task = None
         faust_logger.info(f"Stopped replay for session {self.session_id}")
 
-class ReplayApp(faust.App):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+class ReplayApp:
+    """
+    Replay WebSocket services, controller and API router. A plain container:
+    replay never consumes Kafka, so it does not need to be a Faust app.
+    """
+    def __init__(self, app_id: str = 'replay-app'):
+        self.id = app_id
         
         # Initialize WebSocket services
         self.ws_raw = WebSocketService(self, 8765, "raw")
@@ -812,12 +658,8 @@ class ReplayApp(faust.App):
                 raise HTTPException(status_code=500, detail=str(e))
 
 def create_replay_app() -> ReplayApp:
-    """Create and configure the replay Faust application"""
-    app = ReplayApp(
-        'replay-app',
-        broker=settings.KAFKA_BROKER,
-        store='memory://',
-    )
+    """Create and configure the replay application"""
+    app = ReplayApp('replay-app')
     faust_logger.info("Created new replay application")
     return app
 
@@ -0,0 +1,232 @@
+# backend_logic/backendConnection/tracing.py
+#
+# Per-record latency tracing of the realtime pipeline. A sampled record
+# carries a "trace" dict of stage -> time.monotonic() from the serial read to
+# the WebSocket broadcast and the MongoDB write:
+#
+#   serial_read -> parsed -> produced -> consumed -+-> broadcast
+#                                                  +-> db_write
+#
+# CLOCK_MONOTONIC is system wide, so stamps taken in the API process and in a
+# Faust worker on the same host can be subtracted. Each stage that stamps a
+# trace records the segments ending there into per-segment histograms, and,
+# with OTEL_EXPORTER_OTLP_ENDPOINT set, the process finishing a branch emits
+# the whole chain as OpenTelemetry spans.
+
+import os
+import socket
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from configs.config import settings
+from configs.logging_config import faust_logger as logger
+from configs import metrics
+
+STAGES = ("serial_read", "parsed", "produced", "consumed", "broadcast", "db_write")
+
+# segment -> (from stage, to stage)
+SEGMENTS = {
+    "parse": ("serial_read", "parsed"),
+    "handoff": ("parsed", "produced"),  # Parsed until sent to Kafka / the embedded pipeline
+    "transport": ("produced", "consumed"),
+    "broadcast": ("consumed", "broadcast"),
+    "db_write": ("consumed", "db_write"),
+    "serial_to_websocket": ("serial_read", "broadcast"),
+    "serial_to_db": ("serial_read", "db_write"),
+}
+
+# stage -> [(segment, from stage)] of the segments ending there
+_SEGMENTS_ENDING_AT = {
+    stage: [(name, start) for name, (start, end) in SEGMENTS.items() if end == stage]
+    for stage in STAGES
+}
+
+# Stages on the way to each branch end, for OpenTelemetry spans
+BRANCHES = {
+    "broadcast": ("serial_read", "parsed", "produced", "consumed", "broadcast"),
+    "db_write": ("serial_read", "parsed", "produced", "consumed", "db_write"),
+}
+
+# Upper bounds in ms; the last bucket is everything slower
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float):
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (max for the overflow bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def cumulative_seconds(self) -> List[tuple]:
+        """(upper bound in seconds, cumulative count) pairs, as metrics.Family.add_histogram takes them."""
+        cumulative, buckets = 0, []
+        for bound, count in zip(list(BUCKETS_MS) + [float("inf")], self.counts):
+            cumulative += count
+            buckets.append((bound / 1000, cumulative))
+        return buckets
+
+    def snapshot(self) -> dict:
+        cumulative, buckets = 0, {}
+        for bound, count in zip(list(BUCKETS_MS) + ["+Inf"], self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "p50_ms": self.quantile(0.5),
+            "p90_ms": self.quantile(0.9),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": round(self.max_ms, 3),
+            "buckets": buckets,
+        }
+
+
+class PipelineTracer:
+    """Starts sampled traces and aggregates their stage-to-stage latencies."""
+
+    def __init__(self, enabled: bool = settings.PIPELINE_TRACING,
+                 sample_every: int = settings.PIPELINE_TRACE_SAMPLE_EVERY):
+        self.enabled = enabled
+        self.sample_every = max(1, sample_every)
+        self._seen = 0
+        self.histograms: Dict[str, LatencyHistogram] = {name: LatencyHistogram() for name in SEGMENTS}
+        self.started_at = datetime.utcnow()
+        self._otel = None
+        self._otel_failed = False
+        # Converts monotonic stamps to the epoch nanoseconds OpenTelemetry wants
+        self._epoch_offset_ns = time.time_ns() - time.monotonic_ns()
+
+    def start(self, serial_read_at: Optional[float] = None) -> Optional[dict]:
+        """New trace for a record read at `serial_read_at`, or None if not sampled."""
+        if not self.enabled:
+            return None
+        self._seen += 1
+        if self._seen % self.sample_every:
+            return None
+        return {"serial_read": serial_read_at if serial_read_at is not None else time.monotonic()}
+
+    def mark(self, trace: Optional[dict], stage: str):
+        """Stamp `stage` on a trace and record every segment that ends there."""
+        if trace is None:
+            return
+        now = time.monotonic()
+        trace[stage] = now
+        for name, start in _SEGMENTS_ENDING_AT[stage]:
+            if start in trace:
+                self.histograms[name].observe((now - trace[start]) * 1000)
+        if stage in BRANCHES and settings.OTEL_EXPORTER_OTLP_ENDPOINT:
+            self._export_spans(trace, stage)
+
+    def snapshot(self) -> dict:
+        return {
+            "sample_every": self.sample_every if self.enabled else None,
+            "since": self.started_at.isoformat(),
+            "segments": {
+                name: histogram.snapshot()
+                for name, histogram in self.histograms.items() if histogram.count
+            },
+        }
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.__init__()
+        self.started_at = datetime.utcnow()
+
+    # ───────────────────────── OpenTelemetry (optional) ─────────────────────
+    def _otel_tracer(self):
+        if self._otel is None and not self._otel_failed:
+            try:
+                from opentelemetry.sdk.resources import Resource
+                from opentelemetry.sdk.trace import TracerProvider
+                from opentelemetry.sdk.trace.export import BatchSpanProcessor
+                from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+            except ImportError:
+                logger.warning("OTEL_EXPORTER_OTLP_ENDPOINT is set but opentelemetry-sdk / "
+                               "opentelemetry-exporter-otlp are not installed; not exporting spans")
+                self._otel_failed = True
+                return None
+            provider = TracerProvider(resource=Resource.create({"service.name": settings.OTEL_SERVICE_NAME}))
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=settings.OTEL_EXPORTER_OTLP_ENDPOINT)))
+            self._otel = provider.get_tracer(__name__)
+        return self._otel
+
+    def _export_spans(self, trace: dict, branch_end: str):
+        otel = self._otel_tracer()
+        if otel is None:
+            return
+        from opentelemetry import trace as otel_trace
+        stamped: List[str] = [stage for stage in BRANCHES[branch_end] if stage in trace]
+        if len(stamped) < 2:
+            return
+        epoch = lambda stage: int(trace[stage] * 1e9) + self._epoch_offset_ns
+        root = otel.start_span(f"telemetry -> {branch_end}", start_time=epoch(stamped[0]))
+        context = otel_trace.set_span_in_context(root)
+        for start, end in zip(stamped, stamped[1:]):
+            span = otel.start_span(f"{start} -> {end}", context=context, start_time=epoch(start))
+            span.end(end_time=epoch(end))
+        root.end(end_time=epoch(stamped[-1]))
+
+
+tracer = PipelineTracer()
+
+
+@metrics.collector
+def _collect_segments():
+    family = metrics.Family("mechphy_pipeline_segment_seconds", "histogram",
+                            "Latency between realtime pipeline stages of traced records")
+    for name, histogram in tracer.histograms.items():
+        if histogram.count:
+            family.add_histogram({"segment": name}, histogram.cumulative_seconds(),
+                                 histogram.total_ms / 1000, histogram.count)
+    return [family]
+
+
+def trace_of(soldier_data) -> Optional[dict]:
+    """Trace attached to a soldier packet (plain dict or Faust Soldier record)."""
+    if isinstance(soldier_data, dict):
+        return soldier_data.get("trace")
+    return getattr(soldier_data, "trace", None)
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+async def publish_snapshot(db):
+    """Store this process's histograms where the API process can read them (Faust worker)."""
+    await db[settings.PIPELINE_LATENCY_COLLECTION].replace_one(
+        {"_id": worker_id()},
+        {"updated_at": datetime.utcnow(), **tracer.snapshot()},
+        upsert=True
+    )
+
+
+async def published_snapshots(db, max_age_seconds: float = 60.0) -> List[dict]:
+    """Snapshots published by pipeline workers within the last `max_age_seconds`."""
+    cutoff = datetime.utcfromtimestamp(time.time() - max_age_seconds)
+    cursor = db[settings.PIPELINE_LATENCY_COLLECTION].find({"updated_at": {"$gte": cutoff}})
+    return [{"worker": doc.pop("_id"), **doc} async for doc in cursor]
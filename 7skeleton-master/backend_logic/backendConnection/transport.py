@@ -0,0 +1,415 @@
+# backend_logic/backendConnection/transport.py
+#
+# Pluggable transport for the realtime streams ("soldiers", "positions",
+# "combat", "killfeed"). Every backend keeps the Kafka contract the stages
+# were written against:
+#   - send(stream, value) appends to the stream, in order
+#   - every consumer group subscribed to a stream sees every message, in order
+#   - consumers of the same group share (compete for) its messages
+#   - a group only moves past a message once it is acked
+#
+# Local transports hold a bounded backlog per group instead of Kafka's
+# retention, so a group that falls that far behind hits its overflow policy
+# (see MemoryTransport).
+#
+#   MemoryTransport   - asyncio queues, one per (stream, group); single process
+#   FileRingTransport - one mmap'd ring buffer file per stream; another process
+#                       (load generator, replayer) can produce into the pipeline
+#   KafkaTransport    - the Faust topics of faust_app_v1 (producer side only; the
+#                       agents of the faust_app_v1 and faust_persist_app
+#                       workers are the consumers)
+#
+# Selected with REALTIME_TRANSPORT, see create_transport().
+
+import asyncio
+import json
+import mmap
+import os
+import struct
+from collections import deque
+from typing import Dict, Optional
+from configs.config import settings
+from configs.logging_config import faust_logger as logger
+from configs import metrics
+
+STREAM_MESSAGES = metrics.counter("mechphy_stream_messages_total", "Messages produced to a realtime stream", ["stream"])
+STREAM_DROPPED = metrics.counter(
+    "mechphy_stream_dropped_total", "Messages a consumer group dropped because its queue was full", ["stream", "group"]
+)
+
+# What a local transport does with a message for a group whose backlog is full
+OVERFLOW_BLOCK = "block"  # send() waits for room: lossless, but holds up the producer
+OVERFLOW_DROP = "drop"    # The message is dropped for that group (and counted); nothing waits
+
+
+class Subscription:
+    """One consumer group's view of a stream."""
+
+    async def get(self) -> dict:
+        """Next message for this group (waits until one is available)."""
+        raise NotImplementedError
+
+    def ack(self):
+        """Mark the oldest message handed out by get() as processed."""
+        raise NotImplementedError
+
+    def lag(self) -> int:
+        """Messages sent to the stream that this group has not acked yet."""
+        raise NotImplementedError
+
+    async def join(self):
+        """Wait until everything sent so far has been acked."""
+        raise NotImplementedError
+
+
+class Transport:
+    async def send(self, stream: str, value: dict):
+        raise NotImplementedError
+
+    def subscribe(self, stream: str, group: str, overflow: str = OVERFLOW_BLOCK) -> Subscription:
+        """
+        Join `group` on `stream`. Subscribing twice to the same group returns a
+        shared subscription (with the overflow policy of the first subscribe).
+        """
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+    def close(self):
+        pass
+
+
+# ───────────────────────────── IN-MEMORY ────────────────────────────────────
+class MemorySubscription(Subscription):
+    def __init__(self, maxsize: int, overflow: str = OVERFLOW_BLOCK):
+        if overflow not in (OVERFLOW_BLOCK, OVERFLOW_DROP):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflow = overflow
+        self.in_flight = 0  # Handed out by get() but not acked yet
+        self.dropped = 0
+
+    async def get(self) -> dict:
+        value = await self.queue.get()
+        self.in_flight += 1
+        return value
+
+    def ack(self):
+        self.in_flight -= 1
+        self.queue.task_done()
+
+    def lag(self) -> int:
+        return self.queue.qsize() + self.in_flight
+
+    async def join(self):
+        await self.queue.join()
+
+
+class MemoryTransport(Transport):
+    """
+    asyncio queues, one per (stream, group). Values are passed by reference,
+    not serialized, so consumers must treat them as read-only. Like a Kafka
+    group with auto_offset_reset=latest, a group only receives messages sent
+    after it subscribed.
+
+    Each group's queue holds at most `maxsize` messages. send() hands a
+    message to the "drop" groups first, without waiting: a full one loses the
+    message (counted in mechphy_stream_dropped_total). It then waits for room
+    in the "block" groups. So a slow "drop" group never holds up the producer
+    or its sibling groups. A full "block" group does hold up the producer, and
+    with it every group on the streams that producer feeds.
+    """
+
+    def __init__(self, maxsize: int = settings.EMBEDDED_QUEUE_SIZE):
+        self.maxsize = maxsize
+        self._groups: Dict[str, Dict[str, MemorySubscription]] = {}
+
+    async def send(self, stream: str, value: dict):
+        blocking = []
+        for group, subscription in self._groups.get(stream, {}).items():
+            if subscription.overflow == OVERFLOW_BLOCK:
+                blocking.append(subscription)
+                continue
+            try:
+                subscription.queue.put_nowait(value)
+            except asyncio.QueueFull:
+                subscription.dropped += 1
+                STREAM_DROPPED.labels(stream, group).inc()
+        for subscription in blocking:
+            await subscription.queue.put(value)  # Waits when that group is maxsize messages behind
+
+    def subscribe(self, stream: str, group: str, overflow: str = OVERFLOW_BLOCK) -> Subscription:
+        groups = self._groups.setdefault(stream, {})
+        if group not in groups:
+            groups[group] = MemorySubscription(self.maxsize, overflow)
+        return groups[group]
+
+    def stats(self) -> dict:
+        return {
+            f"{stream}->{group}": subscription.lag()
+            for stream, groups in self._groups.items()
+            for group, subscription in groups.items()
+        }
+
+    def close(self):
+        self._groups.clear()
+
+
+# ───────────────────────────── FILE / MMAP RING ─────────────────────────────
+# File layout: header, then `capacity` bytes of ring data. Offsets are logical
+# (total bytes ever written) and are mapped into the ring modulo capacity.
+#   header: magic, version, capacity, head (end of the newest record),
+#           tail (start of the oldest record still intact), next_seq
+#   record: seq (u64), length (u32), JSON payload
+RING_MAGIC = b"RING"
+RING_VERSION = 1
+_HEADER = struct.Struct("<4sIQQQQ")
+_HEADER_SIZE = 64
+_RECORD = struct.Struct("<QI")
+# Group offset file: logical offset and seq of the group's next record
+_GROUP_OFFSET = struct.Struct("<QQ")
+
+
+class RingFile:
+    """Single-writer, multi-reader ring of JSON records in an mmap'd file."""
+
+    def __init__(self, path: str, capacity: int):
+        exists = os.path.exists(path) and os.path.getsize(path) > _HEADER_SIZE
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        if exists:
+            # Attach to a ring created by another process, keeping its capacity
+            with open(path, "rb") as f:
+                magic, version, capacity, *_ = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != RING_MAGIC or version != RING_VERSION:
+                os.close(self._fd)
+                raise ValueError(f"{path} is not a ring buffer file")
+        else:
+            os.ftruncate(self._fd, _HEADER_SIZE + capacity)
+        self.capacity = capacity
+        self._map = mmap.mmap(self._fd, _HEADER_SIZE + capacity)
+        if not exists:
+            _HEADER.pack_into(self._map, 0, RING_MAGIC, RING_VERSION, capacity, 0, 0, 0)
+
+    def header(self):
+        """(head, tail, next_seq)"""
+        _, _, _, head, tail, next_seq = _HEADER.unpack_from(self._map, 0)
+        return head, tail, next_seq
+
+    def _copy_in(self, offset: int, data: bytes):
+        pos = offset % self.capacity
+        first = min(len(data), self.capacity - pos)
+        self._map[_HEADER_SIZE + pos:_HEADER_SIZE + pos + first] = data[:first]
+        if first < len(data):
+            self._map[_HEADER_SIZE:_HEADER_SIZE + len(data) - first] = data[first:]
+
+    def _copy_out(self, offset: int, length: int) -> bytes:
+        pos = offset % self.capacity
+        first = min(length, self.capacity - pos)
+        data = self._map[_HEADER_SIZE + pos:_HEADER_SIZE + pos + first]
+        if first < length:
+            data += self._map[_HEADER_SIZE:_HEADER_SIZE + length - first]
+        return data
+
+    def append(self, payload: bytes) -> int:
+        size = _RECORD.size + len(payload)
+        if size > self.capacity:
+            raise ValueError(f"Record of {size} bytes does not fit a {self.capacity} byte ring")
+        head, tail, seq = self.header()
+        # Evict the oldest records, and publish the new tail BEFORE overwriting
+        # them, so a reader copying one of them can tell its copy is torn
+        while head + size - tail > self.capacity:
+            _, length = _RECORD.unpack(self._copy_out(tail, _RECORD.size))
+            tail += _RECORD.size + length
+        struct.pack_into("<Q", self._map, 24, tail)
+        self._copy_in(head, _RECORD.pack(seq, len(payload)) + payload)
+        # Make the record visible last
+        struct.pack_into("<QQ", self._map, 16, head + size, tail)
+        struct.pack_into("<Q", self._map, 32, seq + 1)
+        return seq
+
+    def read(self, offset: int):
+        """(seq, payload, next offset), or None if `offset` was overwritten while reading."""
+        seq, length = _RECORD.unpack(self._copy_out(offset, _RECORD.size))
+        if length > self.capacity:
+            return None
+        payload = self._copy_out(offset + _RECORD.size, length)
+        _, tail, _ = self.header()
+        if tail > offset:
+            return None
+        return seq, payload, offset + _RECORD.size + length
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+
+class FileRingSubscription(Subscription):
+    def __init__(self, transport: "FileRingTransport", ring: RingFile, offset_path: str):
+        self.transport = transport
+        self.ring = ring
+        if not os.path.exists(offset_path):
+            # New groups start at the end of the stream (auto_offset_reset=latest)
+            head, _, next_seq = ring.header()
+            with open(offset_path, "wb") as f:
+                f.write(_GROUP_OFFSET.pack(head, next_seq))
+        # Committed offset is mmap'd too, so acking is a memory write, not a syscall
+        self._offset_file = open(offset_path, "r+b")
+        self._offset_map = mmap.mmap(self._offset_file.fileno(), _GROUP_OFFSET.size)
+        self.committed_offset, self.committed_seq = _GROUP_OFFSET.unpack_from(self._offset_map, 0)
+        # Records handed out by get() but not acked yet: (next offset, next seq)
+        self._read_offset, self._read_seq = self.committed_offset, self.committed_seq
+        self._pending = deque()
+        self._lock = asyncio.Lock()
+
+    def _commit(self, offset: int, seq: int):
+        _GROUP_OFFSET.pack_into(self._offset_map, 0, offset, seq)
+        self.committed_offset, self.committed_seq = offset, seq
+
+    async def get(self) -> dict:
+        async with self._lock:  # Consumers of one group take records one at a time
+            while True:
+                head, tail, _ = self.ring.header()
+                if self._read_offset < tail:
+                    # The writer lapped this group: skip to the oldest intact record
+                    logger.warning(f"Ring consumer overrun, skipping {tail - self._read_offset} bytes")
+                    self._read_offset = tail
+                if self._read_offset < head:
+                    record = self.ring.read(self._read_offset)
+                    if record is None:
+                        continue  # Overwritten mid-read; the tail check above recovers
+                    seq, payload, next_offset = record
+                    self._read_offset, self._read_seq = next_offset, seq + 1
+                    self._pending.append((next_offset, seq + 1))
+                    return json.loads(payload)
+                await self.transport.wait_for_data(self.ring)
+
+    def ack(self):
+        offset, seq = self._pending.popleft()
+        self._commit(offset, seq)
+
+    def lag(self) -> int:
+        _, _, next_seq = self.ring.header()
+        return next_seq - self.committed_seq
+
+    async def join(self):
+        while self.lag() > 0:
+            await asyncio.sleep(settings.TRANSPORT_RING_POLL_SECONDS)
+
+    def close(self):
+        self._offset_map.close()
+        self._offset_file.close()
+
+
+class FileRingTransport(Transport):
+    """
+    One ring file per stream under `directory` plus one offset file per
+    (stream, group), so a restarted consumer resumes where its group left off.
+    Each stream must have a single writer process; any number of processes
+    may consume. Readers that fall more than `capacity` bytes behind skip the
+    overwritten records, like a Kafka consumer past the retention window.
+    """
+
+    def __init__(self, directory: str = settings.TRANSPORT_RING_DIR,
+                 capacity: int = settings.TRANSPORT_RING_BYTES):
+        self.directory = directory
+        self.capacity = capacity
+        os.makedirs(directory, exist_ok=True)
+        self._rings: Dict[str, RingFile] = {}
+        self._subscriptions: Dict[str, Dict[str, FileRingSubscription]] = {}
+        self._written: Optional[asyncio.Event] = None
+
+    def _ring(self, stream: str) -> RingFile:
+        if stream not in self._rings:
+            self._rings[stream] = RingFile(os.path.join(self.directory, f"{stream}.ring"), self.capacity)
+        return self._rings[stream]
+
+    async def send(self, stream: str, value: dict):
+        self._ring(stream).append(json.dumps(value, default=str).encode())
+        if self._written is not None:
+            # Wake consumers in this process right away; others poll
+            self._written.set()
+
+    async def wait_for_data(self, ring: RingFile):
+        if self._written is None:
+            self._written = asyncio.Event()
+        self._written.clear()
+        try:
+            await asyncio.wait_for(self._written.wait(), settings.TRANSPORT_RING_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+    def subscribe(self, stream: str, group: str, overflow: str = OVERFLOW_BLOCK) -> Subscription:
+        # A ring never blocks its writer: every group behind the oldest record skips ahead
+        subscriptions = self._subscriptions.setdefault(stream, {})
+        if group not in subscriptions:
+            offset_path = os.path.join(self.directory, f"{stream}.{group}.offset")
+            subscriptions[group] = FileRingSubscription(self, self._ring(stream), offset_path)
+        return subscriptions[group]
+
+    def stats(self) -> dict:
+        return {
+            f"{stream}->{group}": subscription.lag()
+            for stream, subscriptions in self._subscriptions.items()
+            for group, subscription in subscriptions.items()
+        }
+
+    def close(self):
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions.values():
+                subscription.close()
+        for ring in self._rings.values():
+            ring.close()
+        self._subscriptions.clear()
+        self._rings.clear()
+        self._written = None
+
+
+# ───────────────────────────── KAFKA ────────────────────────────────────────
+class KafkaTransport(Transport):
+    """Sends to the Faust topics; consuming them is the Faust worker's job."""
+
+    def __init__(self):
+        self._topics = None
+
+    def topics(self) -> dict:
+        if self._topics is None:
+            # Importing the Faust app is only paid for when Kafka is actually used
+            from backend_logic.backendConnection.faust_app_v1 import app, soldier_topic
+            self._topics = {"soldiers": soldier_topic, **app.stage_topics}
+        return self._topics
+
+    async def send(self, stream: str, value: dict):
+        await self.topics()[stream].send(value=value)
+
+    def subscribe(self, stream: str, group: str, overflow: str = OVERFLOW_BLOCK) -> Subscription:
+        raise NotImplementedError(
+            "Kafka streams are consumed by the Faust workers (faust -A "
+            "backend_logic.backendConnection.faust_app_v1 worker, and faust_persist_app)"
+        )
+
+
+def kafka_consumer_lag(faust_app):
+    """metrics collector: Kafka lag (highwater - committed offset) of every partition assigned to a Faust worker."""
+    def collect():
+        lag = metrics.Family("mechphy_kafka_consumer_lag", "gauge", "Messages not yet committed per topic partition")
+        consumer = faust_app.consumer
+        committed = getattr(consumer, "_committed_offset", {})
+        for tp in consumer.assignment():
+            highwater = consumer.highwater(tp)
+            if highwater is not None:
+                lag.add({"group": faust_app.conf.id, "topic": tp.topic, "partition": str(tp.partition)},
+                        max(highwater - (committed.get(tp) or 0), 0))
+        return [lag]
+    return collect
+
+
+def create_transport(kind: Optional[str] = None) -> Transport:
+    kind = kind or settings.REALTIME_TRANSPORT
+    if kind == "memory":
+        return MemoryTransport()
+    if kind == "file":
+        return FileRingTransport()
+    if kind == "kafka":
+        return KafkaTransport()
+    raise ValueError(f"Unknown REALTIME_TRANSPORT '{kind}' (use 'memory', 'file' or 'kafka')")
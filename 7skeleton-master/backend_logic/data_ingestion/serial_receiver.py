@@ -1,12 +1,31 @@
-import aioserial
 import asyncio
 import re
+import time
 import logging
-from backend_logic.backendConnection.faust_app_v1 import app
+from configs.config import settings
+from configs import metrics
+from configs.logging_config import SampledLogger
+from backend_logic.backendConnection.tracing import tracer
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
-logger = logging.getLogger(__name__)
+# Child of the fastapi logger: the serial reader runs in the API process
+logger = logging.getLogger("fastapi.serial")
+packet_logger = SampledLogger(logger, settings.LOG_PACKET_SAMPLE_EVERY)
+
+SERIAL_PACKETS = metrics.counter("mechphy_serial_packets_total", "Vest packets read from a serial port", ["port", "result"])
+SERIAL_BYTES = metrics.counter("mechphy_serial_bytes_total", "Bytes read from a serial port", ["port"])
+
+# Set by request_stop() when real-time monitoring ends; checked between reconnects
+stop_requested = False
+
+
+def request_stop():
+    global stop_requested
+    stop_requested = True
+
+
+def reset_stop():
+    global stop_requested
+    stop_requested = False
 
 class GPSData:
     def __init__(self, latitude, longitude):
@@ -73,30 +92,28 @@ class SoldierData:
                 f"trigger_event={self.trigger_event}, "
                 f"bullet_count={self.bullet_count})")
 
+def ddmm_to_decimal(value: float) -> float:
+    """NMEA-style (D)DDMM.MMMM to decimal degrees, e.g. 2831.50628 -> 28.525105."""
+    degrees = int(value / 100)  # 28
+    minutes = value - (degrees * 100)  # 31.50628
+    return degrees + (minutes / 60)  # 28 + 31.50628/60
+
 async def parse_raw_data(raw_data: str) -> SoldierData:
     """Parse a single message and convert lat/long to decimal degrees."""
     try:
-        logger.debug(f"Parsing raw data: {raw_data}")
+        packet_logger.debug("Parsing raw data: %s", raw_data)
         # Remove braces and split by commas
         data = raw_data.strip('{}').split(',')
         if len(data) != 12:
-            logger.warning(f"Invalid data length: {len(data)} fields in {raw_data}")
+            logger.warning("Invalid data length: %d fields in %s", len(data), raw_data)
             return None
 
         # Extract fields
         soldier_id = data[0]
 
-        # Convert latitude from DDMM.MMMM to decimal degrees
-        lat = float(data[1])  # e.g., 2831.50628
-        lat_deg = int(lat / 100)  # 28
-        lat_min = lat - (lat_deg * 100)  # 31.50628
-        latitude = lat_deg + (lat_min / 60)  # 28 + 31.50628/60
-
-        # Convert longitude from DDDMM.MMMM to decimal degrees
-        lon = float(data[2])  # e.g., 07716.95989
-        lon_deg = int(lon / 100)  # 77
-        lon_min = lon - (lon_deg * 100)  # 16.95989
-        longitude = lon_deg + (lon_min / 60)  # 77 + 16.95989/60
+        # Convert latitude from DDMM.MMMM and longitude from DDDMM.MMMM to decimal degrees
+        latitude = ddmm_to_decimal(float(data[1]))  # e.g., 2831.50628
+        longitude = ddmm_to_decimal(float(data[2]))  # e.g., 07716.95989
 
         # Parse remaining fields
         roll = float(data[3])
@@ -121,20 +138,27 @@ async def parse_raw_data(raw_data: str) -> SoldierData:
             trigger_event=trigger_event,
             bullet_count=bullet_count
         )
-        logger.info(f"Successfully parsed: {soldier_data}")
+        packet_logger.info("Parsed packet from soldier %s (hit_status %d)", soldier_id, hit_status)
         return soldier_data
 
     except Exception as e:
-        logger.error(f"Error parsing data: {raw_data}, Error: {e}")
+        logger.error("Error parsing data: %s, Error: %s", raw_data, e)
         return None
             
 # Repeating receive_serial_data to solve a bug on 2/06/25
-async def receive_serial_data():
+async def receive_serial_data(port: str = None, baudrate: int = None):
     """Asynchronously read and process serial data using aioserial."""
-    while not app.should_stop_realtime:
+    import aioserial  # Only the realtime ingestion path needs pyserial
+
+    # SERIAL_PORT can also be the slave end of a pty fed by debug/load_generator.py
+    port = port or settings.SERIAL_PORT
+    baudrate = baudrate or settings.SERIAL_BAUDRATE
+    parsed_packets, dropped_packets = SERIAL_PACKETS.labels(port, "parsed"), SERIAL_PACKETS.labels(port, "dropped")
+    read_bytes = SERIAL_BYTES.labels(port)
+    while not stop_requested:
         ser = None
         try:
-            ser = aioserial.AioSerial(port='/dev/ttyUSB0', baudrate=9600, timeout=1)
+            ser = aioserial.AioSerial(port=port, baudrate=baudrate, timeout=1)
             logger.info(f"Connected to {ser.port} at {ser.baudrate} baud")
             buffer = ""
             
@@ -142,17 +166,26 @@ async def receive_serial_data():
                 # Read up to 1024 bytes asynchronously
                 data = await ser.read_async(1024)
                 if data:
+                    read_at = time.monotonic()
+                    read_bytes.inc(len(data))
                     raw_data = data.decode('utf-8', errors='ignore').strip()
-                    logger.debug(f"Raw data received: {raw_data}")
+                    packet_logger.debug("Raw data received: %s", raw_data)
                     buffer += raw_data
                     
                     # Extract all complete messages within {}
                     messages = re.findall(r'\{(.*?)\}', buffer)
                     for msg in messages:
+                        trace = tracer.start(read_at)
                         soldier_data = await parse_raw_data(msg)
-                        if soldier_data:
-                            logger.info(f"Yielding parsed data: {soldier_data}")
-                            yield soldier_data.to_dict()  # Yield dictionary for Faust
+                        if not soldier_data:
+                            dropped_packets.inc()
+                        else:
+                            parsed_packets.inc()
+                            payload = soldier_data.to_dict()  # Yield dictionary for Faust
+                            if trace is not None:
+                                tracer.mark(trace, "parsed")
+                                payload["trace"] = trace
+                            yield payload
                     
                     # Remove processed messages from buffer
                     last_brace = buffer.rfind('}')
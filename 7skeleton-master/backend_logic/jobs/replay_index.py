@@ -0,0 +1,251 @@
+# backend_logic/jobs/replay_index.py
+#
+# Time-sorted, columnar index of everything a replay broadcasts for one
+# session (soldier movements, kill feed, soldier stats). It is built once in a
+# job worker straight from MongoDB, instead of re-parsing every timestamp of
+# the whole session document on the event loop for each replay window. A
+# window is then two binary searches and building only its own events.
+#
+# Movement rows (the bulk) travel as shared-memory columns; kill and stats
+# rows are few and come back pickled with the metadata.
+
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from configs.config import settings
+from backend_logic.jobs.worker_pool import SharedColumns, job_manager
+
+KIND_MOVEMENT, KIND_KILL, KIND_STATS = 0, 1, 2
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+SESSION_PROJECTION = {
+    "_id": 0,
+    "session_id": 1,
+    "end_time": 1,
+    "events": 1,
+    "participated_soldiers.soldier_id": 1,
+    "participated_soldiers.team": 1,
+    "participated_soldiers.call_sign": 1,
+    "participated_soldiers.location": 1,
+    "participated_soldiers.orientation": 1,
+    "participated_soldiers.stats": 1,
+}
+
+
+def to_microseconds(value) -> Optional[int]:
+    """Naive-UTC datetime or ISO string -> microseconds since the epoch (None if unparsable)."""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - EPOCH) // MICROSECOND
+
+
+def from_microseconds(us: int) -> datetime:
+    return EPOCH + timedelta(microseconds=int(us))
+
+
+# ───────────────────────────── WORKER SIDE ──────────────────────────────────
+def build_replay_index(session_id: str):
+    """Job function: read one session with pymongo and index it -> (SharedColumns, meta)."""
+    import numpy as np
+    from db.mongo_client import get_sync_database
+
+    session = get_sync_database(settings.DB_in)["sessions"].find_one({"session_id": session_id}, SESSION_PROJECTION)
+    if session is None:
+        raise ValueError(f"Session {session_id} not found")
+    soldiers = session.get("participated_soldiers") or []
+    if not soldiers:
+        raise ValueError("No soldiers participated in the session")
+
+    ts, kind, soldier_idx, row = [], [], [], []
+    lat, lon, roll, pitch, yaw = [], [], [], [], []
+    stats_rows, kill_rows = [], []
+    nan = float("nan")
+
+    for s, soldier in enumerate(soldiers):
+        for loc, orient in zip(soldier.get("location") or [], soldier.get("orientation") or []):
+            us = to_microseconds(loc.get("timestamp"))
+            if us is None:
+                continue
+            ts.append(us)
+            kind.append(KIND_MOVEMENT)
+            soldier_idx.append(s)
+            row.append(-1)
+            lat.append(loc.get("latitude", nan))
+            lon.append(loc.get("longitude", nan))
+            roll.append(orient.get("roll", nan))
+            pitch.append(orient.get("pitch", nan))
+            yaw.append(orient.get("yaw", nan))
+
+    def add_row(us, row_kind, s, index):
+        ts.append(us)
+        kind.append(row_kind)
+        soldier_idx.append(s)
+        row.append(index)
+        for column in (lat, lon, roll, pitch, yaw):
+            column.append(nan)
+
+    for event in session.get("events") or []:
+        us = to_microseconds(event.get("timestamp"))
+        if us is not None:
+            add_row(us, KIND_KILL, -1, len(kill_rows))
+            kill_rows.append({
+                "attacker_id": event.get("attacker_id"),
+                "attacker_call_sign": event.get("attacker_call_sign"),
+                "victim_id": event.get("victim_id"),
+                "victim_call_sign": event.get("victim_call_sign"),
+                "distance_to_victim": event.get("distance_to_victim"),
+            })
+
+    for s, soldier in enumerate(soldiers):
+        for stat in soldier.get("stats") or []:
+            us = to_microseconds(stat.get("timestamp"))
+            if us is not None:
+                add_row(us, KIND_STATS, s, len(stats_rows))
+                stats_rows.append({
+                    "health": stat.get("health"),
+                    "kills": stat.get("kill_count"),
+                    "bullets_fired": stat.get("bullets_fired"),
+                })
+
+    def as_float(values):
+        return np.array([nan if v is None else v for v in values], dtype=np.float64)
+
+    order = np.argsort(np.array(ts, dtype=np.int64), kind="stable")
+    columns = {
+        "ts": np.array(ts, dtype=np.int64)[order],
+        "kind": np.array(kind, dtype=np.int8)[order],
+        "soldier": np.array(soldier_idx, dtype=np.int32)[order],
+        "row": np.array(row, dtype=np.int32)[order],
+        "latitude": as_float(lat)[order],
+        "longitude": as_float(lon)[order],
+        "roll": as_float(roll)[order],
+        "pitch": as_float(pitch)[order],
+        "yaw": as_float(yaw)[order],
+    }
+    meta = {
+        "session_id": session_id,
+        "ended": session.get("end_time") is not None,
+        "soldiers": [
+            {"soldier_id": s.get("soldier_id", ""), "team": s.get("team", ""), "call_sign": s.get("call_sign", "")}
+            for s in soldiers
+        ],
+        "kills": kill_rows,
+        "stats": stats_rows,
+    }
+    return SharedColumns.pack(columns), meta
+
+
+# ───────────────────────────── API PROCESS SIDE ─────────────────────────────
+def _number(value: float):
+    return None if value != value else value  # NaN marks a missing value
+
+
+class ReplayIndex:
+    def __init__(self, columns: dict, meta: dict):
+        self.columns = columns
+        self.meta = meta
+        self.session_id = meta["session_id"]
+        ts = columns["ts"]
+        # Empty sessions replay nothing, starting and ending now (as before)
+        now = datetime.utcnow()
+        self.start_timestamp = from_microseconds(ts[0]) if len(ts) else now
+        self.end_timestamp = from_microseconds(ts[-1]) if len(ts) else now
+
+    def __len__(self):
+        return len(self.columns["ts"])
+
+    def window(self, start: datetime, end: datetime, include_end: bool = False) -> List[dict]:
+        """Replay events with start <= timestamp < end (<= end with include_end), in time order."""
+        ts = self.columns["ts"]
+        lo = int(ts.searchsorted(to_microseconds(start), "left"))
+        hi = int(ts.searchsorted(to_microseconds(end), "right" if include_end else "left"))
+        if lo >= hi:
+            return []
+        cols = {name: column[lo:hi].tolist() for name, column in self.columns.items()}
+        soldiers, kills, stats = self.meta["soldiers"], self.meta["kills"], self.meta["stats"]
+
+        events = []
+        for i in range(hi - lo):
+            timestamp = from_microseconds(cols["ts"][i]).isoformat()
+            kind = cols["kind"][i]
+            if kind == KIND_MOVEMENT:
+                soldier = soldiers[cols["soldier"][i]]
+                events.append({
+                    "type": "soldier_movement",
+                    **soldier,
+                    "timestamp": timestamp,
+                    "position": {
+                        "latitude": _number(cols["latitude"][i]),
+                        "longitude": _number(cols["longitude"][i]),
+                    },
+                    "orientation": {
+                        "roll": _number(cols["roll"][i]),
+                        "pitch": _number(cols["pitch"][i]),
+                        "yaw": _number(cols["yaw"][i]),
+                    },
+                })
+            elif kind == KIND_KILL:
+                events.append({"type": "kill_event", "timestamp": timestamp, **kills[cols["row"][i]]})
+            else:
+                events.append({
+                    "type": "soldier_stats",
+                    **soldiers[cols["soldier"][i]],
+                    "timestamp": timestamp,
+                    **stats[cols["row"][i]],
+                })
+        return events
+
+    def summary(self) -> dict:
+        kinds = self.columns["kind"]
+        return {
+            "session_id": self.session_id,
+            "events": len(self),
+            "movements": int((kinds == KIND_MOVEMENT).sum()),
+            "kills": len(self.meta["kills"]),
+            "stats": len(self.meta["stats"]),
+            "start": self.start_timestamp.isoformat(),
+            "end": self.end_timestamp.isoformat(),
+            "bytes": sum(column.nbytes for column in self.columns.values()),
+            "cached": self.meta["ended"],
+        }
+
+
+# Indexes of ended sessions (they no longer change), most recently used last
+_indexes: "OrderedDict[str, ReplayIndex]" = OrderedDict()
+
+
+def _loaded(raw):
+    shared, meta = raw
+    index = ReplayIndex(shared.load(), meta)
+    if meta["ended"]:
+        _indexes[index.session_id] = index
+        _indexes.move_to_end(index.session_id)
+        while len(_indexes) > settings.REPLAY_INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index, index.summary()
+
+
+def submit_build(session_id: str):
+    """Start (or join) building the replay index of a session; returns the Job."""
+    return job_manager.submit(
+        "replay_index", build_replay_index, session_id,
+        key=f"replay_index:{session_id}", params={"session_id": session_id}, on_result=_loaded
+    )
+
+
+async def get_replay_index(session_id: str) -> ReplayIndex:
+    """The cached index of an ended session, else one built by a job worker."""
+    index = _indexes.get(session_id)
+    if index is not None:
+        _indexes.move_to_end(session_id)
+        return index
+    return await submit_build(session_id).wait()
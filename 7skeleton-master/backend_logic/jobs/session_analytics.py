@@ -0,0 +1,573 @@
+# backend_logic/jobs/session_analytics.py
+#
+# After-action analytics of one session, computed in a job worker from the
+# stored telemetry and saved as precomputed artifacts (one document each) in
+# SESSION_ANALYTICS_COLLECTION, served by routes_in/analytics.py:
+#
+#   summary        session-wide totals, per-team totals and the heatmap grid
+#   movement       per soldier: distance covered, time tracked and stationary,
+#                  time per speed band, speed percentiles and a speed timeline
+#   heatmap:*      seconds spent in each grid cell, for the whole session
+#                  ("heatmap:all"), each team and each soldier
+#   engagements    distance of every kill (as recorded, else from the last fix
+#                  of attacker and victim) with per-team and per-attacker stats
+#   cohesion       per squad: how far members are from the squad centre over time
+#
+# Positions are projected to local metres once; everything after that is a
+# numpy / pandas column operation, so a multi-hour session takes seconds.
+# numpy and pandas are only imported in the worker.
+#
+# Every artifact records the session summary's persisted telemetry and kill
+# counts as of its computation. In Kafka mode the persist worker may still be
+# draining when the session ends, so the first run can see a truncated session.
+# Once the summary counts have grown past the recorded ones, the artifacts
+# are stale and are computed again (see is_stale).
+
+import time
+from datetime import datetime
+from typing import List, Optional
+from configs.config import settings
+from backend_logic.jobs.worker_pool import job_manager
+from backend_logic.jobs.replay_index import from_microseconds, to_microseconds
+
+EARTH_RADIUS_M = 6371000.0
+
+# (band, upper bound in m/s); stationary ends at ANALYTICS_STATIONARY_SPEED_MPS
+SPEED_BANDS = (("stationary", None), ("walking", 2.0), ("jogging", 4.0), ("running", float("inf")))
+ENGAGEMENT_BINS_M = (25, 50, 100, 200, 400)
+
+SESSION_PROJECTION = {
+    "_id": 0,
+    "start_time": 1,
+    "end_time": 1,
+    "events": 1,
+    "participated_soldiers.soldier_id": 1,
+    "participated_soldiers.call_sign": 1,
+    "participated_soldiers.team": 1,
+    "participated_soldiers.squad": 1,
+    "participated_soldiers.location": 1,
+}
+# Session summary counters that grow with every persisted fix / kill
+SOURCE_FIELDS = ("data_points", "kill_total")
+
+
+def _rounded(values, digits: int = 2) -> list:
+    """numpy values -> JSON/BSON-friendly floats, NaN as None."""
+    return [None if v != v else round(v, digits) for v in values.tolist()]
+
+
+def _number(value, digits: int = 2):
+    value = float(value)
+    return None if value != value else round(value, digits)
+
+
+# ───────────────────────────── WORKER SIDE ──────────────────────────────────
+def _roster(soldiers: list):
+    import pandas as pd
+    return pd.DataFrame({
+        "soldier_id": [str(s.get("soldier_id", "")) for s in soldiers],
+        "call_sign": [s.get("call_sign", "") for s in soldiers],
+        "team": [(s.get("team") or "").lower() for s in soldiers],
+        "squad": pd.Series([s.get("squad") for s in soldiers], dtype=object),  # None for legacy sessions
+    })
+
+
+def _fixes(soldiers: list):
+    """Every usable GPS fix: soldier (roster row), us, lat, lon; sorted by soldier then time."""
+    import numpy as np
+    import pandas as pd
+
+    soldier_idx, stamps, lat, lon = [], [], [], []
+    for s, soldier in enumerate(soldiers):
+        locations = soldier.get("location") or []
+        soldier_idx.extend([s] * len(locations))
+        stamps.extend([loc.get("timestamp") for loc in locations])
+        lat.extend([loc.get("latitude") for loc in locations])
+        lon.extend([loc.get("longitude") for loc in locations])
+
+    # One vectorized parse instead of to_microseconds() per fix; like it, naive
+    # values are taken as UTC and anything unparsable is dropped below
+    parsed = pd.to_datetime(pd.Series(stamps, dtype=object), utc=True, format="ISO8601", errors="coerce")
+    fixes = pd.DataFrame({
+        "soldier": np.array(soldier_idx, dtype=np.int32),
+        "us": ((parsed - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(microseconds=1)).to_numpy(),
+        "lat": np.array(lat, dtype=np.float64),  # None -> NaN
+        "lon": np.array(lon, dtype=np.float64),
+    })
+    # (0, 0) is what a receiver without a fix reports
+    usable = (
+        fixes["us"].notna() & np.isfinite(fixes["lat"]) & np.isfinite(fixes["lon"])
+        & (fixes["lat"].abs() <= 90) & (fixes["lon"].abs() <= 180)
+        & ~((fixes["lat"] == 0) & (fixes["lon"] == 0))
+    )
+    fixes = fixes[usable].astype({"us": np.int64}).sort_values(["soldier", "us"], kind="stable")
+    return fixes.drop_duplicates(["soldier", "us"], keep="last").reset_index(drop=True)
+
+
+def _project(fixes, start_us: int) -> dict:
+    """Add local metres (x east, y north) and seconds since `start_us`; returns the projection origin."""
+    import numpy as np
+    # Equirectangular around the mean position, as in engagement_geometry.py;
+    # exercise areas are a few km wide, well within GPS noise of a geodesic
+    ref_lat = float(np.radians(fixes["lat"].mean())) if len(fixes) else 0.0
+    ref_lon = float(np.radians(fixes["lon"].mean())) if len(fixes) else 0.0
+    fixes["x"] = (np.radians(fixes["lon"].to_numpy()) - ref_lon) * np.cos(ref_lat) * EARTH_RADIUS_M
+    fixes["y"] = (np.radians(fixes["lat"].to_numpy()) - ref_lat) * EARTH_RADIUS_M
+    fixes["t"] = (fixes["us"].to_numpy() - start_us) / 1e6
+    return {"ref_lat": ref_lat, "ref_lon": ref_lon}
+
+
+def _to_degrees(origin: dict, x: float, y: float) -> dict:
+    import math
+    return {
+        "latitude": math.degrees(origin["ref_lat"] + y / EARTH_RADIUS_M),
+        "longitude": math.degrees(origin["ref_lon"] + x / (EARTH_RADIUS_M * math.cos(origin["ref_lat"]))),
+    }
+
+
+def _steps(fixes):
+    """
+    Add each fix's step to the soldier's next fix: dt (s), dist (m) and speed
+    (m/s). Gaps over ANALYTICS_MAX_GAP_SECONDS and GPS jumps faster than
+    ANALYTICS_MAX_SPEED_MPS are not steps (dt and dist 0, speed NaN).
+    """
+    import numpy as np
+    soldier, t = fixes["soldier"].to_numpy(), fixes["t"].to_numpy()
+    x, y = fixes["x"].to_numpy(), fixes["y"].to_numpy()
+    dt = np.full(len(fixes), np.nan)
+    dist = np.full(len(fixes), np.nan)
+    if len(fixes) > 1:
+        same = soldier[1:] == soldier[:-1]
+        dt[:-1] = np.where(same, np.diff(t), np.nan)
+        dist[:-1] = np.where(same, np.hypot(np.diff(x), np.diff(y)), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        speed = dist / dt
+    step = (dt > 0) & (dt <= settings.ANALYTICS_MAX_GAP_SECONDS) & (speed <= settings.ANALYTICS_MAX_SPEED_MPS)
+    fixes["dt"] = np.where(step, dt, 0.0)
+    fixes["dist"] = np.where(step, dist, 0.0)
+    fixes["speed"] = np.where(step, speed, np.nan)
+
+
+def _movement(fixes, roster, timeline_buckets: int) -> dict:
+    import numpy as np
+    import pandas as pd
+
+    steps = fixes[fixes["dt"] > 0]
+    bounds = [settings.ANALYTICS_STATIONARY_SPEED_MPS] + [bound for _, bound in SPEED_BANDS[1:-1]]
+    band_names = [name for name, _ in SPEED_BANDS]
+    bands = steps.assign(band=np.digitize(steps["speed"].to_numpy(), bounds)).pivot_table(
+        index="soldier", columns="band", values="dt", aggfunc="sum", fill_value=0.0
+    ).reindex(index=roster.index, columns=range(len(band_names)), fill_value=0.0)
+
+    by_soldier = steps.groupby("soldier")
+    totals = pd.DataFrame({
+        "fixes": fixes.groupby("soldier").size(),
+        "distance_m": by_soldier["dist"].sum(),
+        "tracked_s": by_soldier["dt"].sum(),
+        "p50_speed": by_soldier["speed"].quantile(0.5),
+        "p90_speed": by_soldier["speed"].quantile(0.9),
+        "max_speed": by_soldier["speed"].max(),
+    }).reindex(roster.index)
+    totals[["fixes", "distance_m", "tracked_s"]] = totals[["fixes", "distance_m", "tracked_s"]].fillna(0)
+    totals["stationary_s"] = bands[0].to_numpy()
+    moving_s = totals["tracked_s"] - totals["stationary_s"]
+    totals["mean_moving_speed"] = (totals["distance_m"] / moving_s).where(moving_s > 0)
+    totals["stationary_share"] = (totals["stationary_s"] / totals["tracked_s"]).where(totals["tracked_s"] > 0)
+
+    # Mean speed per timeline bucket: distance over tracked time in that bucket
+    bucket = (steps["t"] // settings.ANALYTICS_TIMELINE_SECONDS).astype(np.int64)
+    per_bucket = steps.assign(bucket=bucket).groupby(["soldier", "bucket"])[["dist", "dt"]].sum()
+    timeline = (per_bucket["dist"] / per_bucket["dt"]).unstack("bucket").reindex(
+        index=roster.index, columns=range(timeline_buckets)
+    )
+
+    soldiers = []
+    for s, soldier in enumerate(roster.to_dict("records")):  # Native Python values, as BSON needs
+        row = totals.loc[s]
+        soldiers.append({
+            "soldier_id": soldier["soldier_id"],
+            "call_sign": soldier["call_sign"],
+            "team": soldier["team"],
+            "squad": soldier["squad"],
+            "fixes": int(row["fixes"]),
+            "distance_m": _number(row["distance_m"], 1),
+            "tracked_s": _number(row["tracked_s"], 1),
+            "stationary_s": _number(row["stationary_s"], 1),
+            "stationary_share": _number(row["stationary_share"], 3),
+            "mean_moving_speed_mps": _number(row["mean_moving_speed"]),
+            "p50_speed_mps": _number(row["p50_speed"]),
+            "p90_speed_mps": _number(row["p90_speed"]),
+            "max_speed_mps": _number(row["max_speed"]),
+            "band_seconds": dict(zip(band_names, _rounded(bands.loc[s].to_numpy(), 1))),
+            "speed_timeline_mps": _rounded(timeline.loc[s].to_numpy()),
+        })
+
+    teams = {}
+    for team, group in totals.groupby(roster["team"]):
+        tracked = float(group["tracked_s"].sum())
+        teams[team] = {
+            "soldiers": len(group),
+            "distance_m": _number(group["distance_m"].sum(), 1),
+            "mean_distance_m": _number(group["distance_m"].mean(), 1),
+            "stationary_share": _number(group["stationary_s"].sum() / tracked, 3) if tracked else None,
+        }
+
+    lower = 0.0
+    band_ranges = {}
+    for name, upper in zip(band_names, bounds + [None]):
+        band_ranges[name] = [lower, upper]  # m/s, upper None = unbounded
+        lower = upper
+    return {"speed_bands_mps": band_ranges, "teams": teams, "soldiers": soldiers}
+
+
+def _heatmaps(fixes, roster, origin: dict, cell_m: float):
+    """(grid, {name: heatmap}) of seconds spent per cell; cells are sparse [row, col, seconds]."""
+    import numpy as np
+
+    steps = fixes[fixes["dt"] > 0]
+    if steps.empty:
+        return None, {}
+    x0, y0 = float(steps["x"].min()), float(steps["y"].min())
+    cells = steps.assign(
+        row=((steps["y"] - y0) // cell_m).astype(np.int64),
+        col=((steps["x"] - x0) // cell_m).astype(np.int64),
+        team=roster["team"].to_numpy()[steps["soldier"].to_numpy()],
+    )
+    grid = {
+        "cell_m": cell_m,
+        "rows": int(cells["row"].max()) + 1,
+        "cols": int(cells["col"].max()) + 1,
+        "origin": _to_degrees(origin, x0, y0),  # South-west corner of cell [0, 0]; rows go north, cols east
+    }
+
+    def sparse(seconds) -> dict:
+        rows = seconds.index.get_level_values("row").to_numpy()
+        cols = seconds.index.get_level_values("col").to_numpy()
+        values = np.round(seconds.to_numpy(), 1)
+        return {
+            "total_s": _number(values.sum(), 1),
+            "max_s": _number(values.max(), 1),
+            "cells": np.column_stack([rows, cols, values]).tolist(),
+        }
+
+    heatmaps = {"all": sparse(cells.groupby(["row", "col"])["dt"].sum())}
+    for team, seconds in cells.groupby(["team", "row", "col"])["dt"].sum().groupby(level="team"):
+        heatmaps[f"team:{team}"] = sparse(seconds)
+    soldier_ids = roster["soldier_id"].to_numpy()
+    for s, seconds in cells.groupby(["soldier", "row", "col"])["dt"].sum().groupby(level="soldier"):
+        heatmaps[f"soldier:{soldier_ids[s]}"] = sparse(seconds)
+    return grid, heatmaps
+
+
+def _distance_stats(distances) -> dict:
+    import numpy as np
+    distances = distances[np.isfinite(distances)]
+    edges = [0, *ENGAGEMENT_BINS_M, np.inf]
+    labels = [f"{lo}-{hi}" for lo, hi in zip(edges[:-2], edges[1:-1])] + [f"{ENGAGEMENT_BINS_M[-1]}+"]
+    counts = np.histogram(distances, bins=edges)[0] if len(distances) else np.zeros(len(labels), dtype=int)
+    stats = {"count": int(len(distances)), "histogram_m": dict(zip(labels, counts.tolist()))}
+    if len(distances):
+        stats.update({
+            "mean_m": _number(distances.mean(), 1),
+            "median_m": _number(np.median(distances), 1),
+            "p90_m": _number(np.quantile(distances, 0.9), 1),
+            "min_m": _number(distances.min(), 1),
+            "max_m": _number(distances.max(), 1),
+        })
+    return stats
+
+
+def _engagements(events: list, fixes, roster, start_us: int) -> dict:
+    import numpy as np
+    import pandas as pd
+
+    index_of = {soldier_id: s for s, soldier_id in enumerate(roster["soldier_id"])}
+    rows = []
+    for event in events:
+        us = to_microseconds(event.get("timestamp"))
+        if us is None:
+            continue
+        recorded = event.get("distance_to_victim (in meters)", event.get("distance_to_victim"))
+        rows.append({
+            "us": us,
+            "attacker": index_of.get(str(event.get("attacker_id")), -1),
+            "victim": index_of.get(str(event.get("victim_id")), -1),
+            "attacker_id": str(event.get("attacker_id")),
+            "victim_id": str(event.get("victim_id")),
+            "attacker_call_sign": event.get("attacker_call_sign"),
+            "victim_call_sign": event.get("victim_call_sign"),
+            "recorded_m": np.nan if recorded is None else float(recorded),
+        })
+    if not rows:
+        return {"overall": _distance_stats(np.array([])), "teams": {}, "attackers": [], "kills": []}
+
+    kills = pd.DataFrame(rows).astype({"attacker": np.int32, "victim": np.int32}).sort_values("us", kind="stable")
+    # Last fix of each side at or before the kill (within the gap limit)
+    positions = fixes[["us", "soldier", "x", "y"]].sort_values("us", kind="stable")
+    tolerance = int(settings.ANALYTICS_MAX_GAP_SECONDS * 1e6)
+    for side in ("attacker", "victim"):
+        located = pd.merge_asof(
+            kills[["us", side]], positions, on="us", left_by=side, right_by="soldier",
+            direction="backward", tolerance=tolerance
+        )
+        kills[f"{side}_x"], kills[f"{side}_y"] = located["x"].to_numpy(), located["y"].to_numpy()
+    from_positions = np.hypot(kills["attacker_x"] - kills["victim_x"], kills["attacker_y"] - kills["victim_y"])
+    kills["distance_m"] = kills["recorded_m"].where(kills["recorded_m"].notna(), from_positions)
+    kills["source"] = np.where(kills["recorded_m"].notna(), "recorded",
+                               np.where(from_positions.notna(), "positions", None))
+    teams = roster["team"].to_numpy()
+    kills["attacker_team"] = np.where(kills["attacker"] >= 0, teams[kills["attacker"].clip(lower=0)], "")
+
+    distances = kills["distance_m"].to_numpy(dtype=np.float64)
+    # "count" is kills with a known distance; "kills" counts every kill of the team
+    by_team = {
+        team: dict(_distance_stats(group["distance_m"].to_numpy(dtype=np.float64)), kills=len(group))
+        for team, group in kills.groupby("attacker_team") if team
+    }
+    attackers = [
+        {
+            "soldier_id": soldier_id,
+            "call_sign": group["attacker_call_sign"].iloc[0],
+            "kills": len(group),
+            "mean_distance_m": _number(group["distance_m"].mean(), 1),
+            "max_distance_m": _number(group["distance_m"].max(), 1),
+        }
+        for soldier_id, group in kills.groupby("attacker_id")
+    ]
+    attackers.sort(key=lambda a: a["kills"], reverse=True)
+    return {
+        "overall": _distance_stats(distances),
+        "teams": by_team,
+        "attackers": attackers,
+        "kills": [
+            {
+                "t_s": round((us - start_us) / 1e6, 3),
+                "attacker_id": attacker_id,
+                "attacker_call_sign": attacker_call_sign,
+                "attacker_team": attacker_team,
+                "victim_id": victim_id,
+                "victim_call_sign": victim_call_sign,
+                "distance_m": None if distance != distance else round(distance, 1),
+                "source": source,
+            }
+            for us, attacker_id, attacker_call_sign, attacker_team, victim_id, victim_call_sign, distance, source
+            in zip(kills["us"].tolist(), kills["attacker_id"], kills["attacker_call_sign"], kills["attacker_team"],
+                   kills["victim_id"], kills["victim_call_sign"], distances.tolist(), kills["source"])
+        ],
+    }
+
+
+def _cohesion(fixes, roster, timeline_buckets: int) -> dict:
+    """
+    Every ANALYTICS_COHESION_SECONDS, each squad member's latest fix is compared
+    with the squad centre (mean position of the members seen in that interval).
+    """
+    import numpy as np
+
+    interval = settings.ANALYTICS_COHESION_SECONDS
+    squads = roster["squad"].to_numpy()
+    snapshot = fixes.assign(bucket=(fixes["t"] // interval).astype(np.int64))
+    snapshot = snapshot.groupby(["soldier", "bucket"])[["x", "y"]].last().reset_index()
+    snapshot["team"] = roster["team"].to_numpy()[snapshot["soldier"].to_numpy()]
+    snapshot["squad"] = squads[snapshot["soldier"].to_numpy()]
+    snapshot = snapshot[snapshot["squad"].notna()]
+
+    keys = ["team", "squad", "bucket"]
+    grouped = snapshot.groupby(keys)
+    snapshot = snapshot.assign(
+        members=grouped["x"].transform("size"),
+        spread=np.hypot(snapshot["x"] - grouped["x"].transform("mean"),
+                        snapshot["y"] - grouped["y"].transform("mean")),
+    )
+    snapshot = snapshot[snapshot["members"] >= 2]  # A lone member has no squad to keep up with
+    if snapshot.empty:
+        return {"interval_s": interval, "radius_m": settings.ANALYTICS_COHESION_RADIUS_M, "squads": []}
+
+    per_interval = snapshot.groupby(keys).agg(
+        members=("soldier", "size"), mean_m=("spread", "mean"), max_m=("spread", "max")
+    ).reset_index()
+    per_interval["together"] = per_interval["max_m"] <= settings.ANALYTICS_COHESION_RADIUS_M
+    per_interval["timeline"] = (per_interval["bucket"] * interval // settings.ANALYTICS_TIMELINE_SECONDS).astype(np.int64)
+
+    by_squad = per_interval.groupby(["team", "squad"])
+    summary = by_squad.agg(
+        intervals=("bucket", "size"),
+        mean_members=("members", "mean"),
+        mean_spread_m=("mean_m", "mean"),
+        max_spread_m=("max_m", "max"),
+        together_share=("together", "mean"),
+    )
+    summary["p90_spread_m"] = by_squad["mean_m"].quantile(0.9)
+    timeline = per_interval.groupby(["team", "squad", "timeline"])["mean_m"].mean().unstack("timeline").reindex(
+        columns=range(timeline_buckets)
+    )
+
+    return {
+        "interval_s": interval,
+        "radius_m": settings.ANALYTICS_COHESION_RADIUS_M,
+        "squads": [
+            {
+                "team": team,
+                "squad": int(squad),
+                "intervals": int(row["intervals"]),
+                "mean_members": _number(row["mean_members"]),
+                "mean_spread_m": _number(row["mean_spread_m"], 1),
+                "p90_spread_m": _number(row["p90_spread_m"], 1),
+                "max_spread_m": _number(row["max_spread_m"], 1),
+                "together_share": _number(row["together_share"], 3),
+                "spread_timeline_m": _rounded(timeline.loc[(team, squad)].to_numpy(), 1),
+            }
+            for (team, squad), row in summary.iterrows()
+        ],
+    }
+
+
+def analyze(session: dict, cell_m: float) -> dict:
+    """Every artifact of a session document (SESSION_PROJECTION fields) -> {name: data}."""
+    import numpy as np
+
+    started = time.perf_counter()
+    soldiers = session.get("participated_soldiers") or []
+    if not soldiers:
+        raise ValueError("No soldiers participated in the session")
+
+    roster = _roster(soldiers)
+    fixes = _fixes(soldiers)
+    start_us = to_microseconds(session.get("start_time"))
+    if start_us is None or (len(fixes) and fixes["us"].min() < start_us):
+        start_us = int(fixes["us"].min()) if len(fixes) else 0
+    end_us = to_microseconds(session.get("end_time")) or (int(fixes["us"].max()) if len(fixes) else start_us)
+    duration_s = max((end_us - start_us) / 1e6, 0.0)
+    timeline_buckets = int(np.ceil(duration_s / settings.ANALYTICS_TIMELINE_SECONDS)) or 1
+
+    origin = _project(fixes, start_us)
+    _steps(fixes)
+    movement = _movement(fixes, roster, timeline_buckets)
+    grid, heatmaps = _heatmaps(fixes, roster, origin, cell_m)
+    engagements = _engagements(session.get("events") or [], fixes, roster, start_us)
+    cohesion = _cohesion(fixes, roster, timeline_buckets)
+
+    timeline = {
+        "start": from_microseconds(start_us).isoformat(),
+        "bucket_s": settings.ANALYTICS_TIMELINE_SECONDS,
+        "buckets": timeline_buckets,
+    }
+    movement["timeline"] = cohesion["timeline"] = timeline
+    kills_by_team = {team: stats["kills"] for team, stats in engagements["teams"].items()}
+    summary = {
+        "ended": session.get("end_time") is not None,
+        "start": timeline["start"],
+        "end": from_microseconds(end_us).isoformat(),
+        "duration_s": round(duration_s, 1),
+        "soldiers": len(roster),
+        "fixes": int(len(fixes)),
+        "kills": len(engagements["kills"]),
+        "distance_m": _number(fixes["dist"].sum(), 1),
+        "grid": grid,
+        "teams": {
+            team: dict(totals, kills=kills_by_team.get(team, 0)) for team, totals in movement["teams"].items()
+        },
+        "engagement_distance": engagements["overall"],
+        "heatmaps": sorted(heatmaps),
+    }
+
+    artifacts = {"movement": movement, "engagements": engagements, "cohesion": cohesion}
+    artifacts.update({f"heatmap:{name}": dict(heatmap, grid=grid) for name, heatmap in heatmaps.items()})
+    summary["compute_s"] = round(time.perf_counter() - started, 3)
+    artifacts["summary"] = summary
+    return artifacts
+
+
+def compute_session_analytics(session_id: str, cell_m: float) -> dict:
+    """Job function: read a session with pymongo, analyze it and store the artifacts -> its summary."""
+    from pymongo import ReplaceOne
+    from db.mongo_client import get_sync_database
+
+    db = get_sync_database(settings.DB_in)
+    # Read before the session, so the session holds at least what these counted
+    source = _source_counts(db[settings.SESSION_SUMMARY_COLLECTION].find_one({"session_id": session_id}))
+    session = db["sessions"].find_one({"session_id": session_id}, SESSION_PROJECTION)
+    if session is None:
+        raise ValueError(f"Session {session_id} not found")
+    artifacts = analyze(session, cell_m)
+
+    computed_at = datetime.utcnow()
+    collection = db[settings.SESSION_ANALYTICS_COLLECTION]
+    collection.bulk_write([
+        ReplaceOne(
+            {"_id": _artifact_id(session_id, name)},
+            {"session_id": session_id, "artifact": name, "cell_m": cell_m, "computed_at": computed_at,
+             "source": source, "data": data},
+            upsert=True
+        )
+        for name, data in artifacts.items()
+    ], ordered=False)
+    # A running job cannot be cancelled. If the session was deleted while it ran,
+    # remove what was just written. DELETE /api/sessions/{id} deletes the session
+    # before its artifacts, so a delete that lands after this check also removes them.
+    if db["sessions"].count_documents({"session_id": session_id}, limit=1) == 0:
+        collection.delete_many({"session_id": session_id})
+        raise ValueError(f"Session {session_id} was deleted during the computation")
+    # Artifacts of an earlier run that this one did not produce (e.g. a soldier's heatmap)
+    collection.delete_many({"session_id": session_id, "computed_at": {"$ne": computed_at}})
+    return dict(artifacts["summary"], session_id=session_id, artifacts=len(artifacts))
+
+
+def _source_counts(summary: Optional[dict]) -> dict:
+    return {field: int((summary or {}).get(field) or 0) for field in SOURCE_FIELDS}
+
+
+# ───────────────────────────── API PROCESS SIDE ─────────────────────────────
+def _artifact_id(session_id: str, name: str) -> str:
+    return f"{session_id}:{name}"
+
+
+def _job_key(session_id: str) -> str:
+    return f"session_analytics:{session_id}"
+
+
+def submit(session_id: str, cell_m: float = None):
+    """Start (or join) the analytics computation of a session; returns the Job."""
+    cell_m = float(cell_m or settings.ANALYTICS_CELL_METERS)
+    return job_manager.submit(
+        "session_analytics", compute_session_analytics, session_id, cell_m,
+        key=_job_key(session_id), params={"session_id": session_id, "cell_m": cell_m}
+    )
+
+
+def running_job(session_id: str):
+    return job_manager.running(_job_key(session_id))
+
+
+async def load_artifact(db, session_id: str, name: str) -> Optional[dict]:
+    """A stored artifact with when and at which cell size it was computed, or None."""
+    doc = await db[settings.SESSION_ANALYTICS_COLLECTION].find_one({"_id": _artifact_id(session_id, name)})
+    if doc is None:
+        return None
+    return {"session_id": session_id, "computed_at": doc["computed_at"], "cell_m": doc["cell_m"],
+            "source": doc.get("source"), **doc["data"]}
+
+
+async def is_stale(db, session_id: str, artifact: dict) -> bool:
+    """
+    True when fixes or kills of an ended session were persisted after `artifact`
+    was computed. Live sessions are not checked: they change all the time.
+    """
+    summary = await db[settings.SESSION_SUMMARY_COLLECTION].find_one(
+        {"session_id": session_id}, {"_id": 0, "end_time": 1, **{field: 1 for field in SOURCE_FIELDS}}
+    )
+    if summary is None or summary.get("end_time") is None:
+        return False
+    recorded = artifact.get("source") or {}
+    return any(count > recorded.get(field, 0) for field, count in _source_counts(summary).items())
+
+
+async def heatmap_names(db, session_id: str) -> List[str]:
+    cursor = db[settings.SESSION_ANALYTICS_COLLECTION].find(
+        {"session_id": session_id, "artifact": {"$regex": "^heatmap:"}}, {"artifact": 1}
+    )
+    return sorted([doc["artifact"][len("heatmap:"):] async for doc in cursor])
+
+
+async def delete_artifacts(db, session_id: str):
+    await db[settings.SESSION_ANALYTICS_COLLECTION].delete_many({"session_id": session_id})
@@ -0,0 +1,208 @@
+# backend_logic/jobs/worker_pool.py
+#
+# Process pool for CPU-heavy work (replay index builds, session analytics), so
+# it never runs on the API event loop. Every submission becomes a tracked Job
+# (status, timings, result summary or error) served by routes_in/jobs.py.
+#
+# Workers are spawned, not forked: the API process has running threads (log
+# listener, loop watchdog, Motor) that a fork would copy mid-flight. Job
+# functions must therefore be importable module-level functions, and they
+# open their own blocking pymongo client (db.mongo_client.get_sync_database)
+# instead of receiving large documents through the pipe.
+#
+# Columnar results come back through shared memory: the worker packs numpy
+# arrays into one SharedMemory block and returns a SharedColumns (block name
+# and layout); the parent copies the columns out and unlinks the block.
+#
+# JOB_WORKERS=0 runs jobs on a thread instead (small deployments, debugging).
+
+import asyncio
+import itertools
+import multiprocessing
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+from configs.config import settings
+from configs.logging_config import fastapi_logger as logger
+
+if TYPE_CHECKING:  # numpy is only imported where columns are packed or loaded
+    import numpy
+
+# ───────────────────────────── SHARED MEMORY ────────────────────────────────
+class SharedColumns:
+    """Named numpy columns packed into one shared memory block (picklable handle)."""
+
+    def __init__(self, name: str, layout: List[Tuple[str, str, int, int]], size: int):
+        self.name = name
+        self.layout = layout  # (column, dtype, length, byte offset)
+        self.size = size
+
+    @classmethod
+    def pack(cls, columns: Dict[str, "numpy.ndarray"]) -> "SharedColumns":
+        """Copy `columns` into a new block (worker side). The block outlives this process until load()."""
+        from multiprocessing import shared_memory
+        import numpy as np
+        layout, offset = [], 0
+        for name, column in columns.items():
+            offset = (offset + 7) // 8 * 8  # Keep every column 8-byte aligned
+            layout.append((name, column.dtype.str, len(column), offset))
+            offset += column.nbytes
+        block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        try:
+            for (name, dtype, length, start), column in zip(layout, columns.values()):
+                np.ndarray(length, dtype=dtype, buffer=block.buf, offset=start)[:] = column
+        finally:
+            block.close()
+        return cls(block.name, layout, offset)
+
+    def load(self) -> Dict[str, "numpy.ndarray"]:
+        """Copy the columns out and free the block (parent side, exactly once)."""
+        from multiprocessing import shared_memory
+        import numpy as np
+        block = shared_memory.SharedMemory(name=self.name)
+        try:
+            return {
+                name: np.ndarray(length, dtype=dtype, buffer=block.buf, offset=start).copy()
+                for name, dtype, length, start in self.layout
+            }
+        finally:
+            block.close()
+            block.unlink()
+
+
+# ───────────────────────────── JOBS ─────────────────────────────────────────
+def _run(fn: Callable, args: tuple):
+    """Runs in the worker: the job plus the time it actually started (queueing excluded)."""
+    started = time.time()
+    return started, fn(*args)
+
+
+class Job:
+    def __init__(self, job_id: str, kind: str, key: Optional[str], params: dict):
+        self.id = job_id
+        self.kind = kind
+        self.key = key
+        self.params = params
+        self.status = "running"  # Handed to the pool; started_at is known once it finishes
+        self.submitted_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.summary: Optional[dict] = None  # JSON-friendly outcome for the job API
+        self.value = None  # Full in-process result (e.g. a ReplayIndex), never serialized
+        self.error: Optional[str] = None
+        self.exception: Optional[BaseException] = None
+        self._done = asyncio.Event()
+
+    async def wait(self):
+        """The job's value once finished; re-raises the job's exception if it failed."""
+        await self._done.wait()
+        if self.exception is not None:
+            raise self.exception
+        return self.value
+
+    def to_dict(self) -> dict:
+        duration = None
+        if self.started_at and self.finished_at:
+            duration = round((self.finished_at - self.started_at).total_seconds(), 3)
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration_s": duration,
+            "result": self.summary,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    def __init__(self, workers: int = settings.JOB_WORKERS, history: int = settings.JOB_HISTORY):
+        self.workers = workers
+        self.history = history
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active: Dict[str, Job] = {}  # key -> running job, for de-duplication
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._ids = itertools.count(1)
+
+    @property
+    def executor(self) -> Optional[ProcessPoolExecutor]:
+        if self._executor is None and self.workers > 0:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def submit(self, kind: str, fn: Callable, *args, key: str = None, params: dict = None,
+               on_result: Callable = None) -> Job:
+        """
+        Run `fn(*args)` in a worker. `on_result(raw)` runs back on the event loop
+        and returns (value, summary); without it the raw result is both. A job
+        with the same `key` that is still running is returned instead
+        of starting another.
+        """
+        if key is not None and key in self._active:
+            return self._active[key]
+        job = Job(f"{kind}-{next(self._ids)}", kind, key, params or {})
+        self.jobs[job.id] = job
+        while len(self.jobs) > self.history:
+            oldest = next(iter(self.jobs.values()))
+            if oldest.status == "running":
+                break
+            self.jobs.popitem(last=False)
+        if key is not None:
+            self._active[key] = job
+
+        loop = asyncio.get_running_loop()
+        if self.executor is not None:
+            future = loop.run_in_executor(self.executor, _run, fn, args)
+        else:
+            future = loop.run_in_executor(None, _run, fn, args)  # JOB_WORKERS=0: a thread of the default pool
+        loop.create_task(self._finish(job, future, on_result))
+        return job
+
+    async def _finish(self, job: Job, future, on_result: Optional[Callable]):
+        try:
+            started, raw = await future
+            job.started_at = datetime.utcfromtimestamp(started)
+            if on_result is not None:
+                job.value, job.summary = on_result(raw)
+            else:
+                job.value = job.summary = raw
+            job.status = "done"
+        except Exception as e:
+            job.status = "failed"
+            job.exception = e
+            job.error = f"{type(e).__name__}: {e}"
+            logger.error("Job %s failed: %s", job.id, job.error, exc_info=e)
+            if isinstance(e, BrokenProcessPool):
+                # A worker died (e.g. killed for memory); later jobs get a fresh pool
+                self.shutdown()
+        finally:
+            job.finished_at = datetime.utcnow()
+            if job.key is not None and self._active.get(job.key) is job:
+                del self._active[job.key]
+            job._done.set()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def running(self, key: str) -> Optional[Job]:
+        """The job still running under `key`, if any."""
+        return self._active.get(key)
+
+    def list(self, kind: str = None) -> List[Job]:
+        return [job for job in reversed(self.jobs.values()) if kind is None or job.kind == kind]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+job_manager = JobManager()
@@ -0,0 +1,118 @@
+# backend_logic/routes_in/analytics.py
+#
+# After-action analytics of a session: (re)computation in the worker pool and
+# the precomputed artifacts of backend_logic/jobs/session_analytics.py.
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from db.mongodb_handler import get_db_in
+from backend_logic.jobs import session_analytics
+
+router = APIRouter(
+    prefix="/api/sessions",
+    tags=["session_analytics"]
+)
+
+
+async def _refresh_if_stale(db: AsyncIOMotorDatabase, session_id: str, artifact: dict) -> dict:
+    # Fixes or kills persisted after the computation (e.g. by the Kafka persist
+    # worker draining after the end): serve this one, recompute in the background
+    artifact["stale"] = await session_analytics.is_stale(db, session_id, artifact)
+    if artifact["stale"]:
+        session_analytics.submit(session_id, artifact["cell_m"])
+    return artifact
+
+
+async def _artifact(db: AsyncIOMotorDatabase, session_id: str, name: str) -> dict:
+    artifact = await session_analytics.load_artifact(db, session_id, name)
+    if artifact is not None:
+        return await _refresh_if_stale(db, session_id, artifact)
+    job = session_analytics.running_job(session_id)
+    if job is not None:
+        detail = f"Analytics of session {session_id} are still being computed (job {job.id})"
+    else:
+        detail = f"No analytics for session {session_id}; POST /api/sessions/{session_id}/analytics to compute them"
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=detail)
+
+
+# Compute (or recompute, e.g. with another heatmap cell size) a session's
+# analytics; joins a computation already running for that session
+@router.post("/{session_id}/analytics", response_model=dict, status_code=status.HTTP_202_ACCEPTED)
+async def compute_analytics(
+    session_id: str,
+    cell_m: Optional[float] = Query(None, gt=0, le=1000, description="Heatmap cell size in metres"),
+    db: AsyncIOMotorDatabase = Depends(get_db_in)
+):
+    if await db.sessions.count_documents({"session_id": session_id}, limit=1) == 0:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
+    return session_analytics.submit(session_id, cell_m).to_dict()
+
+
+# ───────────────────────────── ARTIFACTS ────────────────────────────────────
+@router.get("/{session_id}/analytics", response_model=dict)
+async def get_analytics_summary(session_id: str, db: AsyncIOMotorDatabase = Depends(get_db_in)):
+    """Session-wide totals, per-team totals, the heatmap grid and the available heatmaps."""
+    summary = await _artifact(db, session_id, "summary")
+    job = session_analytics.running_job(session_id)
+    summary["recomputing"] = job.to_dict() if job is not None else None
+    return summary
+
+
+@router.get("/{session_id}/analytics/movement", response_model=dict)
+async def get_movement(
+    session_id: str,
+    soldier_id: Optional[str] = None,
+    db: AsyncIOMotorDatabase = Depends(get_db_in)
+):
+    """Distance, stationary time and speed profile of every soldier (or just `soldier_id`)."""
+    movement = await _artifact(db, session_id, "movement")
+    if soldier_id is not None:
+        movement["soldiers"] = [s for s in movement["soldiers"] if s["soldier_id"] == soldier_id]
+        if not movement["soldiers"]:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail=f"Soldier {soldier_id} not in session {session_id}")
+    return movement
+
+
+@router.get("/{session_id}/analytics/heatmap", response_model=dict)
+async def get_heatmap(
+    session_id: str,
+    team: Optional[str] = None,
+    soldier_id: Optional[str] = None,
+    db: AsyncIOMotorDatabase = Depends(get_db_in)
+):
+    """
+    Seconds spent per grid cell as sparse [row, col, seconds] triples, for
+    the whole session, one team or one soldier.
+    """
+    if team is not None and soldier_id is not None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Give either team or soldier_id")
+    if soldier_id is not None:
+        name = f"heatmap:soldier:{soldier_id}"
+    elif team is not None:
+        name = f"heatmap:team:{team.lower()}"
+    else:
+        name = "heatmap:all"
+    artifact = await session_analytics.load_artifact(db, session_id, name)
+    if artifact is None:
+        available = await session_analytics.heatmap_names(db, session_id)
+        if available:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail=f"No such heatmap; available: {', '.join(available)}")
+        await _artifact(db, session_id, "summary")  # Raises if not computed (yet)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f"Session {session_id} has no tracked movement to map")
+    return await _refresh_if_stale(db, session_id, artifact)
+
+
+@router.get("/{session_id}/analytics/engagements", response_model=dict)
+async def get_engagements(session_id: str, db: AsyncIOMotorDatabase = Depends(get_db_in)):
+    """Distance of every kill, with distance statistics overall, per team and per attacker."""
+    return await _artifact(db, session_id, "engagements")
+
+
+@router.get("/{session_id}/analytics/cohesion", response_model=dict)
+async def get_cohesion(session_id: str, db: AsyncIOMotorDatabase = Depends(get_db_in)):
+    """Per squad: spread of members around the squad centre, and how often they stayed together."""
+    return await _artifact(db, session_id, "cohesion")
@@ -0,0 +1,35 @@
+# backend_logic/routes_in/jobs.py
+#
+# Status and results of CPU-heavy jobs run by the worker pool
+# (backend_logic/jobs/worker_pool.py), and submission of replay index builds.
+from fastapi import APIRouter, HTTPException, status
+from typing import List, Optional
+
+from backend_logic.jobs.worker_pool import job_manager
+from backend_logic.jobs import replay_index
+
+router = APIRouter(
+    prefix="/api/jobs",
+    tags=["jobs"]
+)
+
+
+# Most recent first, optionally of one kind (e.g. replay_index)
+@router.get("/", response_model=List[dict])
+async def list_jobs(kind: Optional[str] = None):
+    return [job.to_dict() for job in job_manager.list(kind)]
+
+
+@router.get("/{job_id}", response_model=dict)
+async def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job {job_id} not found")
+    return job.to_dict()
+
+
+# Build a session's replay index ahead of time, so selecting it for replay
+# starts at once; joins a build already running for that session
+@router.post("/replay-index/{session_id}", response_model=dict, status_code=status.HTTP_202_ACCEPTED)
+async def build_replay_index(session_id: str):
+    return replay_index.submit_build(session_id).to_dict()
@@ -1,19 +1,17 @@
 #bqckend_logic/routes_in/replay.py
-from motor.motor_asyncio import AsyncIOMotorClient
 from fastapi import FastAPI, HTTPException
 from typing import List, Dict, Any
 from datetime import datetime
 from backend_logic.pydantic_responses_in import replay_pydantic
+from configs.config import settings
+from db.mongo_client import get_database
 
 app = FastAPI()
 
-# MongoDB connection
-client = AsyncIOMotorClient("mongodb://localhost:27017")
-db = client["archival_monitoring"]
-sessions_collection = db["sessions"]
-
 @app.get("/replay/{session_id}", response_model=replay_pydantic.ReplayData)
 async def get_replay_data(session_id: str):
+    # Shared MongoDB client (was a separate hardcoded localhost client)
+    sessions_collection = get_database(settings.DB_in)["sessions"]
     session = await sessions_collection.find_one({"session_id": session_id})
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -0,0 +1,152 @@
+# backend_logic/routes_in/response_cache.py
+#
+# Response cache for the per-session read endpoints. The live session's
+# responses are reused for SESSION_RESPONSE_LIVE_TTL_SECONDS. An ended session
+# still takes late writes (the Kafka persist worker draining its backlog, the
+# stats cumulation), so its responses are reused for the longer
+# SESSION_RESPONSE_ENDED_TTL_SECONDS instead of forever. Every response carries
+# an ETag and Last-Modified so polling clients get a 304.
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional
+from fastapi import Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from configs.config import settings
+from configs import metrics
+
+
+class _CachedResponse:
+    __slots__ = ("body", "etag", "last_modified", "expires_at")
+
+    def __init__(self, body: bytes, etag: str, last_modified: datetime, expires_at: Optional[float]):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+
+
+class SessionResponseCache:
+    def __init__(self, live_ttl_seconds: float = settings.SESSION_RESPONSE_LIVE_TTL_SECONDS,
+                 ended_ttl_seconds: float = settings.SESSION_RESPONSE_ENDED_TTL_SECONDS,
+                 max_entries: int = settings.SESSION_RESPONSE_CACHE_MAX_ENTRIES):
+        self.live_ttl_seconds = live_ttl_seconds
+        self.ended_ttl_seconds = ended_ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, _CachedResponse]" = OrderedDict()
+        self._end_times = {}  # session_id -> end_time, only for sessions known to be ended
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    async def _end_time(self, db, session_id: str) -> Optional[datetime]:
+        if session_id in self._end_times:
+            return self._end_times[session_id]
+        session = await db.sessions.find_one({"session_id": session_id}, {"_id": 0, "end_time": 1})
+        end_time = (session or {}).get("end_time")
+        if end_time:
+            self._end_times[session_id] = end_time
+        return end_time
+
+    def _lookup(self, key) -> Optional[_CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.monotonic():
+            return None  # An expired entry stays until replaced, to compare ETags with
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key, entry: _CachedResponse):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def respond(self, request: Request, db, session_id: str, endpoint: str,
+                      produce: Callable[[], Awaitable]) -> Response:
+        """
+        Serve `endpoint` of `session_id` from cache, or run `produce()` and cache
+        its result. Exceptions raised by `produce()` (e.g. 404s) are not cached.
+        """
+        key = (session_id, endpoint)
+        entry = self._lookup(key)
+        if entry is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            end_time = await self._end_time(db, session_id)
+            body = json.dumps(jsonable_encoder(await produce()), separators=(",", ":")).encode()
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            expired = self._entries.get(key)
+            if expired is not None and expired.etag == etag:
+                last_modified = expired.last_modified  # Unchanged since it was last produced
+            elif end_time and expired is None:
+                last_modified = end_time
+            else:
+                last_modified = datetime.utcnow()  # Live session, or written to after it ended
+            entry = _CachedResponse(
+                body=body,
+                etag=etag,
+                last_modified=last_modified,
+                expires_at=time.monotonic() + (self.ended_ttl_seconds if end_time else self.live_ttl_seconds)
+            )
+            self._store(key, entry)
+
+        headers = {
+            "ETag": entry.etag,
+            # MongoDB and utcnow() both give naive UTC datetimes
+            "Last-Modified": entry.last_modified.strftime("%a, %d %b %Y %H:%M:%S GMT"),
+            "Cache-Control": "no-cache" if session_id not in self._end_times
+            else f"public, max-age={max(0, int(entry.expires_at - time.monotonic()))}",
+        }
+        if self._is_not_modified(request, entry):
+            self.not_modified += 1
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    @staticmethod
+    def _is_not_modified(request: Request, entry: _CachedResponse) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            return if_none_match.strip() == "*" or entry.etag in [t.strip() for t in if_none_match.split(",")]
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).replace(tzinfo=None)
+            except (TypeError, ValueError):
+                return False
+            return entry.last_modified.replace(tzinfo=None, microsecond=0) <= since
+        return False
+
+    def invalidate(self, session_id: str):
+        """Forget everything cached for a session (allocation, end, delete...)."""
+        self._end_times.pop(session_id, None)
+        for key in [k for k in self._entries if k[0] == session_id]:
+            del self._entries[key]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "ended_sessions": len(self._end_times),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+        }
+
+
+session_response_cache = SessionResponseCache()
+
+
+@metrics.collector
+def _collect_session_response_cache():
+    cache = session_response_cache
+    requests = metrics.Family("mechphy_cache_requests_total", "counter", "Cache lookups by result")
+    requests.add({"cache": "session_responses", "result": "hit"}, cache.hits)
+    requests.add({"cache": "session_responses", "result": "miss"}, cache.misses)
+    requests.add({"cache": "session_responses", "result": "not_modified"}, cache.not_modified)
+    entries = metrics.Family("mechphy_cache_entries", "gauge", "Entries held by a cache")
+    entries.add({"cache": "session_responses"}, len(cache._entries))
+    return [requests, entries]
@@ -1,14 +1,21 @@
 #     #backend_logic/routes_in/session.py
 
 # backend_logic/routes_in/session.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from typing import List, Optional
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from datetime import datetime
+from pymongo import ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timedelta
 
 from backend_logic.pydantic_responses_in import sessions_pydantic
 from db.mongodb_handler import get_db_in, get_db_out
+from db import counters, session_summaries
+from db.catalog_cache import catalog_cache
+from backend_logic.routes_in.response_cache import session_response_cache
+from backend_logic.jobs import session_analytics
 from configs.config import settings
+from configs.logging_config import fastapi_logger as logger
 
 router = APIRouter(
     prefix="/api/sessions",
@@ -35,21 +42,34 @@ async def create_session(db: AsyncIOMotorDatabase = Depends(get_db_in)):
     Create a new session, auto-incrementing session_id and resetting
     in-memory bullet counters.
     """
-    # Find the latest session to determine next ID
-    latest_session = await db.sessions.find_one(sort=[("start_time", -1)])
-    next_id = str(int(latest_session["session_id"]) + 1) if latest_session else "1"
-
-    session_data = {
-        "session_id": next_id,
-        "start_time": datetime.utcnow(),
-        "participated_soldiers": [],
-        "events": []
-    }
-    result = await db.sessions.insert_one(session_data)
-
-    # RESET bullet counters (borrowed from Code 2)
-    from backend_logic.backendConnection.faust_app_v1 import app
-    app.bullet_counts = {"team_red": 0, "team_blue": 0}
+    # Allocate the next ID atomically from the sessions counter. An ID that is
+    # already taken means the counter is behind the stored sessions (seeding
+    # failed at startup, or sessions were restored/imported): reseed and retry.
+    for attempt in range(counters.ALLOCATION_ATTEMPTS):
+        next_id = await counters.next_sequence(db, "sessions")
+        session_data = {
+            "session_id": next_id,
+            "start_time": datetime.utcnow(),
+            "participated_soldiers": [],
+            "events": []
+        }
+        try:
+            result = await db.sessions.insert_one(session_data)
+            break
+        except DuplicateKeyError:
+            logger.warning(f"Session ID {next_id} already taken, reseeding the sessions counter")
+            await counters.seed_counter(db, "sessions")
+    else:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="Could not allocate a free session ID, please retry")
+    await session_summaries.init_summary(db, next_id, session_data["start_time"])
+
+    # The realtime stages reset their counters when they bind the new session;
+    # an in-process pipeline is told to pick it up right away. (A Faust worker
+    # runs in another process and notices on its next roster refresh.)
+    from main import realtime_state
+    if realtime_state["pipeline"] is not None:
+        realtime_state["pipeline"].active_session.invalidate()
 
     return sessions_pydantic.SessionInDB(**session_data, mongo_id=result.inserted_id)
 
@@ -67,7 +87,7 @@ async def allocate_resources(
     Add soldiers to a session, assigning *both* external soldier_id and an
     internal sequential session_soldier_id (skip 69).
     """
-    session = await db.sessions.find_one({"session_id": session_id})
+    session = await db.sessions.find_one({"session_id": session_id}, {"_id": 1})
     if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
 
@@ -79,9 +99,25 @@ async def allocate_resources(
             for soldier in squad["soldiers"]:
                 flattened.append((team_id, squad_name, soldier))
 
+    # ── resolve every referenced soldier, weapon and vest from the catalog cache ──
+    # (whatever is not cached is fetched with one $in query per collection)
+    soldier_docs = await catalog_cache.get_many(
+        db_out, settings.SOLDIER_COLLECTION, [soldier["soldier_id"] for _, _, soldier in flattened]
+    )
+    known_weapons = await catalog_cache.get_many(
+        db_out, settings.WEAPONS_COLLECTION, [soldier["weapon_id"] for _, _, soldier in flattened]
+    )
+    known_vests = await catalog_cache.get_many(
+        db_out, settings.VEST_COLLECTION, [soldier["vest_id"] for _, _, soldier in flattened]
+    )
+
+    # case-insensitive enum lookups, built once per request
+    valid_roles = {r.lower(): r for r in sessions_pydantic.RoleEnum.__members__}
+    valid_equipments = {e.lower(): e for e in sessions_pydantic.EquipmentEnum.__members__}
+
     total = len(flattened)
     seq = 1
-    session["participated_soldiers"] = []
+    participated_soldiers = []
 
     for idx, (team_id, squad_name, soldier) in enumerate(flattened):
         if seq == 69:
@@ -90,24 +126,24 @@ async def allocate_resources(
 
         soldier_id = soldier["soldier_id"]
 
-        # ── look up refs in OUT DB ──
-        soldier_doc = await db_out[settings.SOLDIER_COLLECTION].find_one({"soldier_id": soldier_id})
+        # ── validate refs in memory ──
+        soldier_doc = soldier_docs.get(soldier_id)
         if not soldier_doc:
             raise HTTPException(status_code=404, detail=f"Soldier {soldier_id} not found")
         call_sign = soldier_doc.get("call_sign", "Unknown")
 
         # validate weapon, vest
-        if not await db_out[settings.WEAPONS_COLLECTION].find_one({"weapon_id": soldier["weapon_id"]}):
+        if soldier["weapon_id"] not in known_weapons:
             raise HTTPException(status_code=400, detail=f"Weapon {soldier['weapon_id']} not found")
-        if not await db_out[settings.VEST_COLLECTION].find_one({"vest_id": soldier["vest_id"]}):
+        if soldier["vest_id"] not in known_vests:
             raise HTTPException(status_code=400, detail=f"Vest {soldier['vest_id']} not found")
 
         # validate enums (case-insensitive)
         role_key = soldier["role"].strip().lower()
         equip_key = soldier["equipment"].strip().lower()
-        if role_key not in {r.lower(): r for r in sessions_pydantic.RoleEnum.__members__}:
+        if role_key not in valid_roles:
             raise HTTPException(status_code=400, detail=f"Invalid role: {role_key}")
-        if equip_key not in {e.lower(): e for e in sessions_pydantic.EquipmentEnum.__members__}:
+        if equip_key not in valid_equipments:
             raise HTTPException(status_code=400, detail=f"Invalid equipment: {equip_key}")
 
         # build soldier entry
@@ -126,18 +162,22 @@ async def allocate_resources(
             event_data=[],
             died=None
         )
-        session["participated_soldiers"].append(soldier_entry.dict())
+        participated_soldiers.append(soldier_entry.dict())
         seq += 1
 
-    session["received_data"] = allocation_data.dict()
-    await db.sessions.update_one(
+    # single write that also returns the updated document
+    updated = await db.sessions.find_one_and_update(
         {"session_id": session_id},
         {"$set": {
-            "participated_soldiers": session["participated_soldiers"],
-            "received_data": session["received_data"]
-        }}
+            "participated_soldiers": participated_soldiers,
+            "received_data": allocation_data.dict()
+        }},
+        return_document=ReturnDocument.AFTER
     )
-    updated = await db.sessions.find_one({"session_id": session_id})
+    if updated is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    await session_summaries.set_soldier_count(db, session_id, len(participated_soldiers))
+    session_response_cache.invalidate(session_id)
     return sessions_pydantic.SessionInDB(**updated)
 
 # ──────────────────────────── SET MAP NAME ──────────────────────────────────
@@ -154,6 +194,7 @@ async def update_map_name(
 
     await db.sessions.update_one({"session_id": session_id},
                                  {"$set": {"map_name": map_name}})
+    session_response_cache.invalidate(session_id)
     updated = await db.sessions.find_one({"session_id": session_id})
     return sessions_pydantic.SessionInDB(**updated)
 
@@ -354,9 +395,10 @@ async def update_map_name(
 
 # Access received_data from forntend
 @router.get("/{session_id}/received-data")
-async def get_received_data(session_id: str, db: AsyncIOMotorDatabase = Depends(get_db_in)):
+async def get_received_data(session_id: str, request: Request, db: AsyncIOMotorDatabase = Depends(get_db_in)):
     """
     Endpoint to fetch the received_data for a given session.
+    Served through the session response cache (ETag/Last-Modified).
 
     Args:
         session_id (str): The session ID to fetch received_data for.
@@ -367,7 +409,7 @@ async def get_received_data(session_id: str, db: AsyncIOMotorDatabase = Depends(
     Raises:
         HTTPException: If session is not found or another error occurs.
     """
-    try:
+    async def produce():
         # Fetch the session document
         session = await db.sessions.find_one({"session_id": session_id}, {"_id": 0, "received_data": 1})
         
@@ -379,7 +421,11 @@ async def get_received_data(session_id: str, db: AsyncIOMotorDatabase = Depends(
         
         # Extract and return received_data
         return session.get("received_data", {})
-    
+
+    try:
+        return await session_response_cache.respond(request, db, session_id, "received-data", produce)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, 
@@ -393,36 +439,74 @@ async def get_received_data(session_id: str, db: AsyncIOMotorDatabase = Depends(
 async def get_latest_soldier_stat(
     session_id: str,
     soldier_id: str,
+    request: Request,
     db: AsyncIOMotorDatabase = Depends(get_db_in)
 ):
-    # Retrieve the session
-    session = await db.sessions.find_one({"session_id": session_id})
-    if not session:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
+    async def produce():
+        # Retrieve the session roster and stats only, not the telemetry arrays
+        session = await db.sessions.find_one(
+            {"session_id": session_id},
+            {"_id": 0, "participated_soldiers.soldier_id": 1, "participated_soldiers.stats": 1}
+        )
+        if not session:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
+
+        # Find the soldier within the session's participated soldiers
+        soldier_data = next((s for s in session.get("participated_soldiers", []) if s["soldier_id"] == soldier_id), None)
+        if not soldier_data:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Soldier not found in session")
 
-    # Find the soldier within the session's participated soldiers
-    soldier_data = next((s for s in session["participated_soldiers"] if s["soldier_id"] == soldier_id), None)
-    if not soldier_data:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Soldier not found in session")
+        # Check if the soldier has any stats data
+        if not soldier_data.get("stats"):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No stats available for this soldier")
 
-    # Check if the soldier has any stats data
-    if not soldier_data.get("stats"):
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No stats available for this soldier")
+        # Retrieve the latest stats entry
+        latest_stat = soldier_data["stats"][-1]  # Assuming stats are appended chronologically
 
-    # Retrieve the latest stats entry
-    latest_stat = soldier_data["stats"][-1]  # Assuming stats are appended chronologically
+        return {"latest_stat": latest_stat}
 
-    return {"latest_stat": latest_stat}
+    return await session_response_cache.respond(request, db, session_id, f"latest_stats:{soldier_id}", produce)
 
  
 
+# Earliest/latest location timestamp of a session, computed inside MongoDB
+def _start_end_time_pipeline(session_id: str) -> list:
+    return [
+        {"$match": {"session_id": session_id}},
+        {"$project": {
+            "_id": 0,
+            "end_time": 1,
+            "soldier_count": {"$size": {"$ifNull": ["$participated_soldiers", []]}},
+            "firsts": {"$map": {
+                "input": {"$ifNull": ["$participated_soldiers", []]},
+                "as": "soldier",
+                "in": {"$min": "$$soldier.location.timestamp"}
+            }},
+            "lasts": {"$map": {
+                "input": {"$ifNull": ["$participated_soldiers", []]},
+                "as": "soldier",
+                "in": {"$max": "$$soldier.location.timestamp"}
+            }},
+        }},
+        {"$project": {
+            "end_time": 1,
+            "soldier_count": 1,
+            "earliest": {"$min": "$firsts"},
+            "latest": {"$max": "$lasts"},
+        }},
+    ]
+
 # Fetch start and end time of a session
 @router.get("/{session_id}/start_end_time")
-async def get_start_end_time(session_id: str, db:AsyncIOMotorDatabase = Depends(get_db_in)):
+async def get_start_end_time(session_id: str, request: Request, db:AsyncIOMotorDatabase = Depends(get_db_in)):
     """
     Fetch the start and end time of a session by comparing the earliest and latest
     location timestamps of all participated soldiers.
 
+    The min/max is computed by an aggregation pipeline, so no telemetry is
+    transferred; results go through the session response cache (ended
+    sessions are kept for SESSION_RESPONSE_ENDED_TTL_SECONDS).
+
     Args:
         session_id (str): The session ID to fetch start and end time for.
 
@@ -432,87 +516,72 @@ async def get_start_end_time(session_id: str, db:AsyncIOMotorDatabase = Depends(
     Raises:
         HTTPException: If session is not found or no location data is available.
     """
-    
-    # Fetch the session document
-    session = await db.sessions.find_one({"session_id": session_id}, {"_id": 0, "participated_soldiers": 1})
-    if not session:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Session with ID {session_id} not found")
-
-    participated_soldiers = session.get("participated_soldiers", [])
-    if not participated_soldiers:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No participated soldiers found in session")
-
-    earliest_time: Optional[str] = None
-    latest_time: Optional[str] = None
-
-    # Iterate through each soldier's location data to find the earliest and latest timestamps 
-    # It is optimizable as i dont think it is needed to iterate evey soldier location as first will be earliest and last will be max(time)
-    for soldier in participated_soldiers:
-        locations = soldier.get("location", [])
-        if not locations:
-            continue
-
-        # Extract timestamps from location objects
-        timestamps = [location.get("timestamp") for location in locations if "timestamp" in location]
-
-        if not timestamps:
-            continue
-
-        # Find the earliest and latest timestamps for the current soldier
-        soldier_earliest = min(timestamps)
-        soldier_latest = max(timestamps)
-
-        # Update the overall earliest and latest timestamps
-        if earliest_time is None or soldier_earliest < earliest_time:
-            earliest_time = soldier_earliest
-
-        if latest_time is None or soldier_latest > latest_time:
-            latest_time = soldier_latest
-
-    if not earliest_time or not latest_time:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No valid location timestamps found for soldiers")
+    async def produce():
+        rows = await db.sessions.aggregate(_start_end_time_pipeline(session_id)).to_list(length=1)
+        if not rows:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Session with ID {session_id} not found")
+
+        row = rows[0]
+        if not row.get("soldier_count"):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No participated soldiers found in session")
+        if not row.get("earliest") or not row.get("latest"):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No valid location timestamps found for soldiers")
+
+        return {
+            "start_time": row["earliest"],
+            "end_time": row["latest"]
+        }
 
-    return {
-        "start_time": earliest_time,
-        "end_time": latest_time
-    }
+    return await session_response_cache.respond(request, db, session_id, "start_end_time", produce)
 
 
 
 
-# Return a list of all sessions with session_id, start_time, and the earliest/latest location timestamps.
+# Return all sessions (or a page of them) with session_id, start_time, and the earliest/latest location timestamps.
 @router.get("/all_sessions", response_model=List[dict])
-async def get_all_sessions(db: AsyncIOMotorDatabase = Depends(get_db_in)):
+async def get_all_sessions(
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; omit for every session"),
+    ended: Optional[bool] = None,
+    started_after: Optional[datetime] = None,
+    started_before: Optional[datetime] = None,
+    db: AsyncIOMotorDatabase = Depends(get_db_in)
+):
     """
-    Return a list of all sessions with session_id, start_time, and end_time.
-    
-    This function loops through each session and each soldier's location data to find the true earliest and latest
-    timestamps, rather than assuming the data is ordered. This is necessary because, even if you intend to store
-    location data in chronological order, there is no guarantee that the array remains sorted due to possible
-    out-of-order ingestion, manual updates, or bugs. Using min() and max() ensures correctness regardless of order.
+    Return sessions ordered by start_time, oldest first, answered from the
+    session_summaries collection alone so the cost does not grow with
+    recorded telemetry.
+
+    Filters: `ended` (true/false), `started_after` / `started_before` (ISO datetimes).
+    Pagination is opt-in: without `limit` every matching session is returned
+    (after `skip`).
     """
-    sessions_cursor = db.sessions.find({}, {"_id": 0, "session_id": 1, "start_time": 1, "end_time": 1, "participated_soldiers": 1})
+    query = {}
+    if ended is not None:
+        query["end_time"] = {"$ne": None} if ended else None
+    if started_after or started_before:
+        query["start_time"] = {}
+        if started_after:
+            query["start_time"]["$gte"] = started_after
+        if started_before:
+            query["start_time"]["$lt"] = started_before
+
+    cursor = session_summaries.summaries_collection(db).find(query, {"_id": 0}) \
+        .sort("start_time", 1).skip(skip)
+    if limit is not None:
+        cursor = cursor.limit(limit)
     sessions = []
-    async for session in sessions_cursor:
-        # Find earliest and latest timestamps from all soldiers' location data
-        earliest_time = None
-        latest_time = None
-        for soldier in session.get("participated_soldiers", []):
-            locations = soldier.get("location", [])
-            timestamps = [loc.get("timestamp") for loc in locations if "timestamp" in loc]
-            if timestamps:
-                soldier_earliest = min(timestamps)
-                soldier_latest = max(timestamps)
-                if earliest_time is None or soldier_earliest < earliest_time:
-                    earliest_time = soldier_earliest
-                if latest_time is None or soldier_latest > latest_time:
-                    latest_time = soldier_latest
+    async for summary in cursor:
         sessions.append({
-            "session_id": session.get("session_id"),
-            "start_time": session.get("start_time"),
-            "end_time": session.get("end_time"),
-            "earliest_location_time": earliest_time,
-            "latest_location_time": latest_time
+            "session_id": summary.get("session_id"),
+            "start_time": summary.get("start_time"),
+            "end_time": summary.get("end_time"),
+            "earliest_location_time": summary.get("first_telemetry_time"),
+            "latest_location_time": summary.get("last_telemetry_time"),
+            "soldier_count": summary.get("soldier_count", 0),
+            "kill_total": summary.get("kill_total", 0),
+            "kills_by_team": summary.get("kills_by_team", {}),
+            "data_points": summary.get("data_points", 0),
         })
     return sessions
 
@@ -571,14 +640,108 @@ async def start_realtime_monitoring(
 # This ensures that after every session, the overall stats for each soldier
 # (such as kill_count, bullets_fired, sessions_participated, etc.)
 # are updated and reflect all sessions played.
+CUMULATION_BATCH_SIZE = 500  # soldiers per bulk_write, progress is reported after each batch
+
+
+async def cumulate_session_stats(session_id: str, db: AsyncIOMotorDatabase, db_out: AsyncIOMotorDatabase):
+    """
+    Background job: fold each participant's latest session stats into their
+    outside-monitoring stats with bulk $inc/$addToSet writes.
+
+    Idempotent: the job claims the session via stats_cumulation.status, and
+    every per-soldier update only matches while the session is not yet in
+    that soldier's sessions_participated, so re-running never double counts.
+    The claim is a lease renewed after every batch; a "running" claim that
+    has not been renewed for STATS_CUMULATION_LEASE_SECONDS belongs to a job
+    that died (worker restart, crash) and can be taken over.
+    """
+    now = datetime.utcnow()
+    expired = now - timedelta(seconds=settings.STATS_CUMULATION_LEASE_SECONDS)
+    session = await db.sessions.find_one_and_update(
+        {"session_id": session_id, "$or": [
+            {"stats_cumulation.status": {"$nin": ["running", "done"]}},
+            {"stats_cumulation.status": "running", "stats_cumulation.renewed_at": {"$lt": expired}},
+            # Claims made before the lease existed only have started_at
+            {"stats_cumulation.status": "running", "stats_cumulation.renewed_at": {"$exists": False},
+             "stats_cumulation.started_at": {"$lt": expired}},
+        ]},
+        {"$set": {"stats_cumulation": {
+            "status": "running", "processed": 0, "total": 0, "started_at": now, "renewed_at": now
+        }}},
+        projection={"participated_soldiers.soldier_id": 1, "participated_soldiers.stats": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if session is None:
+        return  # already cumulated or being cumulated by another request
+
+    try:
+        latest_stats = {}
+        for soldier in session.get("participated_soldiers", []):
+            stats_list = soldier.get("stats", [])
+            if stats_list:
+                latest_stats[soldier["soldier_id"]] = stats_list[-1]  # Get latest stats
+
+        soldier_ids = list(latest_stats)
+        await db.sessions.update_one(
+            {"session_id": session_id},
+            {"$set": {"stats_cumulation.total": len(soldier_ids)}}
+        )
+
+        collection = db_out[settings.SOLDIER_COLLECTION]
+        for offset in range(0, len(soldier_ids), CUMULATION_BATCH_SIZE):
+            batch = soldier_ids[offset:offset + CUMULATION_BATCH_SIZE]
+
+            # $inc cannot create fields under a null stats, so give those soldiers empty stats first
+            operations = [UpdateMany(
+                {"soldier_id": {"$in": batch}, "stats": None},
+                {"$set": {"stats": {"kill_count": 0, "sessions_participated": [], "stats_data": {"bullets_fired": 0}}}}
+            )]
+            operations.extend(
+                UpdateOne(
+                    {"soldier_id": soldier_id, "stats.sessions_participated": {"$ne": session_id}},
+                    {
+                        "$inc": {
+                            "stats.kill_count": latest_stats[soldier_id].get("kill_count", 0),
+                            "stats.stats_data.bullets_fired": latest_stats[soldier_id].get("bullets_fired", 0),
+                        },
+                        "$addToSet": {"stats.sessions_participated": session_id},
+                    }
+                )
+                for soldier_id in batch
+            )
+            await collection.bulk_write(operations, ordered=True)
+            # GET /api/soldiers/{id} reads through the catalog cache
+            for soldier_id in batch:
+                catalog_cache.invalidate(settings.SOLDIER_COLLECTION, soldier_id)
+
+            await db.sessions.update_one(
+                {"session_id": session_id},
+                {"$set": {"stats_cumulation.processed": offset + len(batch),
+                          "stats_cumulation.renewed_at": datetime.utcnow()}}
+            )
+
+        await db.sessions.update_one(
+            {"session_id": session_id},
+            {"$set": {"stats_cumulation.status": "done", "stats_cumulation.finished_at": datetime.utcnow()}}
+        )
+    except Exception as e:
+        logger.error(f"Error cumulating stats for session {session_id}: {e}", exc_info=True)
+        await db.sessions.update_one(
+            {"session_id": session_id},
+            {"$set": {"stats_cumulation.status": "failed", "stats_cumulation.error": str(e)}}
+        )
+
+
 @router.put("/{session_id}/end", status_code=status.HTTP_200_OK)
 async def mark_session_end_and_cumulate_stats(
     session_id: str,
+    background_tasks: BackgroundTasks,
     db: AsyncIOMotorDatabase = Depends(get_db_in),
     db_out: AsyncIOMotorDatabase = Depends(get_db_out)
 ):
     """
-    Mark the session as ended and cumulate session stats into outside monitoring stats.
+    Mark the session as ended and queue cumulation of session stats into
+    outside monitoring stats. Poll /{session_id}/end/status for progress.
     """
     end_time = datetime.utcnow()
     result = await db.sessions.update_one(
@@ -587,104 +750,118 @@ async def mark_session_end_and_cumulate_stats(
     )
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Session not found or not updated")
+    await session_summaries.mark_ended(db, session_id, end_time)
+    session_response_cache.invalidate(session_id)
 
-    # Fetch session data
-    session = await db.sessions.find_one({"session_id": session_id})
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
+    # Stop real-time services before stats are read so no late kill is missed
+    from main import stop_realtime_services
+    await stop_realtime_services()
 
-    # Cumulate stats for each soldier
-    try:
-        for soldier in session.get("participated_soldiers", []):
-            soldier_id = soldier["soldier_id"]
-            stats_list = soldier.get("stats", [])
-            if not stats_list:
-                continue
-            latest_stat = stats_list[-1]  # Get latest stats
-
-            # Fetch outside soldier record
-            outside_soldier = await db_out[settings.SOLDIER_COLLECTION].find_one({"soldier_id": soldier_id})
-            if not outside_soldier:
-                continue
-
-            # Cumulate stats
-            outside_stats = outside_soldier.get("stats") or {}
-            outside_kills = outside_stats.get("kill_count", 0)
-            outside_sessions = outside_stats.get("sessions_participated", [])
-            outside_bullets = outside_stats.get("stats_data", {}).get("bullets_fired", 0)
-
-            # Update stats
-            new_kills = outside_kills + latest_stat.get("kill_count", 0)
-            new_bullets = outside_bullets + latest_stat.get("bullets_fired", 0)
-            new_sessions = list(set(outside_sessions + [session_id]))
-
-            new_stats = {
-                "kill_count": new_kills,
-                "sessions_participated": new_sessions,
-                "stats_data": {"bullets_fired": new_bullets}
-            }
+    background_tasks.add_task(cumulate_session_stats, session_id, db, db_out)
 
-            await db_out[settings.SOLDIER_COLLECTION].update_one(
-                {"soldier_id": soldier_id},
-                {"$set": {"stats": new_stats}}
-            )
-    except Exception as e:
-        print(f"Error cumulating stats for session {session_id}: {e}")
-        raise HTTPException(status_code=500, detail=f"Error cumulating stats: {e}")
+    # After-action analytics run in a job worker; poll /api/jobs/{job_id}
+    analytics_job = session_analytics.submit(session_id) if settings.ANALYTICS_ON_SESSION_END else None
+
+    return {
+        "session_id": session_id,
+        "end_time": end_time,
+        "realtime_stopped": True,
+        "stats_cumulation": "queued",
+        "analytics_job_id": analytics_job.id if analytics_job is not None else None
+    }
 
-    # Stop real-time services (see main.py changes below)
-    from main import stop_realtime_services
-    await stop_realtime_services()
 
-    return {"session_id": session_id, "end_time": end_time, "realtime_stopped": True}
+@router.get("/{session_id}/end/status", response_model=dict)
+async def get_stats_cumulation_status(session_id: str, db: AsyncIOMotorDatabase = Depends(get_db_in)):
+    """Progress of the end-of-session stats cumulation job."""
+    session = await db.sessions.find_one({"session_id": session_id}, {"_id": 0, "stats_cumulation": 1})
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session.get("stats_cumulation") or {"status": "not_started"}
+
+
+@router.post("/{session_id}/end/retry", response_model=dict, status_code=status.HTTP_202_ACCEPTED)
+async def retry_stats_cumulation(
+    session_id: str,
+    background_tasks: BackgroundTasks,
+    db: AsyncIOMotorDatabase = Depends(get_db_in),
+    db_out: AsyncIOMotorDatabase = Depends(get_db_out)
+):
+    """
+    Queue the stats cumulation of an ended session again, after it failed or
+    its job died. A done cumulation, or a running one whose lease is still
+    renewed, is left alone.
+    """
+    session = await db.sessions.find_one({"session_id": session_id}, {"_id": 0, "end_time": 1, "stats_cumulation": 1})
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if not session.get("end_time"):
+        raise HTTPException(status_code=409, detail="Session has not ended")
+    background_tasks.add_task(cumulate_session_stats, session_id, db, db_out)
+    return {
+        "session_id": session_id,
+        "previous": session.get("stats_cumulation") or {"status": "not_started"},
+        "stats_cumulation": "queued",
+    }
 
 
 
 @router.get("/{session_id}/team_squad_soldiers", response_model=dict)
 async def get_team_squad_soldiers(
     session_id: str,
+    request: Request,
     db: AsyncIOMotorDatabase = Depends(get_db_in)
 ):
     """
     Returns team-wise and squad-wise soldiers for a session,
     including soldier_id, session_soldier_id, and call_sign.
     """
-    session = await db.sessions.find_one({"session_id": session_id}, {"_id": 0, "participated_soldiers": 1})
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
+    async def produce():
+        session = await db.sessions.find_one({"session_id": session_id}, {"_id": 0, "participated_soldiers": 1})
+        if not session:
+            raise HTTPException(status_code=404, detail="Session not found")
 
-    result = {"team_red": {}, "team_blue": {}}
-    for soldier in session.get("participated_soldiers", []):
-        team = f"team_{soldier.get('team', '').lower()}"
-        squad = f"squad_{soldier.get('squad')}"
-        entry = {
-            "soldier_id": soldier.get("soldier_id"),
-            "session_soldier_id": soldier.get("session_soldier_id"),
-            "call_sign": soldier.get("call_sign"),
-        }
-        if team not in result:
-            result[team] = {}
-        if squad not in result[team]:
-            result[team][squad] = []
-        result[team][squad].append(entry)
-    return result
+        result = {"team_red": {}, "team_blue": {}}
+        for soldier in session.get("participated_soldiers", []):
+            team = f"team_{soldier.get('team', '').lower()}"
+            squad = f"squad_{soldier.get('squad')}"
+            entry = {
+                "soldier_id": soldier.get("soldier_id"),
+                "session_soldier_id": soldier.get("session_soldier_id"),
+                "call_sign": soldier.get("call_sign"),
+            }
+            if team not in result:
+                result[team] = {}
+            if squad not in result[team]:
+                result[team][squad] = []
+            result[team][squad].append(entry)
+        return result
+
+    return await session_response_cache.respond(request, db, session_id, "team_squad_soldiers", produce)
 
 
 
 @router.get("/{session_id}/latest_team_stats", response_model=dict)
 async def get_latest_team_stats(
     session_id: str,
+    request: Request,
     db: AsyncIOMotorDatabase = Depends(get_db_in)
 ):
     """
     Fetch the latest team stats for a session from team_stats_history.
     """
-    session = await db.sessions.find_one({"session_id": session_id}, {"_id": 0, "team_stats_history": 1})
-    if not session or "team_stats_history" not in session or not session["team_stats_history"]:
-        raise HTTPException(status_code=404, detail="No team stats found for this session")
+    async def produce():
+        # Only the last history entry is read from MongoDB
+        session = await db.sessions.find_one(
+            {"session_id": session_id}, {"_id": 0, "session_id": 1, "team_stats_history": {"$slice": -1}}
+        )
+        if not session or "team_stats_history" not in session or not session["team_stats_history"]:
+            raise HTTPException(status_code=404, detail="No team stats found for this session")
+
+        latest_stats = session["team_stats_history"][-1]  # Get the last entry (latest)
+        return {"latest_team_stats": latest_stats}
 
-    latest_stats = session["team_stats_history"][-1]  # Get the last entry (latest)
-    return {"latest_team_stats": latest_stats}
+    return await session_response_cache.respond(request, db, session_id, "latest_team_stats", produce)
 
 
 # Deleting a session by session_id 
@@ -709,6 +886,9 @@ async def delete_session(
 
     if delete_result.deleted_count == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
+    await session_summaries.delete_summary(db, session_id)
+    await session_analytics.delete_artifacts(db, session_id)
+    session_response_cache.invalidate(session_id)
 
     # Success: No content to return
     return {"detail": "Session deleted successfully"}
\ No newline at end of file
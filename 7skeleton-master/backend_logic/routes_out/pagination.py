@@ -0,0 +1,110 @@
+#backend_logic/routes_out/pagination.py
+#
+# Keyset (cursor) pagination shared by the catalog list endpoints. A page is
+# fetched with a range query on (sort field, _id), so page N costs the same
+# as page 1. The body stays a plain list; the cursor for the next page is sent
+# in the X-Next-Cursor header (and a Link header), and every page carries an
+# ETag so clients polling an unchanged page get a 304.
+
+import base64
+import hashlib
+import json
+from typing import List, Optional
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, Request, Response, status
+
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(sort_value, last_id: ObjectId) -> str:
+    raw = json.dumps([sort_value, str(last_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return sort_value, ObjectId(last_id)
+    except (ValueError, TypeError, InvalidId):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def parse_fields(fields: Optional[str], allowed: List[str], default: List[str]) -> dict:
+    """Comma separated field list -> MongoDB projection (always without _id)."""
+    requested = [f.strip() for f in fields.split(",") if f.strip()] if fields else default
+    unknown = set(requested) - set(allowed)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}. Allowed: {', '.join(allowed)}"
+        )
+    return {field: 1 for field in requested}
+
+
+def _keyset_filter(sort_field: str, descending: bool, cursor: str) -> dict:
+    sort_value, last_id = decode_cursor(cursor)
+    op = "$lt" if descending else "$gt"
+    if sort_field == "_id":
+        return {"_id": {op: last_id}}
+    return {"$or": [
+        {sort_field: {op: sort_value}},
+        {sort_field: sort_value, "_id": {op: last_id}},
+    ]}
+
+
+async def keyset_page(
+    request: Request,
+    response: Response,
+    collection,
+    *,
+    filters: dict,
+    projection: dict,
+    sort_field: str = "_id",
+    descending: bool = False,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+):
+    """
+    One page of `collection` matching `filters`. Returns the list of documents,
+    or a bare 304 Response when the client's If-None-Match matches the page.
+    """
+    query = dict(filters)
+    if cursor:
+        query = {"$and": [query, _keyset_filter(sort_field, descending, cursor)]} if query else \
+            _keyset_filter(sort_field, descending, cursor)
+
+    direction = -1 if descending else 1
+    sort = [("_id", direction)] if sort_field == "_id" else [(sort_field, direction), ("_id", direction)]
+
+    # Fetch one extra document to know whether there is a next page; the sort
+    # key and _id are always read so the cursor can be built from the last row
+    fetch_projection = dict(projection, _id=1)
+    if sort_field != "_id":
+        fetch_projection[sort_field] = 1
+    rows = await collection.find(query, fetch_projection).sort(sort).limit(limit + 1).to_list(length=limit + 1)
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor(last.get(sort_field) if sort_field != "_id" else None, last["_id"])
+
+    page = [{k: v for k, v in row.items() if k in projection} for row in rows]
+
+    etag = '"' + hashlib.sha1(
+        json.dumps([page, next_cursor], sort_keys=True, default=str).encode()
+    ).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    response.headers.update(headers)
+    return page
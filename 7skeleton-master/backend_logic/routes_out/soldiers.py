@@ -1,20 +1,55 @@
 #backend_logic/routes_out/soldiers.py
-from fastapi import Body, Depends, Response, status, HTTPException, APIRouter
+import re
+from fastapi import Body, Depends, Query, Request, Response, status, HTTPException, APIRouter
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from configs.config import settings
 from bson import ObjectId
 from typing import List, Optional
 from db.mongodb_handler import get_db_out
+from db.catalog_cache import catalog_cache
 from backend_logic.pydantic_responses_out import soldier_pydantic
+from backend_logic.routes_out.pagination import MAX_PAGE_SIZE, keyset_page, parse_fields
 
 router = APIRouter(
     prefix = "/api/soldiers",
     tags = ["soldier_outside_monitoring"]
 )
 
+SOLDIER_LIST_FIELDS = ["soldier_id", "call_sign", "stats"]
+
+# List soldiers, one page at a time (next page cursor in the X-Next-Cursor header)
+@router.get("/", response_model=List[dict], status_code=status.HTTP_200_OK)
+async def list_soldiers(
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = Query("_id", regex="^(_id|call_sign)$"),
+    order: str = Query("asc", regex="^(asc|desc)$"),
+    fields: Optional[str] = Query(None, description="Comma separated, default soldier_id,call_sign"),
+    call_sign_prefix: Optional[str] = None,
+    db: AsyncIOMotorDatabase = Depends(get_db_out)
+):
+    filters = {}
+    if call_sign_prefix:
+        # Anchored, escaped prefix match can use the call_sign index
+        filters["call_sign"] = {"$regex": f"^{re.escape(call_sign_prefix)}"}
+
+    return await keyset_page(
+        request, response, db.soldiers,
+        filters=filters,
+        projection=parse_fields(fields, SOLDIER_LIST_FIELDS, ["soldier_id", "call_sign"]),
+        sort_field=sort,
+        descending=order == "desc",
+        limit=limit,
+        cursor=cursor
+    )
+
+
 @router.get("/{id}", status_code=status.HTTP_200_OK, response_model=soldier_pydantic.SoldierResponse)
 async def get_soldiers(id: str, db: AsyncIOMotorDatabase = Depends(get_db_out)):
     # Query the database for the soldier with the given unique ID
-    soldier = await db.soldiers.find_one({"soldier_id": id})
+    soldier = await catalog_cache.get(db, settings.SOLDIER_COLLECTION, id)
 
     # If no soldier is found, raise a 404 error
     if soldier is None:
@@ -53,6 +88,7 @@ async def create_soldier(soldier: soldier_pydantic.SoldierCreate, db: AsyncIOMot
     
     # Insert the new soldier into the database
     result = await db.soldiers.insert_one(soldier_data)
+    catalog_cache.invalidate(settings.SOLDIER_COLLECTION, soldier.soldier_id)
 
     # Return the created soldier with its new ID
     return soldier_pydantic.SoldierResponse(soldier=soldier_data, stats=None) 
@@ -71,6 +107,7 @@ async def update_soldier(soldier_id: str, soldier_update: soldier_pydantic.Soldi
 
     # Update the soldier in the database
     await db.soldiers.update_one({"soldier_id": soldier_id}, {"$set": update_data})
+    catalog_cache.invalidate(settings.SOLDIER_COLLECTION, soldier_id)
 
     # Retrieve the updated soldier data to return it
     updated_soldier = await db.soldiers.find_one({"soldier_id": soldier_id})
@@ -103,6 +140,7 @@ async def delete_soldier(soldier_id: str, db: AsyncIOMotorDatabase = Depends(get
 
     # Delete the soldier from the database
     result = await db.soldiers.delete_one({"soldier_id": soldier_id})
+    catalog_cache.invalidate(settings.SOLDIER_COLLECTION, soldier_id)
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Soldier not found")
\ No newline at end of file
@@ -1,9 +1,16 @@
-from fastapi import Body, Depends, Response, status, HTTPException, APIRouter
+from fastapi import Body, Depends, Query, Request, Response, status, HTTPException, APIRouter
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from configs.config import settings
+from configs.logging_config import fastapi_logger as logger
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
 from typing import List, Optional
 from db.mongodb_handler import get_db_out
+from db.catalog_cache import catalog_cache
+from db import counters
 from backend_logic.pydantic_responses_out import vests_pydantic
+from backend_logic.routes_out.pagination import MAX_PAGE_SIZE, keyset_page, parse_fields
 
 router = APIRouter(
     prefix = "/api/vests",
@@ -13,18 +20,47 @@ router = APIRouter(
 @router.get("/{vest_id}", status_code=status.HTTP_200_OK, response_model=vests_pydantic.VestResponse)
 async def get_vest(vest_id: str, db: AsyncIOMotorDatabase = Depends(get_db_out)):
     # Query the database for the vest with the given vest_id
-    vest = await db.vests.find_one({"vest_id": vest_id})
+    vest = await catalog_cache.get(db, settings.VEST_COLLECTION, vest_id)
 
     if vest is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Vest not found")
 
     return vests_pydantic.VestResponse(vest=vest)
 
-# Fetch all protection levels
+VEST_LIST_FIELDS = ["vest_id", "protection_level", "count"]
+
+# Fetch protection levels, one page at a time (next page cursor in the X-Next-Cursor header)
 @router.get("/", response_model=List[dict], status_code=status.HTTP_200_OK)
-async def get_protection_levels(db: AsyncIOMotorDatabase = Depends(get_db_out)):
-    vests = await db.vests.find({}, {"_id": 0, "vest_id": 1, "protection_level": 1, "count": 1}).to_list(length=100)
-    return vests
+async def get_protection_levels(
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = Query("_id", regex="^(_id|protection_level)$"),
+    order: str = Query("asc", regex="^(asc|desc)$"),
+    fields: Optional[str] = Query(None, description="Comma separated, default vest_id,protection_level,count"),
+    min_protection_level: Optional[int] = None,
+    max_protection_level: Optional[int] = None,
+    db: AsyncIOMotorDatabase = Depends(get_db_out)
+):
+    filters = {}
+    level_range = {}
+    if min_protection_level is not None:
+        level_range["$gte"] = min_protection_level
+    if max_protection_level is not None:
+        level_range["$lte"] = max_protection_level
+    if level_range:
+        filters["protection_level"] = level_range
+
+    return await keyset_page(
+        request, response, db.vests,
+        filters=filters,
+        projection=parse_fields(fields, VEST_LIST_FIELDS, VEST_LIST_FIELDS),
+        sort_field=sort,
+        descending=order == "desc",
+        limit=limit,
+        cursor=cursor
+    )
 
 # Choose an existing protection level
 @router.post("/choose", response_model=vests_pydantic.VestResponse, status_code=status.HTTP_200_OK)
@@ -32,40 +68,52 @@ async def choose_protection_level(payload: vests_pydantic.VestCreate, db: AsyncI
     # Extract protection level from the payload
     protection_level = payload.protection_level
 
-    # Find the vest with the given protection level
-    vest = await db.vests.find_one({"protection_level": protection_level})
-    if not vest:
+    # Increment the count and return the updated vest in one round trip
+    updated_vest = await db.vests.find_one_and_update(
+        {"protection_level": protection_level},
+        {"$inc": {"count": 1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if not updated_vest:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Protection level not found")
-
-    # Increment the count
-    await db.vests.update_one({"protection_level": protection_level}, {"$inc": {"count": 1}})
-
-    # Fetch updated vest
-    updated_vest = await db.vests.find_one({"protection_level": protection_level})
+    catalog_cache.invalidate(settings.VEST_COLLECTION, updated_vest["vest_id"])
     return vests_pydantic.VestResponse(vest=updated_vest)
 
 # Create a new vest
 @router.post("/create", response_model=vests_pydantic.VestResponse, status_code=status.HTTP_201_CREATED)
 async def create_vest(vest: vests_pydantic.VestCreate, db: AsyncIOMotorDatabase = Depends(get_db_out)):
-    # Check if protection level already exists
-    existing_vest = await db.vests.find_one({"protection_level": vest.protection_level})
-    if existing_vest:
+    # Check if protection level already exists. The unique protection_level index closes
+    # the race between two creates, but is skipped when a legacy duplicate kept
+    # ensure_indexes from building it, so the check stays
+    if await db.vests.find_one({"protection_level": vest.protection_level}, {"_id": 1}):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Protection level already exists")
 
-    # Generate vest ID based on the latest vest ID
-    last_vest = await db.vests.find_one({}, sort=[("vest_id", -1)])
-    last_vest_id = int(last_vest["vest_id"]) if last_vest else 0
-    vest_id = str(last_vest_id + 1)
-
-    # Prepare vest data
-    vest_data = {
-        "vest_id": vest_id,
-        "protection_level": vest.protection_level,
-        "count": 1
-    }
-
-    # Insert the new vest into the database
-    result = await db.vests.insert_one(vest_data)
+    # Allocate the next vest ID atomically from the vests counter. An ID that is
+    # already taken means the counter is behind the stored vests (e.g. legacy
+    # IDs above it): reseed and retry, like create_session
+    for attempt in range(counters.ALLOCATION_ATTEMPTS):
+        vest_id = await counters.next_sequence(db, "vests")
+
+        # Prepare vest data
+        vest_data = {
+            "vest_id": vest_id,
+            "protection_level": vest.protection_level,
+            "count": 1
+        }
+
+        # Insert the new vest into the database; the unique protection_level index rejects duplicates
+        try:
+            await db.vests.insert_one(dict(vest_data))
+            break
+        except DuplicateKeyError as e:
+            if "protection_level" in (e.details or {}).get("keyPattern", {}):
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Protection level already exists")
+            logger.warning(f"Vest ID {vest_id} already taken, reseeding the vests counter")
+            await counters.seed_counter(db, "vests")
+    else:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="Could not allocate a free vest ID, please retry")
+    catalog_cache.invalidate(settings.VEST_COLLECTION, vest_id)
 
     return vests_pydantic.VestResponse(vest=vest_data)
 
@@ -79,8 +127,18 @@ async def update_vest(vest_id: str, vest_update: vests_pydantic.VestUpdate, db:
     # Prepare the update data
     update_data = vest_update.dict(exclude_unset=True)
 
+    # A change must not take the protection level of another vest
+    if "protection_level" in update_data and await db.vests.find_one(
+        {"protection_level": update_data["protection_level"], "vest_id": {"$ne": vest_id}}, {"_id": 1}
+    ):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Protection level already exists")
+
     # Update the vest in the database
-    await db.vests.update_one({"vest_id": vest_id}, {"$set": update_data})
+    try:
+        await db.vests.update_one({"vest_id": vest_id}, {"$set": update_data})
+    except DuplicateKeyError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Protection level already exists")
+    catalog_cache.invalidate(settings.VEST_COLLECTION, vest_id)
 
     # Retrieve the updated vest data
     updated_vest = await db.vests.find_one({"vest_id": vest_id})
@@ -96,6 +154,7 @@ async def delete_vest(vest_id: str, db: AsyncIOMotorDatabase = Depends(get_db_ou
 
     # Delete the vest from the database
     result = await db.vests.delete_one({"vest_id": vest_id})
+    catalog_cache.invalidate(settings.VEST_COLLECTION, vest_id)
 
     if result.deleted_count == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Vest not found")
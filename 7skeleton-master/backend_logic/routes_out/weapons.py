@@ -1,28 +1,62 @@
 #backend_logic/routes_out/weapons.py
-from fastapi import Body, Depends, Response, status, HTTPException, APIRouter
+from fastapi import Body, Depends, Query, Request, Response, status, HTTPException, APIRouter
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from configs.config import settings
+from configs.logging_config import fastapi_logger as logger
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
 from typing import List, Optional
 from db.mongodb_handler import get_db_out
+from db.catalog_cache import catalog_cache
+from db import counters
+from db.indexes import CASE_INSENSITIVE
 from backend_logic.pydantic_responses_out import weapons_pydantic
+from backend_logic.routes_out.pagination import MAX_PAGE_SIZE, keyset_page, parse_fields
 
 router = APIRouter(
     prefix = "/api/weapons",
     tags = ["weapons_outside_monitoring"]
 )
 
-# Fetch all weapon names
+WEAPON_LIST_FIELDS = ["weapon_id", "name", "weapon_type", "bullet_type", "fire_rate", "range", "count"]
+
+# Fetch weapon names, one page at a time (next page cursor in the X-Next-Cursor header)
 @router.get("/", response_model=List[dict], status_code=status.HTTP_200_OK)
-async def get_weapon_names(db: AsyncIOMotorDatabase = Depends(get_db_out)):
-    weapons = await db.weapons.find({}, {"_id": 0, "weapon_id": 1, "name": 1}).to_list(length=100)
-    return weapons
+async def get_weapon_names(
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = Query("_id", regex="^(_id|name)$"),
+    order: str = Query("asc", regex="^(asc|desc)$"),
+    fields: Optional[str] = Query(None, description="Comma separated, default weapon_id,name"),
+    weapon_type: Optional[weapons_pydantic.WeaponType] = None,
+    bullet_type: Optional[weapons_pydantic.BulletType] = None,
+    db: AsyncIOMotorDatabase = Depends(get_db_out)
+):
+    filters = {}
+    if weapon_type:
+        filters["weapon_type"] = weapon_type.value
+    if bullet_type:
+        filters["bullet_type"] = bullet_type.value
+
+    return await keyset_page(
+        request, response, db.weapons,
+        filters=filters,
+        projection=parse_fields(fields, WEAPON_LIST_FIELDS, ["weapon_id", "name"]),
+        sort_field=sort,
+        descending=order == "desc",
+        limit=limit,
+        cursor=cursor
+    )
 
 
 # get a weapon
 @router.get("/{weapon_id}", status_code=status.HTTP_200_OK, response_model=weapons_pydantic.WeaponResponse)
 async def get_weapon(weapon_id: str, db: AsyncIOMotorDatabase = Depends(get_db_out)):
     # Query the database for the weapon with the given ID
-    weapon = await db.weapons.find_one({"weapon_id": weapon_id})
+    weapon = await catalog_cache.get(db, settings.WEAPONS_COLLECTION, weapon_id)
 
     # If no weapon is found, raise a 404 error
     if weapon is None:
@@ -35,45 +69,57 @@ async def get_weapon(weapon_id: str, db: AsyncIOMotorDatabase = Depends(get_db_o
 # Choose an existing weapon
 @router.post("/choose", response_model=weapons_pydantic.WeaponResponse, status_code=status.HTTP_200_OK)
 async def choose_weapon(payload: weapons_pydantic.ChooseWeaponRequest, db: AsyncIOMotorDatabase = Depends(get_db_out)):
-    normalized_name = payload.name.lower()
-    weapon = await db.weapons.find_one({"name": {"$regex": f"^{normalized_name}$", "$options": "i"}})
-    if not weapon:
+    # Match the name case-insensitively (served by the name_ci index) and increment the count in one round trip
+    updated_weapon = await db.weapons.find_one_and_update(
+        {"name": payload.name},
+        {"$inc": {"count": 1}},
+        collation=CASE_INSENSITIVE,
+        return_document=ReturnDocument.AFTER
+    )
+    if not updated_weapon:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Weapon not found")
-
-    # Increment the count
-    await db.weapons.update_one({"name": {"$regex": f"^{normalized_name}$", "$options": "i"}}, {"$inc": {"count": 1}})
-
-    # Fetch updated weapon
-    updated_weapon = await db.weapons.find_one({"name": {"$regex": f"^{normalized_name}$", "$options": "i"}})
+    catalog_cache.invalidate(settings.WEAPONS_COLLECTION, updated_weapon["weapon_id"])
     return weapons_pydantic.WeaponResponse(**updated_weapon)
 
 # Create a new weapon
 @router.post("/create", response_model=weapons_pydantic.WeaponResponse, status_code=status.HTTP_201_CREATED)
 async def create_weapon(weapon: weapons_pydantic.WeaponCreate, db: AsyncIOMotorDatabase = Depends(get_db_out)):
-    normalized_name = weapon.name.lower()
-    # Check if weapon name already exists
-    existing_weapon = await db.weapons.find_one({"name": {"$regex": f"^{normalized_name}$", "$options": "i"}})
-    if existing_weapon:
+    # Check if weapon name already exists (case-insensitively). The unique name_ci_unique
+    # index closes the race between two creates, but is skipped when a legacy duplicate
+    # kept ensure_indexes from building it, so the check stays
+    if await db.weapons.find_one({"name": weapon.name}, {"_id": 1}, collation=CASE_INSENSITIVE):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Weapon with this name already exists")
 
-    # Generate weapon ID based on the latest weapon ID
-    last_weapon = await db.weapons.find_one({}, sort=[("weapon_id", -1)])
-    last_weapon_id = int(last_weapon["weapon_id"]) if last_weapon else 0
-    weapon_id = str(last_weapon_id + 1)
-
-    # Prepare weapon data
-    weapon_data = {
-        "weapon_id": weapon_id,
-        "name": weapon.name,
-        "weapon_type": weapon.weapon_type,
-        "bullet_type": weapon.bullet_type,
-        "fire_rate": weapon.fire_rate,
-        "range": weapon.range,
-        "count": 1
-    }
-
-    # Insert into the database
-    await db.weapons.insert_one(weapon_data)
+    # Allocate the next weapon ID atomically from the weapons counter. An ID that is
+    # already taken means the counter is behind the stored weapons (e.g. legacy
+    # IDs above it): reseed and retry, like create_session
+    for attempt in range(counters.ALLOCATION_ATTEMPTS):
+        weapon_id = await counters.next_sequence(db, "weapons")
+
+        # Prepare weapon data
+        weapon_data = {
+            "weapon_id": weapon_id,
+            "name": weapon.name,
+            "weapon_type": weapon.weapon_type,
+            "bullet_type": weapon.bullet_type,
+            "fire_rate": weapon.fire_rate,
+            "range": weapon.range,
+            "count": 1
+        }
+
+        # Insert into the database; the unique case-insensitive name index rejects duplicates
+        try:
+            await db.weapons.insert_one(dict(weapon_data))
+            break
+        except DuplicateKeyError as e:
+            if "name" in (e.details or {}).get("keyPattern", {}):
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Weapon with this name already exists")
+            logger.warning(f"Weapon ID {weapon_id} already taken, reseeding the weapons counter")
+            await counters.seed_counter(db, "weapons")
+    else:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="Could not allocate a free weapon ID, please retry")
+    catalog_cache.invalidate(settings.WEAPONS_COLLECTION, weapon_id)
 
     return weapons_pydantic.WeaponResponse(**weapon_data)
 
@@ -91,6 +137,7 @@ async def update_weapon(weapon_id: str, weapon_update: weapons_pydantic.WeaponUp
 
     # Update the weapon in the database
     await db.weapons.update_one({"weapon_id": weapon_id}, {"$set": update_data})
+    catalog_cache.invalidate(settings.WEAPONS_COLLECTION, weapon_id)
 
     # Retrieve the updated weapon data
     updated_weapon = await db.weapons.find_one({"weapon_id": weapon_id})
@@ -107,6 +154,7 @@ async def delete_weapon(weapon_id: str, db: AsyncIOMotorDatabase = Depends(get_d
 
     # Delete the weapon from the database
     result = await db.weapons.delete_one({"weapon_id": weapon_id})
+    catalog_cache.invalidate(settings.WEAPONS_COLLECTION, weapon_id)
 
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Weapon not found")
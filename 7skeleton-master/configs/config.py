@@ -1,10 +1,29 @@
+from typing import Optional
 from pydantic import BaseSettings
 
 class Settings(BaseSettings):
     KAFKA_BROKER: str = 'kafka://localhost:9092'
     KAFKA_TOPIC: str = 'soldiers-data'
     KAFKA_KILLFEED_TOPIC: str = 'killfeed'
+    KAFKA_COMBAT_TOPIC: str = 'combat-events'
+    KAFKA_POSITION_TOPIC: str = 'soldier-positions'
+    FAUST_PERSIST_WEB_PORT: int = 6067  # Web server of the MongoDB writer worker (faust_persist_app)
     MONGODB_URI: str = 'mongodb://0.0.0.0:27017'
+    # Shared MongoDB client (db/mongo_client.py)
+    MONGO_APP_NAME: str = 'mechphy'
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 0
+    MONGO_MAX_IDLE_TIME_MS: int = 60000
+    MONGO_CONNECT_TIMEOUT_MS: int = 5000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    MONGO_SOCKET_TIMEOUT_MS: int = 0  # 0 = no socket timeout
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int = 10000  # Max wait for a free pooled connection
+    MONGO_COMPRESSORS: str = 'zstd,snappy,zlib'  # In preference order; empty disables compression
+    MONGO_WRITE_CONCERN: str = '1'  # Number of nodes or 'majority'
+    MONGO_JOURNAL: Optional[bool] = None
+    MONGO_READ_CONCERN: str = 'local'
+    MONGO_RETRY_WRITES: bool = True
+    MONGO_RETRY_READS: bool = True
     DB_out: str = 'outside_monitoring'
     DB_in: str = 'archival_monitoring'
     DB_real: str = 'realtime_monitoring'
@@ -15,6 +34,11 @@ class Settings(BaseSettings):
     VEST_COLLECTION: str = 'vests'
     EXPLOSIVE_COLLECTION: str = 'Explosives'
     VEHICLE_COLLECTION: str = 'Vehicle'
+    SESSION_SUMMARY_COLLECTION: str = 'session_summaries'
+    SESSION_ANALYTICS_COLLECTION: str = 'session_analytics'  # Precomputed after-action artifacts, one document each
+    COUNTER_COLLECTION: str = 'counters'  # One sequence document per ID series (sessions, weapons, vests)
+    SESSION_SUMMARY_FLUSH_SECONDS: float = 2.0  # Telemetry first/last/count is written to summaries this often
+    STATS_CUMULATION_LEASE_SECONDS: float = 300.0  # A running end-of-session cumulation not renewed this long is taken over
     FASTAPI_HOST: str = '0.0.0.0'
     FASTAPI_PORT: int = 8000
     SERIAL_PORT: str = '/dev/ttyUSB0'
@@ -22,13 +46,72 @@ class Settings(BaseSettings):
     WS_HOST: str = '0.0.0.0'
     WS_PORT: int = 8001
     KILL_FEED_WS_PORT: int = 8002
-    
+    TEAM_STATS_WS_PORT: int = 8003
+    # Logging (configs/logging_config.py)
+    LOG_LEVEL: str = 'INFO'  # fastapi/faust loggers and the root logger of main.py
+    LOG_FORMAT: str = 'json'  # Log files: 'json' (one object per line) or 'text'; the console is always text
+    LOG_RATE_LIMIT_PER_SECOND: float = 20.0  # Records per second per logging call site (0 = unlimited)
+    LOG_PACKET_SAMPLE_EVERY: int = 100  # Per-packet messages: log one in this many
+    # Realtime pipeline: 'kafka' runs a separate Faust worker, 'embedded' runs the
+    # same stages inside the API process over in-memory channels (single node)
+    REALTIME_PIPELINE: str = 'kafka'
+    EMBEDDED_QUEUE_SIZE: int = 10000  # Per-stage channel bound; a stage this far behind holds up its producer or drops (STAGE_OVERFLOW)
+    # Embedded pipeline channels: 'memory' (asyncio queues) or 'file' (mmap ring
+    # buffers under TRANSPORT_RING_DIR, so another process can produce into them)
+    REALTIME_TRANSPORT: str = 'memory'
+    TRANSPORT_RING_DIR: str = 'ring_buffers'
+    TRANSPORT_RING_BYTES: int = 16 * 1024 * 1024  # Per stream; slower consumers skip what gets overwritten
+    TRANSPORT_RING_POLL_SECONDS: float = 0.005  # How often ring consumers look for records from other processes
+    METRICS_ENABLED: bool = True  # Prometheus-style /metrics; off makes every instrumentation point a no-op
+    # Background jobs (backend_logic/jobs/worker_pool.py)
+    JOB_WORKERS: int = 2  # Worker processes for CPU-heavy jobs (replay index, analytics); 0 runs them on a thread
+    JOB_HISTORY: int = 200  # Finished jobs kept for /api/jobs
+    REPLAY_INDEX_CACHE_SIZE: int = 4  # Replay indexes of ended sessions kept in memory
+    # After-action analytics (backend_logic/jobs/session_analytics.py)
+    ANALYTICS_ON_SESSION_END: bool = True  # Compute them as soon as a session is marked ended
+    ANALYTICS_CELL_METERS: float = 10.0  # Heatmap grid cell size (default for POST .../analytics)
+    ANALYTICS_STATIONARY_SPEED_MPS: float = 0.3  # Slower steps count as standing still
+    ANALYTICS_MAX_SPEED_MPS: float = 12.0  # Faster steps are GPS jumps and are left out
+    ANALYTICS_MAX_GAP_SECONDS: float = 30.0  # Longer gaps between fixes count as neither time nor distance
+    ANALYTICS_TIMELINE_SECONDS: int = 60  # Bucket size of the speed and cohesion timelines
+    ANALYTICS_COHESION_SECONDS: float = 5.0  # Squad members are compared at this interval
+    ANALYTICS_COHESION_RADIUS_M: float = 50.0  # A squad is together while every member is this close to its centre
+    # Event loop watchdog (backend_logic/backendConnection/loop_watchdog.py)
+    LOOP_WATCHDOG_ENABLED: bool = True  # Event loop lag / stall watchdog in the API process and Faust workers
+    LOOP_WATCHDOG_INTERVAL_MS: float = 100.0  # Heartbeat period
+    LOOP_STALL_THRESHOLD_MS: float = 250.0  # Capture the loop thread's stack once it is blocked this long
+    LOOP_STALL_HISTORY: int = 50  # Recent stalls kept for /api/diagnostics/event-loop
+    INGEST_LAG_WARN_SECONDS: float = 2.0  # Warn when traced records reach stage one this long after the serial read
+    # Sampling profiler (backend_logic/backendConnection/profiling.py)
+    PROFILING_ENABLED: bool = False  # Start the sampling profiler at startup (also /api/diagnostics/profiling/start)
+    PROFILING_SAMPLE_INTERVAL_MS: float = 10.0  # Stack sampling period of the event loop thread
+    PROFILING_LAG_PROBE_MS: float = 100.0  # Event loop lag probe period while profiling
+    # Per-stage latency tracing of realtime records (serial read -> WebSocket / MongoDB)
+    PIPELINE_TRACING: bool = True
+    PIPELINE_TRACE_SAMPLE_EVERY: int = 1  # Trace one record in N
+    PIPELINE_TRACE_PUBLISH_SECONDS: float = 10.0  # How often a Faust worker stores its histograms for the API
+    PIPELINE_LATENCY_COLLECTION: str = 'pipeline_latency'  # In DB_real
+    OTEL_EXPORTER_OTLP_ENDPOINT: Optional[str] = None  # e.g. 'http://localhost:4317'; needs opentelemetry-sdk and -exporter-otlp
+    OTEL_SERVICE_NAME: str = 'mechphy-realtime'
+    # Engagement geometry (facing cones / hit plausibility)
+    ENGAGEMENT_CONE_HALF_ANGLE_DEG: float = 30.0  # Soldier "faces" a target within +/- this many degrees of yaw
+    ENGAGEMENT_TICK_SECONDS: float = 0.5  # Pairwise geometry is recomputed at most once per tick
+    ENGAGEMENT_DEFAULT_RANGE_M: float = 400.0  # Used when a soldier's weapon has no range on record
+    # Combat event detection
+    COMBAT_HIT_DEBOUNCE_SECONDS: float = 2.0  # Rising edges closer than this to the last hit are the same hit
+    COMBAT_RESPAWN_SECONDS: float = 0.0  # Killed soldier respawns after hit_status stays 0 this long (0 = never)
+    ACTIVE_SESSION_REFRESH_SECONDS: float = 1.0  # How long the realtime stages reuse the latest session roster
+    # Catalog (soldiers, weapons, vests) read-through cache
+    CATALOG_CACHE_TTL_SECONDS: float = 300.0  # Upper bound on staleness for writes made by other processes
+    CATALOG_CACHE_MAX_ENTRIES: int = 20000
+    CATALOG_CACHE_WATCH_CHANGES: bool = False  # Follow a change stream for cross-worker invalidation (replica set only)
+    # Per-session read endpoint responses
+    SESSION_RESPONSE_LIVE_TTL_SECONDS: float = 1.0
+    SESSION_RESPONSE_ENDED_TTL_SECONDS: float = 300.0  # Bounds staleness from writes that land after the end
+    SESSION_RESPONSE_CACHE_MAX_ENTRIES: int = 5000
+
     class Config:
         env_file = ".env"  # Optional: Load environment variables from .env file
 
 # Instantiate settings
 settings = Settings()
-
-# Access your configuration
-print(settings.KAFKA_BROKER)
-print(settings.FASTAPI_PORT)
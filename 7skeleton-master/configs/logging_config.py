@@ -36,50 +36,216 @@
 
 
 
-# New logger with rotation
+# New logger with rotation, written off the event loop.
+#
+# Loggers only put records on a queue (QueueHandler); a single QueueListener
+# thread formats them and writes the rotating files and the console. Messages
+# stay unformatted until the listener handles them, so hot paths log with
+# %-style arguments rather than f-strings. Each logger's handler rate-limits
+# every call site, and per-packet messages go through `packet_logger`, which
+# only logs one call in LOG_PACKET_SAMPLE_EVERY.
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from configs.config import settings
 
-def setup_logger(name, log_file, level=logging.INFO, max_bytes=5*1024*1024, backup_count=5):
+TEXT_FORMAT = "{asctime} - {levelname} - {name} - {message}"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+_IMMUTABLE = (str, int, float, bool, bytes, type(None))
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__(fmt=TEXT_FORMAT, style="{", datefmt=DATE_FORMAT)
+
+    def format(self, record):
+        text = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{text} ({suppressed} similar messages suppressed)" if suppressed else text
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra=` fields become top-level keys."""
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per call site: bursts of up to `per_second` records, then
+    `per_second` records a second. The next record let through carries the
+    number dropped in between as `suppressed`. CRITICAL is never limited.
+    """
+
+    def __init__(self, per_second: float):
+        super().__init__()
+        self.per_second = per_second
+        self._buckets = {}  # (pathname, lineno) -> [tokens, last refill, suppressed]
+        self._lock = threading.Lock()  # Loggers are also used from Motor/pymongo threads
+
+    def filter(self, record):
+        if self.per_second <= 0 or record.levelno >= logging.CRITICAL:
+            return True
+        key = (record.pathname, record.lineno)
+        now = record.created
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.per_second, now, 0]
+            bucket[0] = min(self.per_second, bucket[0] + (now - bucket[1]) * self.per_second)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1
+            if bucket[2]:
+                record.suppressed, bucket[2] = bucket[2], 0
+        return True
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    Enqueues records for the listener thread. The stock prepare() renders the
+    message and traceback in the caller; here only arguments that could be
+    mutated before the listener gets to them (dicts, lists, objects) are.
+    """
+
+    def prepare(self, record):
+        args = record.args if isinstance(record.args, tuple) else (record.args,)
+        if record.args and not all(isinstance(arg, _IMMUTABLE) for arg in args):
+            record.msg, record.args = record.getMessage(), None
+        return record
+
+
+class SampledLogger:
+    """
+    Logs one in `every` calls per message template (the first one included),
+    deciding before a record is built. For messages logged once per packet:
+
+        packet_logger.info("Parsed packet from soldier %s", soldier_id)
+    """
+
+    def __init__(self, logger: logging.Logger, every: int):
+        self.logger = logger
+        self.every = max(1, every)
+        self._calls = {}
+
+    def _log(self, level, msg, args, kwargs):
+        if not self.logger.isEnabledFor(level):
+            return
+        calls = self._calls.get(msg, 0)
+        self._calls[msg] = calls + 1
+        if calls % self.every == 0:
+            extra = kwargs.pop("extra", None) or {}
+            if self.every > 1:
+                extra["sampled_every"] = self.every
+            self.logger.log(level, msg, *args, extra=extra, stacklevel=3, **kwargs)
+
+    def debug(self, msg, *args, **kwargs):
+        self._log(logging.DEBUG, msg, args, kwargs)
+
+    def info(self, msg, *args, **kwargs):
+        self._log(logging.INFO, msg, args, kwargs)
+
+    def warning(self, msg, *args, **kwargs):
+        self._log(logging.WARNING, msg, args, kwargs)
+
+
+_queue = queue.SimpleQueue()
+_listener_handlers = []
+_listener = None  # Started once the module's own handlers exist
+
+
+def _add_listener_handler(handler: logging.Handler, name: str = None):
+    """Route records of logger `name` (and its children) to `handler` on the listener thread."""
+    if name is not None:
+        handler.addFilter(logging.Filter(name))
+    _listener_handlers.append(handler)
+    if _listener is not None:
+        _listener.handlers = tuple(_listener_handlers)
+
+
+def setup_logger(name, log_file, level=logging.INFO, max_bytes=5*1024*1024, backup_count=5,
+                 rate_limit=settings.LOG_RATE_LIMIT_PER_SECOND):
     """
     Set up a logger with rotation.
     - max_bytes: Maximum size in bytes before rotating (default 5MB).
     - backup_count: Number of backup files to keep.
+    - rate_limit: Records per second per call site (0 disables).
+    The file is written by the listener thread; the logger itself only enqueues.
     """
-    formatter = logging.Formatter(
-        fmt="{asctime} - {levelname} - {name} - {message}",
-        style="{",
-        datefmt="%Y-%m-%d %H:%M:%S"
-    )
-
     handler = RotatingFileHandler(
         log_file,
         maxBytes=max_bytes,
         backupCount=backup_count,
         encoding="utf-8"
     )
-    handler.setFormatter(formatter)
+    handler.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else TextFormatter())
+    _add_listener_handler(handler, name)
+
+    queue_handler = LazyQueueHandler(_queue)
+    queue_handler.addFilter(RateLimitFilter(rate_limit))
 
     logger = logging.getLogger(name)
     logger.setLevel(level)
     # Remove old handlers to avoid duplicate logs
     logger.handlers = []
-    logger.addHandler(handler)
+    logger.addHandler(queue_handler)
+    logger.propagate = False  # The root handler of main.py would write every record a second time
 
     return logger
 
-# Create loggers with rotation
-fastapi_logger = setup_logger('fastapi', 'logs/fastapi.log', level=logging.DEBUG)
-faust_logger = setup_logger('faust', 'logs/faust.log', level=logging.DEBUG)
 
-# Optional: setup console logging only for fastapi
+def configure_root(level=logging.INFO):
+    """Console logging for the root logger (main.py), through the same queue."""
+    queue_handler = LazyQueueHandler(_queue)
+    queue_handler.addFilter(RateLimitFilter(settings.LOG_RATE_LIMIT_PER_SECOND))
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level)
+
+
+def stop_listener():
+    """Write out queued records and stop the listener thread; registered at exit."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_listener)
+
+# Create loggers with rotation (level from settings.LOG_LEVEL, INFO by default)
+fastapi_logger = setup_logger('fastapi', 'logs/fastapi.log', level=settings.LOG_LEVEL.upper())
+faust_logger = setup_logger('faust', 'logs/faust.log', level=settings.LOG_LEVEL.upper())
+
+# Per-packet messages of the realtime path, sampled
+packet_logger = SampledLogger(faust_logger, settings.LOG_PACKET_SAMPLE_EVERY)
+
+# Console: fastapi records and the root logger, not faust
 console_handler = logging.StreamHandler()
-console_handler.setFormatter(logging.Formatter(
-    fmt="{asctime} - {levelname} - {name} - {message}",
-    style="{",
-    datefmt="%Y-%m-%d %H:%M:%S"
-))
-
-# Add console handler only to fastapi logger
-logging.getLogger('fastapi').addHandler(console_handler)
-# logging.getLogger('faust').addHandler(console_handler)  # Uncomment if you want faust logs in console too
\ No newline at end of file
+console_handler.setFormatter(TextFormatter())
+console_handler.addFilter(lambda record: record.name != "faust" and not record.name.startswith("faust."))
+_add_listener_handler(console_handler)
+
+_listener = QueueListener(_queue, *_listener_handlers, respect_handler_level=True)
+_listener.start()
@@ -0,0 +1,294 @@
+# configs/metrics.py
+#
+# Minimal Prometheus-style metrics registry (text exposition format 0.0.4),
+# served at /metrics by the FastAPI app and the Faust worker's web server.
+#
+# With METRICS_ENABLED off, counter()/gauge()/histogram() hand out a shared
+# no-op metric and collectors are never called, so instrumentation points cost
+# one attribute lookup and an empty call. Hot paths that would build labels or
+# read clocks check `metrics.ENABLED` first.
+#
+#   PACKETS = metrics.counter("mechphy_serial_packets_total", "...", ["port", "result"])
+#   PACKETS.labels(port, "parsed").inc()
+
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+from configs.config import settings
+
+ENABLED = settings.METRICS_ENABLED
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escape = lambda value: str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class Family:
+    """Samples of one metric, as produced by a collector at scrape time."""
+
+    def __init__(self, name: str, kind: str, documentation: str):
+        self.name = name
+        self.kind = kind
+        self.documentation = documentation
+        self.samples: List[Tuple[str, Dict[str, str], float]] = []
+
+    def add(self, labels: Dict[str, str], value: float, suffix: str = ""):
+        self.samples.append((suffix, labels, value))
+        return self
+
+    def add_histogram(self, labels: Dict[str, str], buckets: Iterable[Tuple[float, int]], total: float, count: int):
+        """buckets are (upper bound, cumulative count), ending with +Inf."""
+        for bound, cumulative in buckets:
+            self.add({**labels, "le": _format_value(bound)}, cumulative, "_bucket")
+        self.add(labels, total, "_sum")
+        self.add(labels, count, "_count")
+        return self
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(
+            f"{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}"
+            for suffix, labels, value in self.samples
+        )
+        return "\n".join(lines)
+
+
+# ───────────────────────────── METRIC TYPES ─────────────────────────────────
+class _CounterChild:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()  # pymongo listeners report from Motor's worker threads
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    def set(self, value: float):
+        self.value = value
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.started)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    # Unlabelled metrics act as their own single child
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def collect(self) -> Family:
+        family = Family(self.name, self.kind, self.documentation)
+        for key, child in list(self._children.items()):
+            self._add_samples(family, dict(zip(self.labelnames, key)), child)
+        return family
+
+    def _add_samples(self, family: Family, labels: Dict[str, str], child):
+        family.add(labels, child.value)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def dec(self, amount: float = 1):
+        self.labels().dec(amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def _add_samples(self, family: Family, labels: Dict[str, str], child):
+        cumulative, buckets = 0, []
+        for bound, count in zip(list(self.buckets) + [float("inf")], list(child.counts)):
+            cumulative += count
+            buckets.append((bound, cumulative))
+        family.add_histogram(labels, buckets, child.sum, child.count)
+
+
+class _NoopMetric:
+    """Stands in for every metric when METRICS_ENABLED is off."""
+
+    def labels(self, *values):
+        return self
+
+    def inc(self, amount: float = 1):
+        pass
+
+    def dec(self, amount: float = 1):
+        pass
+
+    def set(self, value: float):
+        pass
+
+    def observe(self, value: float):
+        pass
+
+    def time(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+NOOP = _NoopMetric()
+
+
+# ───────────────────────────── REGISTRY ─────────────────────────────────────
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        # Modules imported twice (e.g. `python -m`) get the metric created first
+        return self._metrics.setdefault(metric.name, metric)
+
+    def add_collector(self, collector: Callable[[], Iterable[Family]]):
+        """`collector()` is called on every scrape and returns Families (e.g. from existing stats())."""
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        families: Dict[str, Family] = {}
+
+        def merge(family: Family):
+            # Several collectors may report the same metric with different labels
+            if family.name in families:
+                families[family.name].samples.extend(family.samples)
+            else:
+                families[family.name] = family
+
+        for metric in list(self._metrics.values()):
+            merge(metric.collect())
+        errors = Family("mechphy_metrics_collector_errors", "gauge", "Collectors that failed on this scrape")
+        for collector in self._collectors:
+            try:
+                for family in collector():
+                    merge(family)
+            except Exception:  # One broken collector must not take down the endpoint
+                errors.add({"collector": collector.__name__}, 1)
+        merge(errors)
+        return "\n".join(family.render() for family in families.values() if family.samples) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()):
+    return REGISTRY.register(Counter(name, documentation, labelnames)) if ENABLED else NOOP
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()):
+    return REGISTRY.register(Gauge(name, documentation, labelnames)) if ENABLED else NOOP
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets)) if ENABLED else NOOP
+
+
+def collector(fn: Callable[[], Iterable[Family]]):
+    """Decorator registering a scrape-time collector (a no-op when metrics are disabled)."""
+    if ENABLED:
+        REGISTRY.add_collector(fn)
+    return fn
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
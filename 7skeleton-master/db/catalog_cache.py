@@ -0,0 +1,143 @@
+# db/catalog_cache.py
+#
+# In-process read-through cache for the outside-monitoring catalog (soldiers,
+# weapons, vests). Entries expire after CATALOG_CACHE_TTL_SECONDS; the catalog
+# routes invalidate them on every write, and watch_changes() optionally
+# follows a change stream so several API workers stay coherent.
+
+import asyncio
+import copy
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+from configs import metrics
+from configs.config import settings
+
+# collection -> id field of the catalog documents
+CATALOG_ID_FIELDS = {
+    settings.SOLDIER_COLLECTION: "soldier_id",
+    settings.WEAPONS_COLLECTION: "weapon_id",
+    settings.VEST_COLLECTION: "vest_id",
+}
+
+
+class CatalogCache:
+    """
+    (collection, id) -> document, LRU-bounded with a TTL. Misses are cached
+    too (as None) so unknown ids do not hit MongoDB on every request.
+    Documents are deep-copied in and out; callers may mutate what they get.
+    """
+
+    def __init__(self, ttl_seconds: float = settings.CATALOG_CACHE_TTL_SECONDS,
+                 max_entries: int = settings.CATALOG_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _lookup(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= now:
+            return False, None
+        self._entries.move_to_end(key)
+        return True, entry[1]
+
+    def _store(self, key, document, now):
+        self._entries[key] = (now + self.ttl_seconds, copy.deepcopy(document))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, db, collection_name: str, id_value) -> Optional[dict]:
+        """One catalog document by its id, from memory when fresh."""
+        found = await self.get_many(db, collection_name, [id_value])
+        return found.get(str(id_value))
+
+    async def get_many(self, db, collection_name: str, id_values: Iterable) -> Dict[str, dict]:
+        """Catalog documents by id; everything not cached is fetched with one $in query."""
+        id_field = CATALOG_ID_FIELDS[collection_name]
+        now = time.monotonic()
+        found, missing = {}, []
+        for id_value in {str(v) for v in id_values}:
+            cached, document = self._lookup((collection_name, id_value), now)
+            if cached:
+                self.hits += 1
+                if document is not None:
+                    found[id_value] = copy.deepcopy(document)
+            else:
+                self.misses += 1
+                missing.append(id_value)
+
+        if missing:
+            fetched = {
+                str(doc[id_field]): doc
+                for doc in await db[collection_name].find({id_field: {"$in": missing}}).to_list(length=None)
+            }
+            for id_value in missing:
+                document = fetched.get(id_value)
+                self._store((collection_name, id_value), document, now)
+                if document is not None:
+                    found[id_value] = document
+        return found
+
+    def invalidate(self, collection_name: str, id_value=None):
+        """Drop one document, or the whole collection when id_value is None."""
+        self.invalidations += 1
+        if id_value is not None:
+            self._entries.pop((collection_name, str(id_value)), None)
+            return
+        for key in [k for k in self._entries if k[0] == collection_name]:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    async def watch_changes(self, db, logger):
+        """
+        Invalidate on every catalog change made by any process. Needs a replica
+        set; on a standalone server this logs once and the TTL alone applies.
+        """
+        pipeline = [{"$match": {"ns.coll": {"$in": list(CATALOG_ID_FIELDS)}}}]
+        while True:
+            try:
+                async with db.watch(pipeline, full_document="updateLookup") as stream:
+                    logger.info("Catalog cache is following the change stream")
+                    async for change in stream:
+                        collection_name = change["ns"]["coll"]
+                        document = change.get("fullDocument") or {}
+                        # Deletes only carry _id, so they drop the whole collection
+                        self.invalidate(collection_name, document.get(CATALOG_ID_FIELDS[collection_name]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Catalog change stream unavailable, relying on TTL only: {e}")
+                return
+
+
+# Shared by every router in this process
+catalog_cache = CatalogCache()
+
+
+@metrics.collector
+def _collect_catalog_cache():
+    requests = metrics.Family("mechphy_cache_requests_total", "counter", "Cache lookups by result")
+    requests.add({"cache": "catalog", "result": "hit"}, catalog_cache.hits)
+    requests.add({"cache": "catalog", "result": "miss"}, catalog_cache.misses)
+    entries = metrics.Family("mechphy_cache_entries", "gauge", "Entries held by a cache")
+    entries.add({"cache": "catalog"}, len(catalog_cache._entries))
+    return [requests, entries]
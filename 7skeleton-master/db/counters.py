@@ -0,0 +1,71 @@
+# db/counters.py
+#
+# Atomic sequential IDs for sessions, weapons and vests. Each sequence is one
+# document {_id: <name>, seq: <last id>} in a counters collection next to the
+# collection it numbers; next_sequence() is a single find_one_and_update.
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from configs.config import settings
+from db.mongodb_handler import get_db_in, get_db_out
+
+# IDs a create tries (reseeding the counter in between) before giving up with a 409
+ALLOCATION_ATTEMPTS = 3
+
+# sequence name -> (database, collection, id field)
+SEQUENCES = {
+    "sessions": ("in", "sessions", "session_id"),
+    "weapons": ("out", settings.WEAPONS_COLLECTION, "weapon_id"),
+    "vests": ("out", settings.VEST_COLLECTION, "vest_id"),
+}
+
+
+def counters_collection(db):
+    return db[settings.COUNTER_COLLECTION]
+
+
+async def next_sequence(db, name: str) -> str:
+    """Allocate the next ID of a sequence in one round trip (as a string, like the stored ids)."""
+    try:
+        counter = await counters_collection(db).find_one_and_update(
+            {"_id": name},
+            {"$inc": {"seq": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # Two first-ever allocations raced on the upsert; the counter exists now
+        counter = await counters_collection(db).find_one_and_update(
+            {"_id": name},
+            {"$inc": {"seq": 1}},
+            return_document=ReturnDocument.AFTER
+        )
+    return str(counter["seq"])
+
+
+async def seed_counter(db, name: str) -> int:
+    """Raise one counter to the highest numeric ID stored in the collection it numbers."""
+    _, collection_name, field = SEQUENCES[name]
+    rows = await db[collection_name].aggregate([
+        {"$group": {
+            "_id": None,
+            "max_id": {"$max": {"$convert": {"input": f"${field}", "to": "long", "onError": 0, "onNull": 0}}}
+        }}
+    ]).to_list(length=1)
+    max_id = int(rows[0]["max_id"]) if rows else 0
+    await counters_collection(db).update_one(
+        {"_id": name}, {"$max": {"seq": max_id}}, upsert=True
+    )
+    return max_id
+
+
+async def seed_counters() -> dict:
+    """
+    Raise every counter to the highest numeric ID already stored, so IDs
+    allocated before the counters existed are never handed out again.
+    """
+    databases = {"in": await get_db_in(), "out": await get_db_out()}
+    return {
+        name: await seed_counter(databases[db_key], name)
+        for name, (db_key, _, _) in SEQUENCES.items()
+    }
@@ -23,9 +23,15 @@
 #         'trigger_event': soldier_data.trigger_event,
 #         'bullet_count': soldier_data.bullet_count
 #     }
-from db.schemas.incoming_soldier import Soldier
+from typing import TYPE_CHECKING
 
-def transform_soldier_data(soldier_data: Soldier) -> dict:
+if TYPE_CHECKING:  # The Faust record is only needed for the annotation
+    from db.schemas.incoming_soldier import Soldier
+
+def transform_soldier_data(soldier_data: "Soldier") -> dict:
+    # The in-process pipeline passes the plain dict produced by the serial receiver
+    if isinstance(soldier_data, dict):
+        return transform_soldier_dict(soldier_data)
     return {
         'soldier_id': soldier_data.soldier_id,
         'gps': {
@@ -47,4 +53,31 @@ def transform_soldier_data(soldier_data: Soldier) -> dict:
         'fire_mode': soldier_data.fire_mode,
         'trigger_event': soldier_data.trigger_event,
         'bullet_count': soldier_data.bullet_count
-    }
\ No newline at end of file
+    }
+
+
+def transform_soldier_dict(soldier_data: dict) -> dict:
+    """Same as transform_soldier_data, for a SoldierData.to_dict() payload."""
+    gps, imu, ammo = soldier_data['gps_data'], soldier_data['imu_data'], soldier_data['ammo_data']
+    return {
+        'soldier_id': soldier_data['soldier_id'],
+        'gps': {
+            'latitude': gps['latitude'],
+            'longitude': gps['longitude']
+        },
+        'imu': {
+            'roll': imu['roll'],
+            'pitch': imu['pitch'],
+            'yaw': imu['yaw']
+        },
+        'hit_status': soldier_data['hit_data']['hit_status'],
+        'ammo': {
+            'attacker_id': ammo['attacker_id'],
+            'fire_mode': ammo['fire_mode'],
+            'weapon_id': ammo['weapon_id']
+        },
+        'weapon_id': soldier_data['weapon_id'],
+        'fire_mode': soldier_data['fire_mode'],
+        'trigger_event': soldier_data['trigger_event'],
+        'bullet_count': soldier_data['bullet_count']
+    }
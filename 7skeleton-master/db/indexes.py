@@ -0,0 +1,162 @@
+# db/indexes.py
+#
+# Index bootstrapper and query-plan audit for every collection the routes and
+# the Faust pipeline query. ensure_indexes() runs on FastAPI startup;
+# `python -m db.indexes --explain` prints which hot queries still scan.
+
+import asyncio
+import sys
+from typing import Dict, List, Tuple
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.collation import Collation, CollationStrength
+from pymongo.errors import PyMongoError
+from configs.config import settings
+from db.mongodb_handler import get_db_in, get_db_out
+from db.counters import seed_counters
+
+# Case-insensitive comparison for catalog names ("AK-47" == "ak-47")
+CASE_INSENSITIVE = Collation(locale="en", strength=CollationStrength.SECONDARY)
+
+
+def index_specs() -> Dict[Tuple[str, str], List[IndexModel]]:
+    """(database, collection) -> indexes that must exist."""
+    return {
+        ("in", "sessions"): [
+            IndexModel([("session_id", ASCENDING)], unique=True, name="session_id_unique"),
+            IndexModel([("start_time", DESCENDING)], name="start_time_desc"),
+        ],
+        ("in", settings.SESSION_SUMMARY_COLLECTION): [
+            IndexModel([("session_id", ASCENDING)], unique=True, name="session_id_unique"),
+            IndexModel([("start_time", ASCENDING)], name="start_time"),
+            IndexModel([("end_time", ASCENDING), ("start_time", ASCENDING)], name="end_time_start_time"),
+        ],
+        ("in", settings.SESSION_ANALYTICS_COLLECTION): [
+            IndexModel([("session_id", ASCENDING), ("artifact", ASCENDING)], name="session_id_artifact"),
+        ],
+        ("out", settings.SOLDIER_COLLECTION): [
+            IndexModel([("soldier_id", ASCENDING)], unique=True, name="soldier_id_unique"),
+            IndexModel([("call_sign", ASCENDING), ("_id", ASCENDING)], name="call_sign_id"),
+        ],
+        ("out", settings.WEAPONS_COLLECTION): [
+            IndexModel([("weapon_id", ASCENDING)], unique=True, name="weapon_id_unique"),
+            IndexModel([("name", ASCENDING)], unique=True, collation=CASE_INSENSITIVE, name="name_ci_unique"),
+            IndexModel([("name", ASCENDING), ("_id", ASCENDING)], name="name_id"),
+            IndexModel([("weapon_type", ASCENDING), ("_id", ASCENDING)], name="weapon_type_id"),
+        ],
+        ("out", settings.VEST_COLLECTION): [
+            IndexModel([("vest_id", ASCENDING)], unique=True, name="vest_id_unique"),
+            IndexModel([("protection_level", ASCENDING)], unique=True, name="protection_level_unique"),
+        ],
+        ("out", settings.GEO_COLLECTION): [
+            IndexModel([("session_id", ASCENDING), ("timestamp", DESCENDING)], name="session_id_timestamp"),
+        ],
+    }
+
+
+async def _databases():
+    return {"in": await get_db_in(), "out": await get_db_out()}
+
+
+async def ensure_indexes() -> Dict[str, List[str]]:
+    """
+    Create every declared index (no-op for ones that already exist).
+    Returns {"created": [...], "failed": [...]} instead of raising, so a bad
+    legacy document (e.g. a duplicate id) never blocks startup.
+    """
+    databases = await _databases()
+    report = {"created": [], "failed": []}
+    for (db_key, collection_name), models in index_specs().items():
+        collection = databases[db_key][collection_name]
+        for model in models:
+            name = f"{collection_name}.{model.document['name']}"
+            try:
+                await collection.create_indexes([model])
+                report["created"].append(name)
+            except PyMongoError as e:
+                report["failed"].append(f"{name}: {e}")
+    return report
+
+
+# ───────────────────────────── QUERY PLAN AUDIT ─────────────────────────────
+def hot_queries():
+    """(label, database, collection, filter, sort, collation) for every hot query."""
+    return [
+        ("latest session", "in", "sessions", {}, [("start_time", -1)], None),
+        ("session by id", "in", "sessions", {"session_id": "1"}, None, None),
+        ("session soldier push", "in", "sessions",
+         {"session_id": "1", "participated_soldiers.soldier_id": "1"}, None, None),
+        ("session list", "in", settings.SESSION_SUMMARY_COLLECTION, {}, [("start_time", 1)], None),
+        ("ended session list", "in", settings.SESSION_SUMMARY_COLLECTION,
+         {"end_time": {"$ne": None}}, [("start_time", 1)], None),
+        ("session heatmap list", "in", settings.SESSION_ANALYTICS_COLLECTION,
+         {"session_id": "1", "artifact": {"$regex": "^heatmap:"}}, None, None),
+        ("soldier by id", "out", settings.SOLDIER_COLLECTION, {"soldier_id": "1"}, None, None),
+        ("soldiers by ids", "out", settings.SOLDIER_COLLECTION, {"soldier_id": {"$in": ["1", "2"]}}, None, None),
+        ("weapon by id", "out", settings.WEAPONS_COLLECTION, {"weapon_id": "1"}, None, None),
+        ("weapons by ids", "out", settings.WEAPONS_COLLECTION, {"weapon_id": {"$in": ["1", "2"]}}, None, None),
+        ("weapon by name", "out", settings.WEAPONS_COLLECTION, {"name": "AK-47"}, None, CASE_INSENSITIVE),
+        ("soldier page by call_sign", "out", settings.SOLDIER_COLLECTION,
+         {"call_sign": {"$regex": "^Al"}}, [("call_sign", 1), ("_id", 1)], None),
+        ("weapon page by name", "out", settings.WEAPONS_COLLECTION, {}, [("name", 1), ("_id", 1)], None),
+        ("vest by id", "out", settings.VEST_COLLECTION, {"vest_id": "1"}, None, None),
+        ("vest by protection level", "out", settings.VEST_COLLECTION, {"protection_level": 1}, None, None),
+        ("geo data by session", "out", settings.GEO_COLLECTION, {"session_id": "1"}, [("timestamp", -1)], None),
+    ]
+
+
+def _plan_stages(plan: dict) -> List[str]:
+    """Flatten a winningPlan tree into its stage names."""
+    stages = [plan.get("stage", "?")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages.extend(_plan_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+async def audit_query_plans() -> List[dict]:
+    """Run explain() on every hot query and flag collection scans."""
+    databases = await _databases()
+    results = []
+    for label, db_key, collection_name, query, sort, collation in hot_queries():
+        cursor = databases[db_key][collection_name].find(query).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        if collation:
+            cursor = cursor.collation(collation)
+        try:
+            explanation = await cursor.explain()
+            planner = explanation.get("queryPlanner", {})
+            stages = _plan_stages(planner.get("winningPlan", {}))
+            results.append({
+                "query": label,
+                "collection": collection_name,
+                "stages": stages,
+                "collection_scan": "COLLSCAN" in stages,
+            })
+        except PyMongoError as e:
+            results.append({"query": label, "collection": collection_name, "error": str(e)})
+    return results
+
+
+async def _main(argv):
+    if "--explain" not in argv or "--ensure" in argv:
+        report = await ensure_indexes()
+        for name in report["created"]:
+            print(f"ok      {name}")
+        for failure in report["failed"]:
+            print(f"FAILED  {failure}")
+        for name, seq in (await seed_counters()).items():
+            print(f"counter {name} >= {seq}")
+    if "--explain" in argv:
+        for result in await audit_query_plans():
+            if "error" in result:
+                print(f"ERROR   {result['query']}: {result['error']}")
+            else:
+                flag = "COLLSCAN" if result["collection_scan"] else "ok"
+                print(f"{flag:<8}{result['query']:<28}{' <- '.join(result['stages'])}")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main(sys.argv[1:]))
@@ -0,0 +1,220 @@
+# db/mongo_client.py
+#
+# The one MongoDB client of the process. It is created lazily on first use
+# (inside the running event loop), tuned from settings, opened/closed by the
+# FastAPI and Faust lifecycles, and reports connection pool metrics.
+
+import threading
+import time
+from typing import Optional
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from pymongo.read_concern import ReadConcern
+from pymongo.write_concern import WriteConcern
+from configs.config import settings
+from configs import metrics
+
+MONGO_OPERATION_SECONDS = metrics.histogram(
+    "mechphy_mongodb_operation_seconds", "MongoDB command latency", ["database", "collection", "op"]
+)
+MONGO_OPERATION_FAILURES = metrics.counter(
+    "mechphy_mongodb_operation_failures_total", "MongoDB commands that failed", ["database", "collection", "op"]
+)
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool counters, fed by pymongo's CMAP events."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.connections_open = 0
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.pools_cleared = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+        self._checkout_started = {}
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self.pools_cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.connections_created += 1
+        self.connections_open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.connections_closed += 1
+        self.connections_open -= 1
+
+    def connection_check_out_started(self, event):
+        # Events of one checkout are published on the checking-out thread, in order
+        self._checkout_started[(event.address, threading.get_ident())] = time.perf_counter()
+
+    def _checkout_finished(self, event) -> float:
+        started = self._checkout_started.pop((event.address, threading.get_ident()), None)
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def connection_check_out_failed(self, event):
+        self._checkout_finished(event)
+        self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        waited = self._checkout_finished(event)
+        self.checkouts += 1
+        self.checkout_wait_total += waited
+        self.checkout_wait_max = max(self.checkout_wait_max, waited)
+        self.checked_out += 1
+        self.max_checked_out = max(self.max_checked_out, self.checked_out)
+
+    def connection_checked_in(self, event):
+        self.checked_out -= 1
+
+    def snapshot(self) -> dict:
+        return {
+            "max_pool_size": settings.MONGO_MAX_POOL_SIZE,
+            "connections_open": self.connections_open,
+            "connections_created": self.connections_created,
+            "connections_closed": self.connections_closed,
+            "checked_out": self.checked_out,
+            "max_checked_out": self.max_checked_out,
+            "checkouts": self.checkouts,
+            "checkout_failures": self.checkout_failures,
+            "checkout_wait_avg_ms": round(1000 * self.checkout_wait_total / self.checkouts, 3) if self.checkouts else None,
+            "checkout_wait_max_ms": round(1000 * self.checkout_wait_max, 3),
+            "pools_cleared": self.pools_cleared,
+        }
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Per collection/operation latency, fed by pymongo's command monitoring (only when metrics are on)."""
+
+    def __init__(self):
+        self._collections = {}  # request_id -> collection of the running command
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        self._collections[event.request_id] = collection if isinstance(collection, str) else ""
+
+    def _labels(self, event):
+        return event.database_name, self._collections.pop(event.request_id, ""), event.command_name
+
+    def succeeded(self, event):
+        MONGO_OPERATION_SECONDS.labels(*self._labels(event)).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        labels = self._labels(event)
+        MONGO_OPERATION_SECONDS.labels(*labels).observe(event.duration_micros / 1e6)
+        MONGO_OPERATION_FAILURES.labels(*labels).inc()
+
+
+pool_metrics = PoolMetrics()
+_client: Optional[AsyncIOMotorClient] = None
+_databases = {}
+_sync_client = None
+
+
+def _client_options() -> dict:
+    options = {
+        "appname": settings.MONGO_APP_NAME,
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": settings.MONGO_MAX_IDLE_TIME_MS,
+        "connectTimeoutMS": settings.MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "waitQueueTimeoutMS": settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "retryWrites": settings.MONGO_RETRY_WRITES,
+        "retryReads": settings.MONGO_RETRY_READS,
+        "event_listeners": [pool_metrics, CommandMetrics()] if metrics.ENABLED else [pool_metrics],
+    }
+    if settings.MONGO_SOCKET_TIMEOUT_MS:
+        options["socketTimeoutMS"] = settings.MONGO_SOCKET_TIMEOUT_MS
+    if settings.MONGO_COMPRESSORS:
+        # pymongo skips (with a warning) compressors whose library is not installed
+        options["compressors"] = settings.MONGO_COMPRESSORS
+    return options
+
+
+def get_client() -> AsyncIOMotorClient:
+    """The shared client, created on first use."""
+    global _client
+    if _client is None:
+        _client = AsyncIOMotorClient(settings.MONGODB_URI, **_client_options())
+    return _client
+
+
+def get_database(name: str):
+    """A database handle with the configured read/write concerns (built once per name)."""
+    database = _databases.get(name)
+    if database is None:
+        write_concern = WriteConcern(
+            w=int(settings.MONGO_WRITE_CONCERN) if settings.MONGO_WRITE_CONCERN.isdigit() else settings.MONGO_WRITE_CONCERN,
+            j=settings.MONGO_JOURNAL
+        )
+        database = _databases[name] = get_client().get_database(
+            name,
+            write_concern=write_concern,
+            read_concern=ReadConcern(settings.MONGO_READ_CONCERN)
+        )
+    return database
+
+
+def get_sync_database(name: str):
+    """
+    Blocking pymongo handle for job worker processes (backend_logic/jobs),
+    which have no event loop. Never use it on the API or Faust loop.
+    """
+    global _sync_client
+    if _sync_client is None:
+        from pymongo import MongoClient
+        options = dict(_client_options(), maxPoolSize=2, minPoolSize=0, event_listeners=[])
+        _sync_client = MongoClient(settings.MONGODB_URI, **options)
+    return _sync_client.get_database(name, read_concern=ReadConcern(settings.MONGO_READ_CONCERN))
+
+
+async def connect():
+    """Create the client and fail fast if the server is unreachable."""
+    await get_client().admin.command("ping")
+
+
+def close():
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+    _databases.clear()
+
+
+def pool_stats() -> dict:
+    return dict(pool_metrics.snapshot(), connected=_client is not None)
+
+
+@metrics.collector
+def _collect_pool():
+    gauges = metrics.Family("mechphy_mongodb_pool_connections", "gauge", "Connections of the shared MongoDB pool")
+    gauges.add({"state": "open"}, pool_metrics.connections_open)
+    gauges.add({"state": "checked_out"}, pool_metrics.checked_out)
+    checkouts = metrics.Family("mechphy_mongodb_pool_checkouts_total", "counter", "Connection checkouts")
+    checkouts.add({"result": "ok"}, pool_metrics.checkouts)
+    checkouts.add({"result": "failed"}, pool_metrics.checkout_failures)
+    wait = metrics.Family("mechphy_mongodb_pool_checkout_wait_seconds_total", "counter",
+                          "Time spent waiting for a pooled connection")
+    wait.add({}, pool_metrics.checkout_wait_total)
+    return [gauges, checkouts, wait]
@@ -1,43 +1,41 @@
-from motor.motor_asyncio import AsyncIOMotorClient
 from configs.config import settings
 from bson import ObjectId
 from backend_logic.pydantic_responses_out import soldier_pydantic
 from datetime import datetime
+from db.catalog_cache import catalog_cache
+from db.mongo_client import get_database
 
-# Initialize MongoDB client and database
-client = AsyncIOMotorClient(settings.MONGODB_URI)
-db_out = client[settings.DB_out]
-db_in = client[settings.DB_in]
-db_real = client[settings.DB_real]
-geo_collection = db_out[settings.GEO_COLLECTION]
-soldier_collection = db_out[settings.SOLDIER_COLLECTION]
-weapons_collection = db_out[settings.WEAPONS_COLLECTION]
-vests_collection = db_out[settings.VEST_COLLECTION]
-explosives_collection = db_out[settings.EXPLOSIVE_COLLECTION]
-vehicle_collection = db_out[settings.VEHICLE_COLLECTION]
-incoming_soldiers_collection = db_real[settings.INCOMING_SOLDIER_COLLECTION]
+# Databases come from the shared client in db/mongo_client.py, created on first use
+def _db_out():
+    return get_database(settings.DB_out)
+
+def _db_in():
+    return get_database(settings.DB_in)
+
+def _db_real():
+    return get_database(settings.DB_real)
 
 # Function to access database anywhere
 async def get_db_out():
-    return db_out
+    return _db_out()
 
 async def get_db_in():
-    return db_in
+    return _db_in()
 
 async def get_db_real():
-    return db_real
+    return _db_real()
 
 # Function to store geographic data (such as soldier positions)
 async def insert_geo_data(data: dict):
     try:
-        await geo_collection.insert_one(data)
+        await _db_out()[settings.GEO_COLLECTION].insert_one(data)
     except Exception as e:
         print(f"Error inserting geo data: {e}")
 
 # Function to retrieve latest soldier positions for a session
 async def get_latest_soldier_positions(session_id: str):
     try:
-        cursor = geo_collection.find({'session_id': session_id}).sort('timestamp', -1).limit(100)
+        cursor = _db_out()[settings.GEO_COLLECTION].find({'session_id': session_id}).sort('timestamp', -1).limit(100)
         return await cursor.to_list(length=100)
     except Exception as e:
         print(f"Error fetching soldier positions: {e}")
@@ -47,7 +45,7 @@ async def get_latest_soldier_positions(session_id: str):
 # Function to store soldier data
 async def store_to_mongo(data: dict):
     try:
-        result = await incoming_soldiers_collection.insert_one(data)
+        result = await _db_real()[settings.INCOMING_SOLDIER_COLLECTION].insert_one(data)
         # Convert MongoDB ObjectId to string
         data['_id'] = str(result.inserted_id)
     except Exception as e:
@@ -67,7 +65,7 @@ async def get_soldier_data_from_db(soldier_id: int):
         print(f"Querying for soldier_id: {soldier_id_str}")  
         
         # Fetch soldier data from the MongoDB collection using the soldier_id
-        soldier_data = await soldier_collection.find_one({"soldier_id": soldier_id_str})
+        soldier_data = await catalog_cache.get(_db_out(), settings.SOLDIER_COLLECTION, soldier_id_str)
         print(f"MongoDB query result: {soldier_data}")  # <-- Add this
         
         if soldier_data:
@@ -112,7 +110,7 @@ async def get_soldier_data_from_latest_session(soldier_id: str):
     soldier_id_str = str(soldier_id).strip()  
     
     # Get the latest session sorted by start_time
-    latest_session = await db_in["sessions"].find_one(
+    latest_session = await _db_in()["sessions"].find_one(
         sort=[("start_time", -1)]
     )
     
@@ -131,7 +129,7 @@ async def update_soldier_damage(soldier_id: int, damage: int):
         soldier_id_str = str(soldier_id)
 
         # Get the latest session sorted by start_time
-        latest_session = await db_in["sessions"].find_one(
+        latest_session = await _db_in()["sessions"].find_one(
             sort=[("start_time", -1)]
         )
 
@@ -150,7 +148,7 @@ async def update_soldier_damage(soldier_id: int, damage: int):
                         soldier['damage']["100"] = datetime.utcnow().isoformat()
 
                     # Save the updated soldier data back to the session in the database
-                    await db_in["sessions"].update_one(
+                    await _db_in()["sessions"].update_one(
                         {"_id": latest_session["_id"], "participated_soldiers.soldier_id": soldier_id_str},
                         {"$set": {"participated_soldiers.$": soldier}}
                     )
@@ -170,7 +168,7 @@ async def update_soldier_death(soldier_id: int):
         soldier_id_str = str(soldier_id)
 
         # Get the latest session sorted by start_time
-        latest_session = await db_in["sessions"].find_one(
+        latest_session = await _db_in()["sessions"].find_one(
             sort=[("start_time", -1)]
         )
 
@@ -182,7 +180,7 @@ async def update_soldier_death(soldier_id: int):
                     soldier['died'] = datetime.utcnow().isoformat()
 
                     # Save the updated soldier data back to the session in the database
-                    await db_in["sessions"].update_one(
+                    await _db_in()["sessions"].update_one(
                         {"_id": latest_session["_id"], "participated_soldiers.soldier_id": soldier_id_str},
                         {"$set": {"participated_soldiers.$": soldier}}
                     )
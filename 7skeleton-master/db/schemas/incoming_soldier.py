@@ -28,6 +28,7 @@
 #     trigger_event: int
 #     bullet_count: int
 
+from typing import Optional
 from faust import Record
 
 class GPS(Record):
@@ -56,4 +57,5 @@ class Soldier(Record):
     weapon_id: int
     fire_mode: int
     trigger_event: int
-    bullet_count: int
\ No newline at end of file
+    bullet_count: int
+    trace: Optional[dict] = None  # Stage timestamps of sampled records, see tracing.py
\ No newline at end of file
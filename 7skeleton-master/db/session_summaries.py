@@ -0,0 +1,171 @@
+# db/session_summaries.py
+#
+# One small document per session in archival_monitoring.session_summaries, kept
+# up to date by the session routes and the realtime pipeline, so listing
+# sessions never has to open the (large) session documents themselves.
+
+import asyncio
+import time
+from typing import Dict, Optional
+from pymongo import UpdateOne
+from configs.config import settings
+from db.mongodb_handler import get_db_in
+
+
+def summaries_collection(db_in):
+    return db_in[settings.SESSION_SUMMARY_COLLECTION]
+
+
+def new_summary(session_id: str, start_time, end_time=None) -> dict:
+    return {
+        "session_id": session_id,
+        "start_time": start_time,
+        "end_time": end_time,
+        "first_telemetry_time": None,
+        "last_telemetry_time": None,
+        "soldier_count": 0,
+        "kill_total": 0,
+        "kills_by_team": {},
+        "data_points": 0,
+    }
+
+
+async def init_summary(db_in, session_id: str, start_time):
+    """Create the summary when a session is created."""
+    await summaries_collection(db_in).update_one(
+        {"session_id": session_id},
+        {"$setOnInsert": new_summary(session_id, start_time)},
+        upsert=True
+    )
+
+
+async def set_soldier_count(db_in, session_id: str, soldier_count: int):
+    await summaries_collection(db_in).update_one(
+        {"session_id": session_id},
+        {"$set": {"soldier_count": soldier_count}}
+    )
+
+
+async def mark_ended(db_in, session_id: str, end_time):
+    await summaries_collection(db_in).update_one(
+        {"session_id": session_id},
+        {"$set": {"end_time": end_time}}
+    )
+
+
+async def record_kill(db_in, session_id: str, team: Optional[str]):
+    inc = {"kill_total": 1}
+    if team:
+        inc[f"kills_by_team.{team}"] = 1
+    await summaries_collection(db_in).update_one({"session_id": session_id}, {"$inc": inc})
+
+
+async def delete_summary(db_in, session_id: str):
+    await summaries_collection(db_in).delete_one({"session_id": session_id})
+
+
+class TelemetrySummaryAccumulator:
+    """
+    Folds per-packet telemetry into first/last timestamp and packet count in
+    memory and writes it out at most every SESSION_SUMMARY_FLUSH_SECONDS, so
+    the summary costs one small update per interval instead of one per packet.
+    Timestamps are ISO strings, which order correctly as strings.
+    """
+
+    def __init__(self, flush_seconds: float = settings.SESSION_SUMMARY_FLUSH_SECONDS):
+        self.flush_seconds = flush_seconds
+        self._pending: Dict[str, dict] = {}
+        self._last_flush = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def note(self, session_id: str, timestamp: str):
+        pending = self._pending.get(session_id)
+        if pending is None:
+            self._pending[session_id] = {"first": timestamp, "last": timestamp, "count": 1}
+        else:
+            pending["first"] = min(pending["first"], timestamp)
+            pending["last"] = max(pending["last"], timestamp)
+            pending["count"] += 1
+
+        if time.monotonic() - self._last_flush >= self.flush_seconds:
+            await self.flush()
+
+    async def flush(self, db_in=None):
+        async with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+            if not pending:
+                return
+            db_in = db_in if db_in is not None else await get_db_in()
+            # A pipeline update: the $min update operator keeps the null the
+            # summary is created with (null sorts before strings), while the
+            # $min expression ignores nulls
+            await summaries_collection(db_in).bulk_write([
+                UpdateOne(
+                    {"session_id": session_id},
+                    [{"$set": {
+                        "first_telemetry_time": {"$min": ["$first_telemetry_time", p["first"]]},
+                        "last_telemetry_time": {"$max": ["$last_telemetry_time", p["last"]]},
+                        "data_points": {"$add": [{"$ifNull": ["$data_points", 0]}, p["count"]]},
+                    }}]
+                )
+                for session_id, p in pending.items()
+            ], ordered=False)
+
+
+# ───────────────────────────────── BACKFILL ─────────────────────────────────
+# Computed inside MongoDB so backfilling does not pull telemetry into Python
+_BACKFILL_PIPELINE = [
+    {"$project": {
+        "_id": 0,
+        "session_id": 1,
+        "start_time": 1,
+        "end_time": 1,
+        "soldier_count": {"$size": {"$ifNull": ["$participated_soldiers", []]}},
+        "kill_total": {"$size": {"$ifNull": ["$events", []]}},
+        "roster": {"$map": {
+            "input": {"$ifNull": ["$participated_soldiers", []]},
+            "as": "s",
+            "in": {"soldier_id": "$$s.soldier_id", "team": "$$s.team"}
+        }},
+        "attackers": {"$ifNull": ["$events.attacker_id", []]},
+        "timestamps": {"$reduce": {
+            "input": {"$ifNull": ["$participated_soldiers.location.timestamp", []]},
+            "initialValue": [],
+            "in": {"$concatArrays": ["$$value", {"$ifNull": ["$$this", []]}]}
+        }},
+    }},
+    {"$project": {
+        "session_id": 1, "start_time": 1, "end_time": 1,
+        "soldier_count": 1, "kill_total": 1, "roster": 1, "attackers": 1,
+        "first_telemetry_time": {"$min": "$timestamps"},
+        "last_telemetry_time": {"$max": "$timestamps"},
+        "data_points": {"$size": "$timestamps"},
+    }},
+]
+
+
+async def backfill_session_summaries(db_in=None) -> int:
+    """(Re)build every session summary from the session documents."""
+    db_in = db_in if db_in is not None else await get_db_in()
+    operations = []
+    async for row in db_in["sessions"].aggregate(_BACKFILL_PIPELINE, allowDiskUse=True):
+        team_of = {s.get("soldier_id"): s.get("team") for s in row.pop("roster")}
+        kills_by_team = {}
+        for attacker_id in row.pop("attackers"):
+            team = team_of.get(attacker_id)
+            if team:
+                kills_by_team[team] = kills_by_team.get(team, 0) + 1
+
+        summary = new_summary(row["session_id"], row.get("start_time"), row.get("end_time"))
+        summary.update(row, kills_by_team=kills_by_team)
+        operations.append(UpdateOne({"session_id": row["session_id"]}, {"$set": summary}, upsert=True))
+
+    if operations:
+        await summaries_collection(db_in).bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+if __name__ == "__main__":
+    count = asyncio.run(backfill_session_summaries())
+    print(f"Backfilled {count} session summaries")
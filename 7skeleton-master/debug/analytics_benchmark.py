@@ -0,0 +1,108 @@
+# debug/analytics_benchmark.py
+#
+# Times the after-action analytics (backend_logic/jobs/session_analytics.py)
+# on a generated session, without MongoDB: squads random-walk around their own
+# centre at `--rate` fixes per second for `--hours`, with `--kills` kill
+# events (half of them without a recorded distance). Prints the time of each
+# phase and the size of every artifact as BSON would store it.
+#
+#   python -m debug.analytics_benchmark --soldiers 60 --hours 3 --rate 1
+
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from configs.config import settings
+from backend_logic.jobs import session_analytics
+
+ORIGIN = (28.6139, 77.2090)
+METRES_PER_DEGREE = 111320.0
+
+
+def generate_session(soldiers: int, hours: float, rate: float, kills: int, seed: int = 7) -> dict:
+    rng = np.random.default_rng(seed)
+    start = datetime(2025, 1, 1, 6, 0, 0)
+    samples = int(hours * 3600 * rate)
+    offsets = np.arange(samples) / rate
+    timestamps = [(start + timedelta(seconds=float(s))).isoformat() for s in offsets]
+
+    roster = []
+    for i in range(soldiers):
+        team = "blue" if i % 2 == 0 else "red"
+        squad = (i // 2) % 6 + 1
+        # Squad centre drifts slowly; members wander a few metres around it
+        squad_rng = np.random.default_rng(seed + squad * 2 + (team == "red"))
+        centre = np.cumsum(squad_rng.normal(0, 0.8 / rate, (samples, 2)), axis=0)
+        wander = rng.normal(0, 15, 2) + np.cumsum(rng.normal(0, 0.3, (samples, 2)), axis=0) * 0.2
+        metres = centre + wander + (0 if team == "blue" else 400)
+        lat = ORIGIN[0] + metres[:, 1] / METRES_PER_DEGREE
+        lon = ORIGIN[1] + metres[:, 0] / (METRES_PER_DEGREE * np.cos(np.radians(ORIGIN[0])))
+        roster.append({
+            "soldier_id": str(1000 + i),
+            "call_sign": f"{team[0].upper()}{squad}-{i}",
+            "team": team,
+            "squad": squad,
+            "location": [
+                {"latitude": la, "longitude": lo, "timestamp": ts}
+                for la, lo, ts in zip(lat.tolist(), lon.tolist(), timestamps)
+            ],
+        })
+
+    events = []
+    for k in range(kills):
+        attacker, victim = rng.choice(soldiers, 2, replace=False)
+        at = float(rng.uniform(0, hours * 3600))
+        events.append({
+            "attacker_id": roster[attacker]["soldier_id"],
+            "attacker_call_sign": roster[attacker]["call_sign"],
+            "victim_id": roster[victim]["soldier_id"],
+            "victim_call_sign": roster[victim]["call_sign"],
+            "distance_to_victim (in meters)": float(rng.uniform(10, 500)) if k % 2 else None,
+            "timestamp": (start + timedelta(seconds=at)).isoformat(),
+        })
+    return {
+        "start_time": start,
+        "end_time": start + timedelta(hours=hours),
+        "participated_soldiers": roster,
+        "events": events,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--soldiers", type=int, default=60)
+    parser.add_argument("--hours", type=float, default=3.0)
+    parser.add_argument("--rate", type=float, default=1.0, help="fixes per second per soldier")
+    parser.add_argument("--kills", type=int, default=200)
+    parser.add_argument("--cell-m", type=float, default=settings.ANALYTICS_CELL_METERS)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    session = generate_session(args.soldiers, args.hours, args.rate, args.kills)
+    fixes = sum(len(s["location"]) for s in session["participated_soldiers"])
+    print(f"generated {args.soldiers} soldiers x {args.hours:g} h = {fixes} fixes "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    artifacts = session_analytics.analyze(session, args.cell_m)
+    print(f"analyze: {time.perf_counter() - started:.2f}s")
+
+    try:
+        import bson
+        size = lambda data: len(bson.encode({"data": data}))
+    except ImportError:  # No pymongo: JSON length is close enough for a size check
+        size = lambda data: len(json.dumps(data, default=str))
+    sizes = {name: size(data) for name, data in artifacts.items()}
+    heatmaps = [n for n in sizes if n.startswith("heatmap:")]
+    print(f"artifacts: {len(sizes)} ({len(heatmaps)} heatmaps), largest "
+          f"{max(sizes, key=sizes.get)} {max(sizes.values()) / 1024:.0f} KiB, "
+          f"total {sum(sizes.values()) / 1024:.0f} KiB")
+
+    summary = artifacts["summary"]
+    print(json.dumps({k: summary[k] for k in ("duration_s", "fixes", "kills", "distance_m", "teams",
+                                               "engagement_distance", "compute_s")}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# debug/counter_concurrency.py
+#
+# Concurrency check for db/counters.py: fires many allocations at once against
+# a scratch database and fails if any ID is handed out twice or skipped.
+#
+#   python -m debug.counter_concurrency [allocations] [concurrency]
+
+import asyncio
+import sys
+import time
+from db import mongo_client
+from db.counters import counters_collection, next_sequence
+
+SCRATCH_DB = "counter_concurrency_check"
+
+
+async def run_check(allocations: int = 2000, concurrency: int = 200) -> bool:
+    # Same shared client (and pool settings) the API uses
+    db = mongo_client.get_database(SCRATCH_DB)
+    await counters_collection(db).delete_many({})
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def allocate():
+        async with semaphore:
+            return int(await next_sequence(db, "check"))
+
+    started = time.perf_counter()
+    # Every task races the first-ever upsert as well as the increments
+    ids = await asyncio.gather(*(allocate() for _ in range(allocations)))
+    elapsed = time.perf_counter() - started
+
+    duplicates = len(ids) - len(set(ids))
+    gaps = set(range(1, allocations + 1)) - set(ids)
+    print(f"{allocations} allocations, {concurrency} concurrent, {elapsed:.2f}s "
+          f"({allocations / elapsed:.0f}/s)")
+    print(f"duplicates: {duplicates}, missing: {len(gaps)}")
+    print(f"pool: {mongo_client.pool_stats()}")
+
+    await mongo_client.get_client().drop_database(SCRATCH_DB)
+    mongo_client.close()
+    return duplicates == 0 and not gaps
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    ok = asyncio.run(run_check(*args))
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
@@ -15,7 +15,7 @@ logger = logging.getLogger(__name__)
 async def debug_serial_data():
     """Test if serial receiver is actually producing data"""
     logger.info("=== Testing Serial Data Reception ===")
-    logger.info(f"Serial port should be: /dev/ttyUSB0")
+    logger.info(f"Serial port should be: {settings.SERIAL_PORT}")
     
     try:
         count = 0
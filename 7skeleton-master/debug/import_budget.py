@@ -0,0 +1,65 @@
+# debug/import_budget.py
+#
+# Cold-start check: imports each entry module in a fresh interpreter with
+# `python -X importtime` and fails if it exceeds its time budget or drags in
+# a subsystem its mode does not use. A module that cannot be imported at all
+# (missing dependency) fails the check too, unless --allow-missing is given
+# for an environment that deliberately lacks some extras.
+#
+#   python -m debug.import_budget [--allow-missing]
+
+import argparse
+import os
+import subprocess
+import sys
+
+# module -> (budget in ms, modules that must NOT be imported as a side effect)
+BUDGETS = {
+    "main": (150, ["faust", "aioserial", "geopy", "uvicorn", "motor", "fastapi"]),
+    "backend_logic.backendConnection.replay_app": (2000, ["faust", "aioserial", "geopy"]),
+    "backend_logic.backendConnection.fastapi_app": (4000, ["faust", "aioserial", "geopy"]),
+}
+
+
+def measure(module: str):
+    """(cumulative import time of `module` in ms, set of all imported module names)."""
+    code = f"import sys, {module}; print('\\n'.join(sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    cumulative_us = None
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if line.startswith("import time:") and line.rsplit("|", 1)[-1].strip() == module:
+            cumulative_us = int(line.split("|")[1])
+    return (cumulative_us or 0) / 1000, set(result.stdout.split())
+
+
+def run(allow_missing: bool = False) -> bool:
+    ok = True
+    for module, (budget_ms, forbidden) in BUDGETS.items():
+        try:
+            elapsed_ms, imported = measure(module)
+        except RuntimeError as e:
+            ok = ok and allow_missing
+            print(f"{'SKIP' if allow_missing else 'FAILED':<8}{module}: {e}")
+            continue
+        leaked = sorted(name for name in forbidden if name in imported)
+        status = "ok" if elapsed_ms <= budget_ms and not leaked else "FAILED"
+        ok = ok and status == "ok"
+        print(f"{status:<8}{module:<48}{elapsed_ms:8.1f} ms (budget {budget_ms} ms)"
+              + (f", imports {', '.join(leaked)}" if leaked else ""))
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import time budget check of the entry modules")
+    parser.add_argument("--allow-missing", action="store_true",
+                        help="report modules that fail to import as SKIP instead of failing")
+    args = parser.parse_args()
+    sys.exit(0 if run(args.allow_missing) else 1)
@@ -0,0 +1,323 @@
+# debug/load_generator.py
+#
+# Synthetic vest traffic: the same {id,lat,lon,roll,pitch,yaw,hit,attacker,
+# fire_mode,weapon,trigger,bullets} frames the serial receiver parses, for 10
+# to 1000 soldiers moving over a training area, firing, getting hit and
+# killed, with an optional share of corrupted packets.
+#
+# Sinks:
+#   pty    - writes to the master end of a pty pair; point SERIAL_PORT at the
+#            printed slave end and receive_serial_data reads it like a vest radio
+#   kafka  - sends parsed frames straight to the soldiers topic (Faust worker)
+#   file   - appends parsed frames to the ring file of the embedded pipeline's
+#            soldiers stream (REALTIME_TRANSPORT=file, see transport.py)
+#
+#   python -m debug.load_generator --soldiers 100 --rate 5 --sink pty
+#   SERIAL_PORT=/dev/pts/7 python main.py realtime
+#
+# debug/pipeline_benchmark.py drives this generator to measure the pipeline.
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import time
+import tty
+from typing import List, Optional
+from backend_logic.backendConnection.tracing import tracer
+from backend_logic.data_ingestion.serial_receiver import ddmm_to_decimal, parse_raw_data
+
+MOVEMENT_MODELS = ("static", "random_walk", "patrol", "advance")
+CORRUPTIONS = ("truncate", "garble", "drop_field", "noise")
+
+METERS_PER_DEGREE = 111320.0
+WALK_SPEED_MPS = 1.4
+HIT_HOLD_FRAMES = 3  # Vests keep reporting a hit for a few frames after it lands
+KILL_SHOT_SHARE = 0.2  # Share of hits reported as hit_status 2 (direct kill)
+
+
+def decimal_to_ddmm(value: float, degree_digits: int) -> str:
+    """Decimal degrees to the vest's (D)DDMM.MMMMM text, zero padded like the hardware."""
+    degrees = int(value)
+    minutes = (value - degrees) * 60
+    return f"{degrees * 100 + minutes:0{degree_digits + 8}.5f}"
+
+
+class SimSoldier:
+    def __init__(self, soldier_id: str, team: str, latitude: float, longitude: float,
+                 heading: float, weapon_id: int):
+        self.soldier_id = soldier_id
+        self.team = team
+        self.latitude = latitude
+        self.longitude = longitude
+        self.heading = heading  # Degrees, 0 = north, reported as yaw
+        self.weapon_id = weapon_id
+        self.fire_mode = 0
+        self.start = (latitude, longitude)  # Deployment point
+        self.patrol_angle = 0.0
+        self.hits_taken = 0
+        self.dead = False
+        self.hit_status = 0
+        self.attacker_id = "0"
+        self.hit_frames_left = 0
+
+    def move(self, meters_north: float, meters_east: float):
+        self.latitude += meters_north / METERS_PER_DEGREE
+        self.longitude += meters_east / (METERS_PER_DEGREE * math.cos(math.radians(self.latitude)))
+
+
+class LoadGenerator:
+    """
+    Frame source for `soldiers` vests reporting `rate_hz` times a second.
+    fire_rate is trigger pulls per soldier per second, hit_rate hits per
+    soldier per minute and corruption the share of frames that are mangled.
+    """
+
+    def __init__(self, soldiers: int = 100, rate_hz: float = 1.0, movement: str = "random_walk",
+                 fire_rate: float = 0.2, hit_rate: float = 0.5, corruption: float = 0.0,
+                 origin=(28.525, 77.283), area_m: float = 500.0, first_id: int = 1,
+                 seed: Optional[int] = None):
+        if movement not in MOVEMENT_MODELS:
+            raise ValueError(f"Unknown movement model '{movement}' (use one of {', '.join(MOVEMENT_MODELS)})")
+        self.rate_hz = rate_hz
+        self.dt = 1.0 / rate_hz
+        self.movement = movement
+        self.fire_rate = fire_rate
+        self.hit_rate = hit_rate
+        self.corruption = corruption
+        self.area_m = area_m
+        self.origin = origin
+        self.random = random.Random(seed)
+
+        # Red deploys on the west half of the area, blue on the east half
+        self.soldiers: List[SimSoldier] = []
+        for i in range(soldiers):
+            team = "red" if i % 2 == 0 else "blue"
+            east = self.random.uniform(-area_m / 2, -area_m / 10) if team == "red" else self.random.uniform(area_m / 10, area_m / 2)
+            north = self.random.uniform(-area_m / 2, area_m / 2)
+            soldier = SimSoldier(
+                soldier_id=str(first_id + i), team=team,
+                latitude=origin[0], longitude=origin[1],
+                heading=90.0 if team == "red" else 270.0,
+                weapon_id=self.random.randint(1, 5)
+            )
+            soldier.move(north, east)
+            soldier.start = (soldier.latitude, soldier.longitude)
+            soldier.patrol_angle = self.random.uniform(0, 2 * math.pi)
+            self.soldiers.append(soldier)
+
+        self.frames_generated = 0
+        self.frames_corrupted = 0
+
+    # ─────────────────────────── simulation ─────────────────────────────────
+    def _step_movement(self, soldier: SimSoldier):
+        rnd = self.random
+        if soldier.dead or self.movement == "static":
+            # GPS jitter only
+            soldier.move(rnd.gauss(0, 0.3), rnd.gauss(0, 0.3))
+            return
+        step = WALK_SPEED_MPS * self.dt
+        if self.movement == "random_walk":
+            soldier.heading = (soldier.heading + rnd.gauss(0, 20)) % 360
+        elif self.movement == "patrol":
+            # Circle of 50 m around the deployment point
+            soldier.patrol_angle += step / 50.0
+            soldier.heading = (math.degrees(soldier.patrol_angle) + 90) % 360
+        elif self.movement == "advance":
+            # Walk towards the other team's side, stop at the middle of the area
+            center_east = (soldier.longitude - self.origin[1]) * METERS_PER_DEGREE * math.cos(math.radians(soldier.latitude))
+            if abs(center_east) < 20:
+                return
+            soldier.heading = (90.0 if center_east < 0 else 270.0) + rnd.gauss(0, 10)
+        soldier.move(step * math.cos(math.radians(soldier.heading)),
+                     step * math.sin(math.radians(soldier.heading)))
+
+    def _step_combat(self, soldier: SimSoldier, alive_enemies: List[SimSoldier]):
+        rnd = self.random
+        bullets, trigger = 0, 0
+        if not soldier.dead and rnd.random() < self.fire_rate * self.dt:
+            trigger = 1
+            soldier.fire_mode = rnd.choice((0, 1))  # single / burst
+            bullets = 1 if soldier.fire_mode == 0 else rnd.randint(3, 5)
+
+        if soldier.hit_frames_left:
+            soldier.hit_frames_left -= 1
+            if not soldier.hit_frames_left and not soldier.dead:
+                soldier.hit_status = 0
+        elif not soldier.dead and alive_enemies and rnd.random() < self.hit_rate / 60.0 * self.dt:
+            soldier.attacker_id = rnd.choice(alive_enemies).soldier_id
+            soldier.hit_status = 2 if rnd.random() < KILL_SHOT_SHARE else 1
+            soldier.hits_taken += 1
+            soldier.hit_frames_left = HIT_HOLD_FRAMES
+            soldier.dead = soldier.hit_status == 2 or soldier.hits_taken >= 2
+        return bullets, trigger
+
+    def _corrupt(self, frame: str) -> str:
+        rnd = self.random
+        kind = rnd.choice(CORRUPTIONS)
+        if kind == "truncate":
+            return frame[:rnd.randint(1, len(frame) - 1)]
+        if kind == "garble":
+            i = rnd.randint(1, len(frame) - 2)
+            return frame[:i] + rnd.choice("#?x\x00\xff,") + frame[i + 1:]
+        if kind == "drop_field":
+            fields = frame.strip("{}").split(",")
+            del fields[rnd.randrange(len(fields))]
+            return "{" + ",".join(fields) + "}"
+        return "".join(rnd.choice("abc123 \r\n") for _ in range(rnd.randint(1, 16))) + frame
+
+    def tick(self) -> List[str]:
+        """Advance the simulation by one report interval and return every vest's frame."""
+        rnd = self.random
+        alive = {"red": [s for s in self.soldiers if s.team == "red" and not s.dead],
+                 "blue": [s for s in self.soldiers if s.team == "blue" and not s.dead]}
+        frames = []
+        for soldier in self.soldiers:
+            self._step_movement(soldier)
+            bullets, trigger = self._step_combat(soldier, alive["blue" if soldier.team == "red" else "red"])
+            frame = (
+                f"{{{soldier.soldier_id},"
+                f"{decimal_to_ddmm(soldier.latitude, 2)},{decimal_to_ddmm(soldier.longitude, 3)},"
+                f"{rnd.gauss(0, 3):.2f},{rnd.gauss(0, 3):.2f},{soldier.heading % 360:.2f},"
+                f"{soldier.hit_status},{soldier.attacker_id},{soldier.fire_mode},{soldier.weapon_id},"
+                f"{trigger},{bullets}}}"
+            )
+            if self.corruption and rnd.random() < self.corruption:
+                frame = self._corrupt(frame)
+                self.frames_corrupted += 1
+            frames.append(frame)
+        self.frames_generated += len(frames)
+        return frames
+
+    async def run(self, sink, duration: float, on_sent=None):
+        """
+        Feed `sink` one tick every 1/rate_hz seconds for `duration` seconds.
+        on_sent(frames, sent_at) is called after every tick, sent_at being
+        time.perf_counter() when the sink accepted the frames. Returns the
+        number of ticks that started late because the sink could not keep up.
+        """
+        late_ticks = 0
+        started = time.perf_counter()
+        next_tick = started
+        while time.perf_counter() - started < duration:
+            frames = self.tick()
+            await sink.send(frames)
+            if on_sent:
+                on_sent(frames, time.perf_counter())
+            next_tick += self.dt
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                late_ticks += 1
+                await asyncio.sleep(0)
+        return late_ticks
+
+
+def frame_key(frame: str):
+    """(soldier_id, latitude, longitude) the pipeline will report for a well-formed frame, else None."""
+    fields = frame.strip("{}").split(",")
+    if len(fields) != 12:
+        return None
+    try:
+        return fields[0], ddmm_to_decimal(float(fields[1])), ddmm_to_decimal(float(fields[2]))
+    except ValueError:
+        return None
+
+
+# ───────────────────────────── SINKS ────────────────────────────────────────
+class PtySink:
+    """Master end of a pty pair; `port` (the slave end) behaves like the vest's serial port."""
+
+    def __init__(self):
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)  # No echo or newline translation, like a real serial line
+        os.set_blocking(self.master, False)
+        self.port = os.ttyname(self.slave)
+        self.bytes_dropped = 0
+
+    async def send(self, frames: List[str]):
+        data = "".join(frames).encode()
+        try:
+            written = os.write(self.master, data)
+        except BlockingIOError:
+            written = 0
+        # A reader that falls behind loses bytes, as on a real serial line
+        self.bytes_dropped += len(data) - written
+
+    def close(self):
+        os.close(self.master)
+        os.close(self.slave)
+
+
+class TransportSink:
+    """Parses frames like the serial receiver and sends them to a transport stream."""
+
+    def __init__(self, transport, stream: str = "soldiers"):
+        self.transport = transport
+        self.stream = stream
+        self.frames_rejected = 0
+
+    async def send(self, frames: List[str]):
+        for frame in frames:
+            trace = tracer.start()  # "serial_read" is when the frame reached the sink
+            soldier_data = await parse_raw_data(frame)
+            if soldier_data:
+                payload = soldier_data.to_dict()
+                if trace is not None:
+                    tracer.mark(trace, "parsed")
+                    payload["trace"] = trace
+                    tracer.mark(trace, "produced")
+                await self.transport.send(self.stream, payload)
+            else:
+                self.frames_rejected += 1
+
+    def close(self):
+        self.transport.close()
+
+
+def create_sink(kind: str):
+    if kind == "pty":
+        return PtySink()
+    from backend_logic.backendConnection.transport import create_transport
+    return TransportSink(create_transport(kind))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Synthetic vest traffic generator")
+    parser.add_argument("--soldiers", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=1.0, help="Frames per soldier per second")
+    parser.add_argument("--movement", choices=MOVEMENT_MODELS, default="random_walk")
+    parser.add_argument("--fire-rate", type=float, default=0.2, help="Trigger pulls per soldier per second")
+    parser.add_argument("--hit-rate", type=float, default=0.5, help="Hits per soldier per minute")
+    parser.add_argument("--corruption", type=float, default=0.0, help="Share of corrupted frames (0-1)")
+    parser.add_argument("--first-id", type=int, default=1, help="soldier_id of the first vest")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds")
+    return parser
+
+
+async def _main(args):
+    generator = LoadGenerator(
+        soldiers=args.soldiers, rate_hz=args.rate, movement=args.movement,
+        fire_rate=args.fire_rate, hit_rate=args.hit_rate, corruption=args.corruption,
+        first_id=args.first_id, seed=args.seed
+    )
+    sink = create_sink(args.sink)
+    if isinstance(sink, PtySink):
+        print(f"Serial port: {sink.port}  (SERIAL_PORT={sink.port} python main.py realtime)")
+    try:
+        late_ticks = await generator.run(sink, args.duration)
+    finally:
+        sink.close()
+    print(f"{generator.frames_generated} frames ({generator.frames_corrupted} corrupted), "
+          f"{late_ticks} late ticks")
+    if isinstance(sink, PtySink):
+        print(f"{sink.bytes_dropped} bytes dropped (reader behind)")
+
+
+if __name__ == "__main__":
+    parser = build_parser()
+    parser.add_argument("--sink", choices=("pty", "kafka", "file"), default="pty")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,257 @@
+# debug/pipeline_benchmark.py
+#
+# End-to-end load benchmark: drives debug/load_generator.py into the realtime
+# pipeline and reports throughput, ingest-to-WebSocket latency (p50/p99) of
+# the position broadcast and MongoDB write rates.
+#
+# Sources:
+#   memory / file - in-process EmbeddedPipeline on that transport, frames are
+#                   parsed by the generator and handed to the soldiers stream
+#   pty           - in-process EmbeddedPipeline fed by receive_serial_data
+#                   reading a pty, so serial framing and parsing are included
+#   kafka         - frames go to the soldiers topic; the Faust workers
+#                   (faust_app_v1 and faust_persist_app) must already be
+#                   running against a session whose roster has the
+#                   generated soldier IDs (no scratch database in this mode)
+#
+# The in-process sources run against scratch databases (<DB name>_bench) with
+# a generated session, dropped afterwards unless --keep-db is given.
+#
+#   python -m debug.pipeline_benchmark --soldiers 200 --rate 5 --duration 30 --source memory
+
+import asyncio
+import json
+import shutil
+import statistics
+import tempfile
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from configs.config import settings
+from backend_logic.backendConnection.tracing import tracer
+from debug.load_generator import LoadGenerator, PtySink, TransportSink, build_parser, frame_key
+
+BENCH_SUFFIX = "_bench"
+
+
+async def _create_bench_session(generator: LoadGenerator):
+    from db.mongodb_handler import get_db_in
+    db = await get_db_in()
+    await db["sessions"].insert_one({
+        "session_id": "1",
+        "start_time": datetime.utcnow(),
+        "end_time": None,
+        "participated_soldiers": [
+            {
+                "session_soldier_id": i + 1,
+                "soldier_id": soldier.soldier_id,
+                "call_sign": f"BENCH-{soldier.soldier_id}",
+                "weapon_id": str(soldier.weapon_id),
+                "vest_id": "1",
+                "role": "rifleman",
+                "equipment": "standard",
+                "team": soldier.team,
+                "squad": 1,
+                "location": [],
+                "orientation": [],
+                "event_data": [],
+                "stats": [],
+                "died": None,
+            }
+            for i, soldier in enumerate(generator.soldiers)
+        ],
+        "events": [],
+    })
+
+
+async def _opcounters() -> dict:
+    from db.mongo_client import get_client
+    status = await get_client().admin.command("serverStatus")
+    return status["opcounters"]
+
+
+async def _feed_pipeline_from_serial(pipeline, port: str):
+    from backend_logic.data_ingestion.serial_receiver import receive_serial_data
+    async for soldier_data in receive_serial_data(port=port):
+        await pipeline.send(soldier_data)
+
+
+def _percentile(samples, pct: float) -> float:
+    if len(samples) < 2:
+        return samples[0] if samples else float("nan")
+    return statistics.quantiles(samples, n=100, method="inclusive")[int(pct) - 1]
+
+
+async def run_benchmark(args) -> dict:
+    import websockets
+    from db import mongo_client
+
+    generator = LoadGenerator(
+        soldiers=args.soldiers, rate_hz=args.rate, movement=args.movement,
+        fire_rate=args.fire_rate, hit_rate=args.hit_rate, corruption=args.corruption,
+        first_id=args.first_id, seed=args.seed
+    )
+    in_process = args.source != "kafka"
+    pipeline, feeder, ring_dir = None, None, None
+
+    if in_process:
+        # Keep benchmark writes out of the real databases
+        settings.DB_in += BENCH_SUFFIX
+        settings.DB_out += BENCH_SUFFIX
+        settings.DB_real += BENCH_SUFFIX
+        await mongo_client.connect()
+        for name in (settings.DB_in, settings.DB_out, settings.DB_real):
+            await mongo_client.get_client().drop_database(name)
+        await _create_bench_session(generator)
+
+        from backend_logic.backendConnection.embedded_pipeline import EmbeddedPipeline
+        from backend_logic.backendConnection.transport import FileRingTransport, MemoryTransport
+        if args.source == "file":
+            # Fresh ring files, so no consumer group resumes from an earlier run
+            ring_dir = tempfile.mkdtemp(prefix="bench_ring_")
+            pipeline = EmbeddedPipeline(FileRingTransport(ring_dir))
+        else:
+            pipeline = EmbeddedPipeline(MemoryTransport())
+        await pipeline.start()
+        if args.source == "pty":
+            sink = PtySink()
+            feeder = asyncio.create_task(_feed_pipeline_from_serial(pipeline, sink.port))
+        else:
+            sink = TransportSink(pipeline.transport)
+    else:
+        await mongo_client.connect()
+        from backend_logic.backendConnection.transport import KafkaTransport
+        sink = TransportSink(KafkaTransport())
+
+    # Position broadcasts, matched back to the moment their frame was sent
+    sent_at = defaultdict(deque)
+    latencies = []
+    received = 0
+
+    def on_sent(frames, at):
+        for frame in frames:
+            key = frame_key(frame)
+            if key:
+                sent_at[key].append(at)
+
+    async def listen(websocket):
+        nonlocal received
+        async for message in websocket:
+            now = time.perf_counter()
+            received += 1
+            telemetry = json.loads(message)
+            key = (str(telemetry["soldier_id"]), telemetry["gps"]["latitude"], telemetry["gps"]["longitude"])
+            if sent_at.get(key):
+                latencies.append((now - sent_at[key].popleft()) * 1000)
+
+    websocket = None
+    for _ in range(50):  # The WebSocket services start in the background
+        try:
+            websocket = await websockets.connect(f"ws://127.0.0.1:{settings.WS_PORT}", max_size=None)
+            break
+        except OSError:
+            await asyncio.sleep(0.1)
+    if websocket is None:
+        raise RuntimeError(f"Could not connect to the position WebSocket on port {settings.WS_PORT}")
+    listener = asyncio.create_task(listen(websocket))
+
+    ops_before = await _opcounters()
+    tracer.reset()
+    started = time.perf_counter()
+    late_ticks = await generator.run(sink, args.duration, on_sent=on_sent)
+    sent_elapsed = time.perf_counter() - started
+
+    # Let the pipeline work off its backlog before measuring
+    if pipeline:
+        deadline = time.perf_counter() + args.drain_timeout
+        while any(pipeline.stats().values()) and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        backlog = pipeline.stats()
+    else:
+        await asyncio.sleep(min(args.drain_timeout, 2.0))
+        backlog = {}
+    elapsed = time.perf_counter() - started
+    ops_after = await _opcounters()
+    await asyncio.sleep(0.2)
+    listener.cancel()
+    await websocket.close()
+
+    result = {
+        "source": args.source,
+        "soldiers": args.soldiers,
+        "offered_fps": args.soldiers * args.rate,
+        "frames_sent": generator.frames_generated,
+        "frames_corrupted": generator.frames_corrupted,
+        "send_fps": generator.frames_generated / sent_elapsed,
+        "late_ticks": late_ticks,
+        "broadcasts_received": received,
+        "broadcast_fps": received / elapsed,
+        "latency_samples": len(latencies),
+        "latency_p50_ms": _percentile(latencies, 50),
+        "latency_p99_ms": _percentile(latencies, 99),
+        "latency_max_ms": max(latencies) if latencies else float("nan"),
+        "db_inserts_per_s": (ops_after["insert"] - ops_before["insert"]) / elapsed,
+        "db_updates_per_s": (ops_after["update"] - ops_before["update"]) / elapsed,
+        # Per-stage breakdown from tracing.py (this process only; a Faust
+        # worker's share is at /api/diagnostics/pipeline-latency)
+        "stage_latency_ms": {
+            name: {"p50": segment["p50_ms"], "p99": segment["p99_ms"], "count": segment["count"]}
+            for name, segment in tracer.snapshot()["segments"].items()
+        },
+        "backlog_after_drain": backlog,
+        "mongo_pool": mongo_client.pool_stats(),
+    }
+    if isinstance(sink, PtySink):
+        result["serial_bytes_dropped"] = sink.bytes_dropped
+
+    if feeder:
+        from backend_logic.data_ingestion import serial_receiver
+        serial_receiver.request_stop()
+        feeder.cancel()
+        await asyncio.gather(feeder, return_exceptions=True)
+    if pipeline:
+        await pipeline.stop()
+    if isinstance(sink, PtySink):
+        sink.close()
+    if ring_dir:
+        shutil.rmtree(ring_dir, ignore_errors=True)
+    if in_process and not args.keep_db:
+        for name in (settings.DB_in, settings.DB_out, settings.DB_real):
+            await mongo_client.get_client().drop_database(name)
+    mongo_client.close()
+    return result
+
+
+def report(result: dict):
+    print(f"source={result['source']} soldiers={result['soldiers']} "
+          f"offered={result['offered_fps']:.0f} frames/s")
+    print(f"sent        {result['frames_sent']} frames ({result['frames_corrupted']} corrupted), "
+          f"{result['send_fps']:.0f}/s, {result['late_ticks']} late ticks")
+    print(f"broadcast   {result['broadcasts_received']} positions, {result['broadcast_fps']:.0f}/s")
+    print(f"latency     ingest->WebSocket p50 {result['latency_p50_ms']:.2f} ms, "
+          f"p99 {result['latency_p99_ms']:.2f} ms, max {result['latency_max_ms']:.2f} ms "
+          f"({result['latency_samples']} samples)")
+    print(f"mongodb     {result['db_inserts_per_s']:.0f} inserts/s, {result['db_updates_per_s']:.0f} updates/s")
+    for name, segment in result["stage_latency_ms"].items():
+        print(f"  {name:<20} p50 <= {segment['p50']} ms, p99 <= {segment['p99']} ms ({segment['count']} traced)")
+    if result.get("serial_bytes_dropped"):
+        print(f"serial      {result['serial_bytes_dropped']} bytes dropped (reader behind)")
+    if any(result["backlog_after_drain"].values()):
+        print(f"backlog     {result['backlog_after_drain']}")
+
+
+if __name__ == "__main__":
+    parser = build_parser()
+    parser.set_defaults(duration=30.0)
+    parser.add_argument("--source", choices=("memory", "file", "pty", "kafka"), default="memory")
+    parser.add_argument("--drain-timeout", type=float, default=10.0,
+                        help="Seconds to wait for the pipeline backlog after the generator stops")
+    parser.add_argument("--keep-db", action="store_true", help="Keep the scratch databases")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args()
+
+    result = asyncio.run(run_benchmark(args))
+    if args.json:
+        print(json.dumps(result, indent=2, default=str))
+    else:
+        report(result)
@@ -0,0 +1,54 @@
+# debug/session_summary_check.py
+#
+# Check of the telemetry fields of db/session_summaries.py against a scratch
+# database: a summary created the way POST /api/sessions creates it must have
+# its first and last telemetry time and data point count set after one
+# flush, and keep the earliest / latest times over later flushes.
+#
+#   python -m debug.session_summary_check
+
+import asyncio
+import sys
+from datetime import datetime
+from db import mongo_client
+from db.session_summaries import TelemetrySummaryAccumulator, init_summary, summaries_collection
+
+SCRATCH_DB = "session_summary_check"
+
+
+async def run_check() -> bool:
+    db = mongo_client.get_database(SCRATCH_DB)
+    await summaries_collection(db).delete_many({})
+    await init_summary(db, "1", datetime.utcnow())
+
+    accumulator = TelemetrySummaryAccumulator(flush_seconds=3600)  # Flushed by hand below
+    await accumulator.note("1", "2025-01-01T10:00:05")
+    await accumulator.note("1", "2025-01-01T10:00:01")
+    await accumulator.flush(db)
+    first = await summaries_collection(db).find_one({"session_id": "1"})
+
+    await accumulator.note("1", "2025-01-01T09:59:59")
+    await accumulator.note("1", "2025-01-01T10:00:09")
+    await accumulator.flush(db)
+    second = await summaries_collection(db).find_one({"session_id": "1"})
+
+    checks = {
+        "first flush sets first_telemetry_time": first["first_telemetry_time"] == "2025-01-01T10:00:01",
+        "first flush sets last_telemetry_time": first["last_telemetry_time"] == "2025-01-01T10:00:05",
+        "first flush counts data points": first["data_points"] == 2,
+        "later flush keeps the earliest time": second["first_telemetry_time"] == "2025-01-01T09:59:59",
+        "later flush keeps the latest time": second["last_telemetry_time"] == "2025-01-01T10:00:09",
+        "later flush adds data points": second["data_points"] == 4,
+    }
+    for name, ok in checks.items():
+        print(f"{'ok' if ok else 'FAILED':8}{name}")
+
+    await mongo_client.get_client().drop_database(SCRATCH_DB)
+    mongo_client.close()
+    return all(checks.values())
+
+
+if __name__ == "__main__":
+    ok = asyncio.run(run_check())
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
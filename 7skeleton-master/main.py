@@ -13,7 +13,7 @@
 # replay_app = None
 
 # @asynccontextmanager
-# async def lifespan(app: FastAPI):
+# async def lifespan(app: "FastAPI"):
 #     """Handle startup and shutdown events for FastAPI"""
 #     global replay_app
     
@@ -110,21 +110,15 @@
 import asyncio
 import sys
 from contextlib import asynccontextmanager
-
-# from backend_logic.backendConnection.faust_app_v1 import app as soldier_topic (commented after 2/10/2025)
-from backend_logic.backendConnection.faust_app_v1 import soldier_topic
-
-
-from backend_logic.data_ingestion.serial_receiver import receive_serial_data
-from backend_logic.backendConnection.fastapi_app import app as fastapi_app
-from backend_logic.backendConnection.replay_app import create_replay_app
-import uvicorn
-from fastapi import FastAPI
+from typing import TYPE_CHECKING
 import logging
-import subprocess
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+if TYPE_CHECKING:  # Annotation only; the FastAPI app is imported by the mode that serves it
+    from fastapi import FastAPI
+
+# Heavy subsystems (Faust/Kafka, aioserial, uvicorn, the FastAPI app itself)
+# are imported inside the functions of the mode that needs them, so importing
+# this module (e.g. from the session routes) has no side effects.
 logger = logging.getLogger(__name__)
 
 # Global variable to store the replay app instance
@@ -133,17 +127,33 @@ replay_app = None
 
 realtime_state = {
     "faust_process": None,
+    "faust_persist_process": None,  # MongoDB writers, their own consumer group
+    "pipeline": None,  # EmbeddedPipeline when REALTIME_PIPELINE=embedded
     "send_task": None,
 }
 
+def embedded_mode() -> bool:
+    from configs.config import settings
+    return settings.REALTIME_PIPELINE == "embedded"
+
 async def start_realtime_services(session_id):
-    """Start Faust worker and serial ingestion."""
-    if realtime_state["faust_process"] is None:
+    """Start the stream processor (Faust worker or embedded pipeline) and serial ingestion."""
+    if embedded_mode():
+        # Same event loop as FastAPI and the serial reader, no Kafka hop
+        if realtime_state["pipeline"] is None:
+            from backend_logic.backendConnection.embedded_pipeline import EmbeddedPipeline
+            realtime_state["pipeline"] = EmbeddedPipeline()
+        await realtime_state["pipeline"].start()
+    elif realtime_state["faust_process"] is None:
         # Start Faust worker
         realtime_state["faust_process"] = await run_faust("faust", "backend_logic.backendConnection.faust_app_v1")
+        realtime_state["faust_persist_process"] = await run_faust("faust", "backend_logic.backendConnection.faust_persist_app")
     if realtime_state["send_task"] is None:
-        # Start serial ingestion and Kafka sender
-        realtime_state["send_task"] = asyncio.create_task(send_to_kafka())
+        # Start serial ingestion and Kafka sender (or direct hand-off to the embedded pipeline)
+        from backend_logic.data_ingestion import serial_receiver
+        serial_receiver.reset_stop()
+        sender = send_to_pipeline(realtime_state["pipeline"]) if embedded_mode() else send_to_kafka()
+        realtime_state["send_task"] = asyncio.create_task(sender)
     logger.info("Real-time services started.")
 
 async def stop_realtime_services():
@@ -158,26 +168,35 @@ async def stop_realtime_services():
             pass
         realtime_state["send_task"] = None
 
-    # Stop Faust worker
-    faust_process = realtime_state.get("faust_process")
-    if faust_process:
-        faust_process.terminate()
-        await faust_process.wait()
-        realtime_state["faust_process"] = None
+    # Stop the embedded pipeline after its queues drain. Its WebSocket services
+    # and transport cannot be started again, so the next start builds a new one
+    pipeline = realtime_state.get("pipeline")
+    if pipeline:
+        await pipeline.stop()
+        realtime_state["pipeline"] = None
+
+    # Stop the Faust workers
+    for name in ("faust_process", "faust_persist_process"):
+        faust_process = realtime_state.get(name)
+        if faust_process:
+            faust_process.terminate()
+            await faust_process.wait()
+            realtime_state[name] = None
 
     # Set the flag to stop loops
-    from backend_logic.backendConnection.faust_app_v1 import app
-    app.should_stop_realtime = True
+    from backend_logic.data_ingestion import serial_receiver
+    serial_receiver.request_stop()
 
     logger.info("Real-time services stopped.")
 
 @asynccontextmanager
-async def lifespan(app: FastAPI):
+async def lifespan(app: "FastAPI"):
     """Handle startup and shutdown events for FastAPI"""
     global replay_app
     
     if app.state.mode == "replay":
         # Initialize ReplayApp on startup
+        from backend_logic.backendConnection.replay_app import create_replay_app
         replay_app = create_replay_app()
         await replay_app.start_websocket_services()
         
@@ -191,11 +210,18 @@ async def lifespan(app: FastAPI):
 
 async def send_to_kafka():
     """Send received soldier data to Kafka topic."""
+    from backend_logic.backendConnection.faust_app_v1 import soldier_topic
+    from backend_logic.backendConnection.tracing import trace_of, tracer
+    from backend_logic.backendConnection.transport import STREAM_MESSAGES
+    from backend_logic.data_ingestion.serial_receiver import receive_serial_data
+    produced = STREAM_MESSAGES.labels("soldiers")
     try:    
         async for soldier_data in receive_serial_data():
             logger.debug(f"Received soldier_data for Kafka: {soldier_data}")
             if soldier_data:
                 logger.info(f"Sending to Kafka: {soldier_data}")
+                tracer.mark(trace_of(soldier_data), "produced")
+                produced.inc()
                 # await soldier_topic.send(value=soldier_data, channel="soldiers")
                 await soldier_topic.send(value=soldier_data)
             else:
@@ -206,6 +232,21 @@ async def send_to_kafka():
     except Exception as e:
         logger.error(f"Error in send_to_kafka: {e}")
 
+async def send_to_pipeline(pipeline):
+    """Hand received soldier data straight to the in-process pipeline."""
+    from backend_logic.data_ingestion.serial_receiver import receive_serial_data
+    try:
+        async for soldier_data in receive_serial_data():
+            if soldier_data:
+                await pipeline.send(soldier_data)
+            else:
+                logger.warning("No valid soldier_data to send to the pipeline")
+    except asyncio.CancelledError:
+        logger.info("send_to_pipeline cancelled")
+        raise
+    except Exception as e:
+        logger.error(f"Error in send_to_pipeline: {e}")
+
 async def run_faust(faust_path, app_name):
     """Run a Faust worker as a subprocess."""
     process = await asyncio.create_subprocess_exec(
@@ -215,6 +256,9 @@ async def run_faust(faust_path, app_name):
 
 async def run_fastapi(mode):
     """Run the FastAPI server."""
+    import uvicorn
+    from backend_logic.backendConnection.fastapi_app import app as fastapi_app
+
     # Set the mode in the FastAPI app state
     fastapi_app.state.mode = mode
     
@@ -231,9 +275,18 @@ async def run_fastapi(mode):
 async def main(mode="realtime"):
     """Main function to coordinate all services"""
     try:
-        if mode == "realtime":
-            # Start Faust worker for real-time processing
+        if mode == "realtime" and embedded_mode():
+            # Pipeline, serial reader and FastAPI all run in this event loop
+            await start_realtime_services(None)
+            try:
+                await run_fastapi(mode)
+            finally:
+                await stop_realtime_services()
+
+        elif mode == "realtime":
+            # Start the Faust workers for real-time processing and MongoDB writes
             faust_process = await run_faust("faust", "backend_logic.backendConnection.faust_app_v1")
+            faust_persist_process = await run_faust("faust", "backend_logic.backendConnection.faust_persist_app")
             
             # Run FastAPI and Kafka sender concurrently
             send_task = asyncio.create_task(send_to_kafka())
@@ -245,10 +298,11 @@ async def main(mode="realtime"):
                 send_task.cancel()
                 fastapi_task.cancel()
             
-            # Cleanup Faust process
-            if faust_process:
-                faust_process.terminate()
-                await faust_process.wait()
+            # Cleanup Faust processes
+            for process in (faust_process, faust_persist_process):
+                if process:
+                    process.terminate()
+                    await process.wait()
                 
         elif mode == "replay":
             # In replay mode, just run FastAPI with WebSocket services
@@ -266,6 +320,13 @@ async def main(mode="realtime"):
             await replay_app.stop_websocket_services()
 
 if __name__ == "__main__":
+    # `from main import ...` in the routes must see this module, not a second copy
+    sys.modules.setdefault("main", sys.modules[__name__])
+
+    from configs.config import settings
+    from configs.logging_config import configure_root
+    configure_root(level=settings.LOG_LEVEL.upper())
+
     # Set mode based on command-line argument
     mode = sys.argv[1] if len(sys.argv) > 1 else "realtime"
     
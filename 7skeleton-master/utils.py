@@ -1,10 +1,5 @@
-from motor.motor_asyncio import AsyncIOMotorClient
 from configs.config import settings
-
-client = AsyncIOMotorClient(settings.MONGODB_URI)
-db_in = client[settings.DB_in]
-
-from geopy.distance import geodesic
+from db.mongo_client import get_database
 
 async def calculate_distance_between_soldiers(attack_id, vict_id):
     
@@ -13,7 +8,7 @@ async def calculate_distance_between_soldiers(attack_id, vict_id):
     victim_id = str(vict_id)
     
     # Get the latest session
-    latest_session = await db_in["sessions"].find_one(sort=[("start_time", -1)])
+    latest_session = await get_database(settings.DB_in)["sessions"].find_one(sort=[("start_time", -1)])
     
     if not latest_session:
         return None
@@ -49,6 +44,8 @@ async def calculate_distance_between_soldiers(attack_id, vict_id):
 
     # Check if both locations are available
     if attacker_location and victim_location:
+        # geopy is only imported when a distance is actually needed
+        from geopy.distance import geodesic
         calculated_distance = geodesic(attacker_location, victim_location).meters
         return calculated_distance
     else: